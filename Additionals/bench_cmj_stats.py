@@ -0,0 +1,148 @@
+"""
+Benchmark of CMJ compute pipeline on synthetic traces.
+Times parsing (CMJAttribute), joining of traces, get_phases_idx, calculate_acceleration
+and get_cmj_stats separately and reports throughput in jumps/s and peak memory.
+Every run is appended to local results file (ignored by git), so it can be compared with runs of previous versions.
+Run from repository root: python Additionals/bench_cmj_stats.py --jumps 40
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+ADDITIONALS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ADDITIONALS_DIR, "..", "CMJStats"))
+from service.cmj_stats import (ForceCMJAttribute, VelocityCMJAttribute, CMJForceVelStats,  # noqa: E402
+                               CMJBatchStats)
+from synthetic_cmj import cmj_csv  # noqa: E402
+
+RESULTS_PATH = os.path.join(ADDITIONALS_DIR, "bench_results.jsonl")
+
+
+def parse(jumps):
+    return [(VelocityCMJAttribute(velocity), ForceCMJAttribute(force)) for force, velocity in jumps]
+
+
+def join(attributes):
+    return [CMJForceVelStats(vel_attr, force_attr, "Time (s)") for vel_attr, force_attr in attributes]
+
+
+def phases(stats):
+    return [cmj.get_phases_idx() for cmj in stats]
+
+
+def acceleration(stats):
+    return [CMJForceVelStats.calculate_acceleration(cmj.df_base, 0.001, cmj.vel_attr.headers["velocity"])
+            for cmj in stats]
+
+
+def cmj_stats(stats):
+    return [cmj.get_cmj_stats() for cmj in stats]
+
+
+def batch(attributes):
+    return CMJBatchStats.from_attributes(attributes).get_cmj_stats()
+
+
+def pipeline(jumps):
+    return cmj_stats(join(parse(jumps)))
+
+
+def measure(func, arg, repeat):
+    """
+    :return: tuple of mean time in s and peak memory in bytes of func(arg)
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return sum(times) / len(times), peak
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ADDITIONALS_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(n_jumps, sample_rate, after_landing, repeat):
+    jumps = [cmj_csv(seed=seed, sample_rate=sample_rate, after_landing=after_landing) for seed in range(n_jumps)]
+    attributes = parse(jumps)
+    stats = join(attributes)
+    stages = [("parse", parse, jumps),
+              ("join", join, attributes),
+              ("get_phases_idx", phases, stats),
+              ("calculate_acceleration", acceleration, stats),
+              ("get_cmj_stats", cmj_stats, stats),
+              ("batch_get_cmj_stats", batch, attributes),
+              ("pipeline", pipeline, jumps)]
+    results = {}
+    for name, func, arg in stages:
+        elapsed, peak = measure(func, arg, repeat)
+        results[name] = {"ms_per_jump": elapsed / n_jumps * 1000,
+                         "jumps_per_s": n_jumps / elapsed,
+                         "peak_kb": peak / 1024}
+    return {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "params": {"jumps": n_jumps, "sample_rate": sample_rate,
+                       "samples_per_jump": len(stats[0].df_base), "repeat": repeat},
+            "results": results}
+
+
+def previous_run(path, params):
+    """
+    :return: last stored run with the same params or None
+    """
+    if not os.path.isfile(path):
+        return None
+    previous = None
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["params"] == params:
+                previous = entry
+    return previous
+
+
+def report(entry, previous):
+    print("revision {} ({} jumps, {} samples per jump)".format(entry["revision"], entry["params"]["jumps"],
+                                                               entry["params"]["samples_per_jump"]))
+    if previous is not None:
+        print("compared with revision {} from {}".format(previous["revision"], previous["date"]))
+    print("    {:<24} {:>10} {:>10} {:>12} {:>8}".format("stage", "ms/jump", "jumps/s", "peak kB", "change"))
+    for name, result in entry["results"].items():
+        change = ""
+        if previous is not None and name in previous["results"]:
+            before = previous["results"][name]["ms_per_jump"]
+            change = "{:+.0f}%".format((result["ms_per_jump"] - before) / before * 100)
+        print("    {:<24} {:>10.3f} {:>10.1f} {:>12.1f} {:>8}".format(name, result["ms_per_jump"],
+                                                                     result["jumps_per_s"], result["peak_kb"],
+                                                                     change))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jumps", type=int, default=20, help="number of synthetic jumps")
+    parser.add_argument("--sample-rate", type=int, default=1000, help="samples per second")
+    parser.add_argument("--after-landing", type=float, default=1.0, help="seconds recorded after landing")
+    parser.add_argument("--repeat", type=int, default=3, help="repeats of every stage")
+    parser.add_argument("--results", default=RESULTS_PATH, help="jsonl file with stored runs")
+    parser.add_argument("--no-store", action="store_true", help="do not append this run to results file")
+    args = parser.parse_args()
+
+    entry = run(args.jumps, args.sample_rate, args.after_landing, args.repeat)
+    report(entry, previous_run(args.results, entry["params"]))
+    if not args.no_store:
+        with open(args.results, "a") as f:
+            f.write(json.dumps(entry) + "\n")
@@ -0,0 +1,51 @@
+"""
+Compares parse time and peak memory of CMJAttribute reader against
+plain pd.read_csv of whole Hawkin Dynamics csv file.
+Run from repository root: python Additionals/bench_hawkin_reader.py
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CMJStats"))
+from service.cmj_stats import VelocityCMJAttribute  # noqa: E402
+from synthetic_cmj import cmj_csv  # noqa: E402
+
+
+def read_all_columns(content, headers):
+    df = pd.read_csv(io.BytesIO(content))
+    return df[df.columns.intersection(list(headers.values()))]
+
+
+def read_hawkin(content, headers, **kwargs):
+    return VelocityCMJAttribute(io.BytesIO(content), headers, **kwargs).df
+
+
+def measure(func, *args, repeat=20, **kwargs):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(*args, **kwargs)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    func(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    headers = {"time": "Time (s)", "velocity": "Velocity (M/s)"}
+    for after_landing in (1, 10, 50):
+        content = cmj_csv(after_landing=after_landing)[1]
+        print("{:.0f} s after landing, {:.0f} kB".format(after_landing, len(content) / 1024))
+        cases = [("read all columns", read_all_columns, {}),
+                 ("hawkin reader c", read_hawkin, {}),
+                 ("hawkin reader c float32", read_hawkin, {"dtype": np.float32}),
+                 ("hawkin reader pyarrow", read_hawkin, {"engine": "pyarrow"})]
+        for name, func, kwargs in cases:
+            elapsed, peak = measure(func, content, headers, **kwargs)
+            print("    {:<26} {:8.2f} ms {:10.1f} kB peak".format(name, elapsed * 1000, peak / 1024))
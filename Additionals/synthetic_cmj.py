@@ -0,0 +1,102 @@
+"""
+Generator of synthetic counter movement jump traces in format of Hawkin Dynamics exports.
+Force profile is built phase by phase (quiet standing, unweighting, braking and propulsion,
+take-off, flight, landing) and velocity is integrated from it, so both traces are consistent.
+"""
+import numpy as np
+import pandas as pd
+
+G = 9.81
+FORCE_HEADERS = ["Time (s)", "Left (N)", "Right (N)", "Combined (N)"]
+VELOCITY_HEADERS = ["Time (s)", "Displacement (M)", "Velocity (M/s)", "Acceleration (M/s^2)", "Power (W)"]
+
+
+def cmj_trace(mass=75.0, sample_rate=1000, quiet=1.5, unweighting=0.35, push=0.45, take_off=0.03,
+              unweighting_depth=0.6, take_off_velocity=2.5, landing=0.1, after_landing=1.0,
+              noise=2.0, seed=0):
+    """
+    :param mass: system mass in kg
+    :param sample_rate: samples per second
+    :param quiet: length of quiet standing in s
+    :param unweighting: length of unweighting in s
+    :param push: length of braking and propulsion in s
+    :param take_off: length of force drop to zero before take-off in s
+    :param unweighting_depth: lowest force during unweighting as fraction of body weight
+    :param take_off_velocity: velocity at take-off in m/s
+    :param landing: time constant of landing force decay in s
+    :param after_landing: length of recording after landing in s
+    :param noise: standard deviation of force noise in N
+    :param seed: random seed
+    :return: tuple of numpy arrays time, left force, right force, combined force and velocity
+    """
+    rng = np.random.default_rng(seed)
+    dt = 1 / sample_rate
+    weight = mass * G
+
+    def samples(seconds):
+        return max(int(round(seconds * sample_rate)), 1)
+
+    def phase(seconds):
+        n = samples(seconds)
+        return np.arange(n) / n
+
+    quiet_force = np.full(samples(quiet), weight)
+    unweighting_force = weight - unweighting_depth * weight * np.sin(np.pi * phase(unweighting))
+    deficit = (weight - unweighting_force).sum() * dt
+    take_off_force = weight * (1 - phase(take_off))
+    # peak of push chosen so that net impulse gives take off velocity
+    push_shape = np.sin(np.pi * phase(push))
+    push_peak = (mass * take_off_velocity + deficit + (weight - take_off_force).sum() * dt) / (push_shape.sum() * dt)
+    push_force = weight + push_peak * push_shape
+    flight_force = np.zeros(samples(2 * take_off_velocity / G))
+    t_landing = np.arange(samples(after_landing)) * dt
+    landing_force = weight + mass * take_off_velocity / landing * np.exp(-t_landing / landing)
+
+    force = np.concatenate([quiet_force, unweighting_force, push_force, take_off_force, flight_force,
+                            landing_force])
+    velocity = np.cumsum((force - weight) / mass) * dt
+    force = force + rng.normal(0, noise, len(force))
+    flight = slice(len(force) - len(landing_force) - len(flight_force), len(force) - len(landing_force))
+    force[flight] = np.abs(rng.normal(0, noise / 4, len(flight_force)))
+    velocity = velocity + rng.normal(0, 0.0005, len(velocity))
+
+    left = force * rng.uniform(0.45, 0.55) + rng.normal(0, noise / 2, len(force))
+    time = np.round(np.arange(len(force)) * dt, 6)
+    return time, left, force - left, force, velocity
+
+
+def cmj_frames(**kwargs):
+    """
+    :param kwargs: see cmj_trace
+    :return: tuple of force and velocity dataframes with Hawkin Dynamics columns
+    """
+    time, left, right, combined, velocity = cmj_trace(**kwargs)
+    dt = time[1] - time[0]
+    mass = kwargs.get("mass", 75.0)
+    force = pd.DataFrame(dict(zip(FORCE_HEADERS, (time, left, right, combined))))
+    acceleration = np.gradient(velocity, dt)
+    velocity_df = pd.DataFrame(dict(zip(VELOCITY_HEADERS, (time, np.cumsum(velocity) * dt, velocity,
+                                                           acceleration, mass * acceleration * velocity))))
+    return force, velocity_df
+
+
+def cmj_csv(**kwargs):
+    """
+    :param kwargs: see cmj_trace
+    :return: tuple of force and velocity csv content as bytes
+    """
+    force, velocity = cmj_frames(**kwargs)
+    return force.to_csv(index=False).encode(), velocity.to_csv(index=False).encode()
+
+
+def hawkin_filename(kind, first_name, last_name, date, time="07-00-26", trial=None):
+    """
+    :param kind: Force or Velocity
+    :param date: datetime.date of jump
+    :return: filename in format of Hawkin Dynamics exports
+    """
+    name = "{}-{}_{}_Countermovement_Jump-{}_{}_{}_{}".format(kind, first_name, last_name, date.month, date.day,
+                                                             date.year, time)
+    if trial is not None:
+        name += " {}".format(trial)
+    return name + ".csv"
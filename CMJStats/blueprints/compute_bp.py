@@ -1,9 +1,15 @@
-from flask import Blueprint, request, redirect, make_response
+from flask import Blueprint, request, redirect, make_response, jsonify, current_app
+import datetime
 import threading
 import os
 
 from service.thread_func import thread_func_gcloud
 from service.cloud_logging import log_message
+from service.instrumentation import metrics
+from service.jump_index import jump_index
+from service.results_store import results_store
+from service.storage import get_bucket, bucket_config
+from service.trends import trend_store
 
 bp = Blueprint('cmj-compute', __name__)
 
@@ -13,11 +19,43 @@ def compute():
     log_message("Computation start")
     athletes_files = request.get_json(force=True)
 
-    # Threading this way doesnt work in GCP - to remember...
-    # thread = threading.Thread(target=thread_func_gcloud, args=(athletes_files["filenames"]))
-    # thread.start()
-    # thread.join()
+    # Detached thread doesnt work in GCP as instance is throttled after response is sent, hence files
+    # are fanned out across worker pool set with COMPUTE_EXECUTOR and joined before responding
+    stats = thread_func_gcloud(athletes_files["filenames"], athletes_files["force_path"],
+                               athletes_files["velocity_path"])
+    # when every file failed, e.g. bucket was not reachable, task is retried with files kept in bucket
+    failed_all = stats["failed"] and len(stats["failed"]) == len(athletes_files["filenames"])
+    return make_response(jsonify(stats), 500 if failed_all else 200)
 
-    thread_func_gcloud(athletes_files["filenames"], athletes_files["force_path"], athletes_files["velocity_path"])
-    return "done"
 
+@bp.route("/metrics", methods=['GET'])
+def get_metrics():
+    return jsonify(metrics.snapshot())
+
+
+@bp.route("/jumps", methods=['GET'])
+def get_jumps():
+    """
+    Results of jumps of athlete (firstname and lastname args) between optional date_from and date_to args
+    (YYYY-MM-DD), found in jump index without listing results dataset
+    """
+    date_from, date_to = (datetime.date.fromisoformat(request.args[arg]) if request.args.get(arg) else None
+                          for arg in ("date_from", "date_to"))
+    bucket = get_bucket(**bucket_config(current_app.config))
+    entries = jump_index(bucket, current_app.config).jumps_for(request.args["firstname"], request.args["lastname"],
+                                                               date_from, date_to)
+    results = results_store(bucket, current_app.config).read_jumps(entries)
+    results["date"] = results["date"].dt.strftime("%Y-%m-%d")
+    results = results.drop(columns=["computed_at"]).astype(object).where(results.notna(), None)
+    return jsonify(results.to_dict(orient="records"))
+
+
+@bp.route("/trends", methods=['GET'])
+def get_trends():
+    """
+    Trends of athlete (firstname and lastname args): EWMA, rolling and baseline stats of metrics,
+    summary of last jump with z-scores and fatigue flag
+    """
+    bucket = get_bucket(**bucket_config(current_app.config))
+    trend = trend_store(bucket, current_app.config).load(request.args["firstname"], request.args["lastname"])
+    return jsonify(trend.to_dict())
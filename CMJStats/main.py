@@ -14,6 +14,34 @@ try:
     app.config["ENV"] = os.environ["ENV"]
     if os.environ["ENV"] == "GCLOUD":
         app.config["UPLOAD_FOLDER"] = os.environ["BUCKET"]
+    elif os.environ["ENV"] == "LOCAL":
+        # defaults are the same as local bucket of EntryPoint (default_settings.Config)
+        app.config["UPLOAD_FOLDER"] = os.environ.get("BUCKET", "upload")
+        app.config["STORAGE_BACKEND"] = "local"
+        app.config["LOCAL_STORAGE_ROOT"] = os.environ.get("LOCAL_STORAGE_ROOT", "data")
+    # serial, thread, process or batch - see service.thread_func.thread_func_gcloud
+    app.config["COMPUTE_EXECUTOR"] = os.environ.get("COMPUTE_EXECUTOR", "serial")
+    app.config["COMPUTE_WORKERS"] = int(os.environ.get("COMPUTE_WORKERS", os.cpu_count()))
+    # directory of parsed csv cache, not used when not set
+    app.config["PARSE_CACHE_DIR"] = os.environ.get("PARSE_CACHE_DIR")
+    # max size of parsed csv cache in MB, least recently used entries are removed above it
+    app.config["PARSE_CACHE_MAX_BYTES"] = int(float(os.environ.get("PARSE_CACHE_MAX_MB", 256)) * 2 ** 20)
+    # lengths in ms of windows at start of propulsive phase, e.g. "50,100,200"
+    app.config["METRIC_WINDOWS"] = tuple(int(ms) for ms in os.environ.get("METRIC_WINDOWS", "100").split(","))
+    # directory of results dataset in bucket, see service.results_store.ResultsStore
+    app.config["RESULTS_PREFIX"] = os.environ.get("RESULTS_PREFIX", "results")
+    # index of jumps by athlete and date, bucket or sqlite (with JUMP_INDEX_PATH) - see service.jump_index
+    app.config["JUMP_INDEX_BACKEND"] = os.environ.get("JUMP_INDEX_BACKEND", "bucket")
+    app.config["JUMP_INDEX_PREFIX"] = os.environ.get("JUMP_INDEX_PREFIX", "index")
+    app.config["JUMP_INDEX_PATH"] = os.environ.get("JUMP_INDEX_PATH", "jump_index.sqlite")
+    # every file is recording with several jumps split into trials, see service.session.CMJSessionStats
+    app.config["SESSION_MODE"] = os.environ.get("SESSION_MODE", "false").lower() in ("1", "true", "yes")
+    # per athlete trends of metrics kept in bucket, see service.trends.AthleteTrend
+    app.config["TRENDS_PREFIX"] = os.environ.get("TRENDS_PREFIX", "trends")
+    app.config["TREND_ALPHA"] = float(os.environ.get("TREND_ALPHA", 0.3))
+    app.config["TREND_WINDOW"] = int(os.environ.get("TREND_WINDOW", 5))
+    app.config["TREND_BASELINE"] = int(os.environ.get("TREND_BASELINE", 5))
+    app.config["TREND_Z_THRESHOLD"] = float(os.environ.get("TREND_Z_THRESHOLD", 1.5))
 except TypeError:
     log_message(traceback.extract_stack())
     sys.exit(2)
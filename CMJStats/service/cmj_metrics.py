@@ -0,0 +1,204 @@
+import numpy as np
+
+G = 9.81
+
+
+def gather(values, *indexes):
+    """
+    :param values: 2-D array
+    :param indexes: arrays with column index of every row, clipped to width of values
+    :return: list with array of one value per row for every index, all taken in one indexing operation
+    """
+    # np.minimum and np.maximum, as np.clip has large overhead on arrays with few values
+    index = np.minimum(np.maximum(np.stack(indexes, axis=1), 0), values.shape[1] - 1)
+    return list(values[np.arange(len(values))[:, None], index].T)
+
+
+def window(width, start, end):
+    """
+    :return: 2-D boolean mask selecting columns from start (inclusive) to end (exclusive) in every row
+    """
+    cols = np.arange(width)
+    return (cols >= start[:, None]) & (cols < end[:, None])
+
+
+def prefix_sum(values):
+    """
+    :return: 2-D array with zero column prepended to cumulative sum, so that sum of values[a:b] is
+        prefix[b] - prefix[a] for any window in O(1)
+    """
+    return np.concatenate([np.zeros((len(values), 1)), np.cumsum(values, axis=1)], axis=1)
+
+
+def running_max(values, start):
+    """
+    :return: 2-D array with maximum of values from start (inclusive) of every row up to each column,
+        so that peak of values[start:end] is taken at end - 1 for any end
+    """
+    cols = np.arange(values.shape[1])
+    return np.maximum.accumulate(np.where(cols >= start[:, None], values, -np.inf), axis=1)
+
+
+def first_acceleration(velocity, start, time_interval):
+    """
+    Row-wise CMJForceVelStats.first_acceleration for slices starting at start
+    """
+    start = np.minimum(np.maximum(start, 0), max(velocity.shape[1] - 4, 0))
+    v = gather(velocity, start, start + 1, start + 2, start + 3)
+    vel_diff = ((v[3] - v[2]) + (v[2] - v[1]) + (v[1] - v[0])) / 3
+    return vel_diff / time_interval
+
+
+def cmj_metrics(time, velocity, force, idxs, system_weight, time_interval=0.001, windows=(100,), acc=None):
+    """
+    Computes all stats of counter movement jump from phases indexes. Every trace is differentiated and summed
+    once (prefix sums, running maxima), after which every windowed sum, mean and peak is read in O(1) per jump,
+    so adding windows or metrics does not add passes over traces
+    :param time: 1-D array of time or 2-D array with one jump per row (NaN padded)
+    :param velocity: array of velocity, same shape as time
+    :param force: array of combined force on the same grid as velocity
+    :param idxs: phases indexes from get_phases_idx, ints for 1-D traces and arrays for 2-D traces
+    :param system_weight: tuple of mean and standard deviation of system weight, per row for 2-D traces
+    :param time_interval: time between consecutive samples
+    :param windows: lengths in ms of windows at start of propulsive phase, e.g. (50, 100, 200)
+    :param acc: acceleration of whole trace from CMJForceVelStats.acceleration_array, calculated if not provided
+    :return: dict with stats, floats for 1-D traces and arrays for 2-D traces, NaN where phases were not found
+        and for peaks and means of windows left empty by take-off at first sample of propulsive phase.
+        1-D traces are computed on slices with _cmj_metrics_1d, with the same results up to rounding of sums
+    """
+    if np.ndim(velocity) == 1:
+        return _cmj_metrics_1d(np.asarray(time, dtype=np.float64), np.asarray(velocity, dtype=np.float64),
+                               np.asarray(force, dtype=np.float64), idxs, system_weight, time_interval, windows, acc)
+    time, velocity, force = (np.atleast_2d(np.asarray(a, dtype=np.float64)) for a in (time, velocity, force))
+    ind_unwght_start, ind_brk_start, ind_brk_end, ind_prop_start, ind_prop_end = (
+        np.atleast_1d(np.asarray(i, dtype=np.int64)) for i in (idxs["unweighting"][0], idxs["braking"][0],
+                                                               idxs["braking"][1], idxs["propulsive"][0],
+                                                               idxs["propulsive"][1]))
+    weight = np.atleast_1d(system_weight[0])
+    found = (ind_unwght_start >= 0) & (ind_brk_end >= 0) & (ind_prop_end >= 0)
+
+    # only samples from start of unweighting to take-off (and 3 samples after it for extrapolated acceleration)
+    # are needed, so traces are cropped to them before any pass
+    lo = int(ind_unwght_start[found].min()) if found.any() else 0
+    hi = int(ind_prop_end[found].max()) + 4 if found.any() else velocity.shape[1]
+    time, velocity, force = (a[:, lo:hi] for a in (time, velocity, force))
+    ind_unwght_start, ind_brk_start, ind_brk_end, ind_prop_start, ind_prop_end = (
+        i - lo for i in (ind_unwght_start, ind_brk_start, ind_brk_end, ind_prop_start, ind_prop_end))
+    width = velocity.shape[1]
+
+    if acc is None:
+        acc = np.empty_like(velocity)
+        acc[:, 1:] = np.diff(velocity, axis=1) / time_interval
+    else:
+        acc = np.atleast_2d(np.array(acc, dtype=np.float64))[:, lo:hi]
+    # first sample is never inside acceleration windows, it is zeroed so it does not spoil prefix sums
+    acc[:, 0] = 0.0
+    vel_sum = prefix_sum(velocity)
+    acc_sum = prefix_sum(acc)
+    force_sum = prefix_sum(force)
+    vel_max = running_max(velocity, ind_prop_start)
+    acc_max = running_max(acc, ind_prop_start + 1)
+
+    neg = window(width, ind_unwght_start, ind_brk_end)
+    a_prop_first = first_acceleration(velocity, ind_prop_start, time_interval)
+    a_pos_first = first_acceleration(velocity, ind_brk_start, time_interval)
+    v_peak_prop_idx = np.argmax(np.where(window(width, ind_prop_start, ind_prop_end), velocity, -np.inf), axis=1)
+    acc_pos = np.where(window(width, ind_brk_start + 1, ind_prop_end), acc, -np.inf).max(axis=1, initial=-np.inf)
+
+    # all samples needed from each array are taken at once, sums of windows are differences of prefix sums
+    # and peaks of windows starting at propulsive phase are running maxima at last sample of window
+    ends = [np.minimum(ind_prop_start + int(round(ms / 1000 / time_interval)) + 1, ind_prop_end) for ms in windows]
+    vs_unwght, vs_brk_end, vs_prop, *vs_ends = gather(vel_sum, ind_unwght_start, ind_brk_end, ind_prop_start, *ends)
+    as_prop, *as_ends = gather(acc_sum, ind_prop_start + 1, *ends)
+    fs_brk, fs_prop, fs_take_off = gather(force_sum, ind_brk_start, ind_prop_start, ind_prop_end)
+    vm_prop, *vm_ends = gather(vel_max, ind_prop_end - 1, *(end - 1 for end in ends))
+    am_ends = gather(acc_max, *(end - 1 for end in ends)) if ends else []
+    t_v_peak, t_prop, t_take_off, t_unwght = gather(time, v_peak_prop_idx, ind_prop_start, ind_prop_end,
+                                                    ind_unwght_start)
+    f_v_peak, take_off_velocity = gather(force, v_peak_prop_idx)[0], gather(velocity, ind_prop_end)[0]
+
+    # windows of phases not found are empty, NaN from them is replaced below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # take-off at first sample of propulsive phase leaves it empty, it has no peak velocity
+        prop = ind_prop_end > ind_prop_start
+        stats = {'v_peak_prop': np.where(prop, vm_prop, np.nan),
+                 'v_peak_neg': np.where(neg, velocity, np.inf).min(axis=1, initial=np.inf),
+                 'v_avg_neg': (vs_brk_end - vs_unwght) / (ind_brk_end - ind_unwght_start),
+                 't_to_v_peak_prop': np.where(prop, t_v_peak - t_prop, np.nan)}
+        for ms, end, vs_end, as_end, vm_end, am_end in zip(windows, ends, vs_ends, as_ends, vm_ends, am_ends):
+            n_acc = np.maximum(end - ind_prop_start - 1, 0)
+            stats['v_avg_{}_prop'.format(ms)] = (vs_end - vs_prop) / (end - ind_prop_start)
+            stats['a_avg_{}_prop'.format(ms)] = (a_prop_first + np.where(n_acc > 0, as_end - as_prop, 0)) / (n_acc + 1)
+            stats['a_peak_{}_prop'.format(ms)] = np.maximum(a_prop_first, np.where(n_acc > 0, am_end, -np.inf))
+            stats['v_peak_{}_prop'.format(ms)] = np.where(end > ind_prop_start, vm_end, np.nan)
+        stats['a_peak_pos'] = np.maximum(a_pos_first, acc_pos)
+
+        # impulse of net force, braking phase ends at last sample before propulsive phase
+        stats['f_at_v_peak_prop'] = np.where(prop, f_v_peak, np.nan)
+        stats['net_impulse_brk'] = (fs_prop - fs_brk - weight * (ind_prop_start - ind_brk_start)) * time_interval
+        stats['net_impulse_prop'] = (fs_take_off - fs_prop - weight * (ind_prop_end - ind_prop_start)) * time_interval
+        # jump height from take-off velocity, RSI-modified is jump height over time from start of movement to take-off
+        stats['jump_height'] = take_off_velocity ** 2 / (2 * G)
+        stats['rsi_mod'] = stats['jump_height'] / (t_take_off - t_unwght)
+
+    for key, values in stats.items():
+        stats[key] = np.where(found, values, np.nan)
+    return stats
+
+
+def _cmj_metrics_1d(time, velocity, force, idxs, system_weight, time_interval, windows, acc):
+    """
+    cmj_metrics of single jump on slices of 1-D traces. For one jump every sum and peak is read straight
+    from its slice, which is faster than building prefix sums and running maxima of 2-D kernel
+    """
+    ind_unwght_start, ind_brk_start, ind_brk_end, ind_prop_start, ind_prop_end = (
+        int(i) for i in (idxs["unweighting"][0], idxs["braking"][0], idxs["braking"][1], idxs["propulsive"][0],
+                         idxs["propulsive"][1]))
+    keys = ['v_peak_prop', 'v_peak_neg', 'v_avg_neg', 't_to_v_peak_prop']
+    for ms in windows:
+        keys += [name.format(ms) for name in ('v_avg_{}_prop', 'a_avg_{}_prop', 'a_peak_{}_prop', 'v_peak_{}_prop')]
+    keys += ['a_peak_pos', 'f_at_v_peak_prop', 'net_impulse_brk', 'net_impulse_prop', 'jump_height', 'rsi_mod']
+    if ind_unwght_start < 0 or ind_brk_end < 0 or ind_prop_end < 0:
+        return dict.fromkeys(keys, np.nan)
+
+    # indexes past end of traces are clipped like in gather of 2-D kernel
+    last = min(ind_prop_end + 4, len(velocity)) - 1
+    if acc is None:
+        acc = np.empty(last + 1)
+        acc[ind_unwght_start + 1:] = np.diff(velocity[ind_unwght_start: last + 1]) / time_interval
+
+    def first_acceleration(start):
+        start = min(max(start, ind_unwght_start), max(last - 3, ind_unwght_start))
+        v = velocity[start: start + 4]
+        return ((v[3] - v[2]) + (v[2] - v[1]) + (v[1] - v[0])) / 3 / time_interval
+
+    v_prop = velocity[ind_prop_start: ind_prop_end]
+    v_neg = velocity[ind_unwght_start: ind_brk_end]
+    a_prop_first = first_acceleration(ind_prop_start)
+    v_peak_prop_idx = ind_prop_start + int(np.argmax(v_prop)) if len(v_prop) else ind_unwght_start
+    weight = system_weight[0]
+    take_off = min(ind_prop_end, last)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats = {'v_peak_prop': v_prop.max() if len(v_prop) else np.nan,
+                 'v_peak_neg': v_neg.min(initial=np.inf),
+                 'v_avg_neg': np.float64(v_neg.sum()) / len(v_neg),
+                 't_to_v_peak_prop': time[v_peak_prop_idx] - time[ind_prop_start] if len(v_prop) else np.nan}
+        for ms in windows:
+            end = min(ind_prop_start + int(round(ms / 1000 / time_interval)) + 1, ind_prop_end)
+            v_window = velocity[ind_prop_start: end]
+            a_window = acc[ind_prop_start + 1: end]
+            stats['v_avg_{}_prop'.format(ms)] = np.float64(v_window.sum()) / (end - ind_prop_start)
+            stats['a_avg_{}_prop'.format(ms)] = (a_prop_first + a_window.sum()) / (len(a_window) + 1)
+            stats['a_peak_{}_prop'.format(ms)] = max(a_prop_first, a_window.max(initial=-np.inf))
+            stats['v_peak_{}_prop'.format(ms)] = v_window.max() if len(v_window) else np.nan
+        stats['a_peak_pos'] = max(first_acceleration(ind_brk_start),
+                                  acc[ind_brk_start + 1: ind_prop_end].max(initial=-np.inf))
+        stats['f_at_v_peak_prop'] = force[v_peak_prop_idx] if len(v_prop) else np.nan
+        stats['net_impulse_brk'] = ((force[ind_brk_start: ind_prop_start].sum()
+                                     - weight * (ind_prop_start - ind_brk_start)) * time_interval)
+        stats['net_impulse_prop'] = ((force[ind_prop_start: ind_prop_end].sum()
+                                      - weight * (ind_prop_end - ind_prop_start)) * time_interval)
+        stats['jump_height'] = velocity[take_off] ** 2 / (2 * G)
+        stats['rsi_mod'] = stats['jump_height'] / (time[take_off] - time[ind_unwght_start])
+    return {key: float(value) for key, value in stats.items()}
@@ -1,6 +1,53 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
 import pandas as pd
 from csv import reader
-import copy
+from service.cmj_metrics import cmj_metrics
+from service.system_weight import estimate_system_weight, find_quiet_window, window_weight, window_samples
+
+CACHE_TMP_PREFIX = ".tmp-"
+CACHE_MAX_BYTES = 256 * 2 ** 20
+
+
+def prune_cache(cache_dir: str, max_bytes: int, tmp_age=600):
+    """
+    Removes temp directories older than tmp_age seconds (left by workers which crashed before storing entry)
+    and least recently used entries of parsed csv cache until it takes at most max_bytes
+    :param cache_dir: directory of cache, see CMJAttribute
+    :param max_bytes: max size of all entries in bytes
+    :param tmp_age: age in seconds after which unfinished temp directory is removed
+    """
+    now = time.time()
+    entries = []
+    with os.scandir(cache_dir) as dirs:
+        for entry in dirs:
+            if not entry.is_dir():
+                continue
+            mtime = entry.stat().st_mtime
+            if entry.name.startswith(CACHE_TMP_PREFIX):
+                if now - mtime > tmp_age:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            try:
+                with os.scandir(entry.path) as files:
+                    size = sum(f.stat().st_size for f in files)
+            except FileNotFoundError:
+                # removed meanwhile by another worker
+                continue
+            entries.append((mtime, size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    # entries are touched on every hit, so oldest mtime is least recently used
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
 
 
 class CMJAttribute:
@@ -10,25 +57,34 @@ class CMJAttribute:
     example it would be velocity or force
     """
 
-    def __init__(self, csv_file: 'file', headers: dict):
+    def __init__(self, csv_file: 'file', headers: dict, dtype=np.float64, engine="c", cache_dir=None,
+                 cache_max_bytes=None):
         """
-        :param csv_path: path to csv file
+        :param csv_file: path to csv file, file-like object or bytes with csv content
         :param headers: dictionary with key as attribute (time, velocity, left, combined etc.) and col name as value
+        :param dtype: dtype of parsed columns other than time, which is always float64 so it can be joined on
+        :param engine: pandas csv engine, "c" or "pyarrow" (used only if pyarrow is installed)
+        :param cache_dir: directory of parsed columns cache keyed by hash of csv content and headers,
+            when set, csv file parsed once is later loaded from .npy files instead of parsed again
+        :param cache_max_bytes: max size of cache (CACHE_MAX_BYTES if not set), least recently used entries
+            are removed when it is exceeded
         """
+        if isinstance(csv_file, (bytes, bytearray)):
+            csv_file = io.BytesIO(csv_file)
         self.csv_file = csv_file
         self.headers = headers
-        # self._verify_csv_header(csv_file)
-        self._df = self.create_df()
+        self.dtype = dtype
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes if cache_max_bytes is not None else CACHE_MAX_BYTES
+        self._df = self.create_df() if cache_dir is None else self.create_df_cached()
 
-    def _verify_csv_header(self, csv_file):
+    def _verify_csv_header(self, headers_csv: list):
         """
         Verifies if csv file header contain
-        all the columns from the arg columns list
-        csv_file: path to file
-        columns: list of columns names that needs to be present in csv file header
+        all the columns from the headers dict
+        :param headers_csv: list of columns names from first line of csv file
         """
-        f_reader = copy.copy(reader(csv_file))
-        headers_csv = list(next(f_reader))
         for col in list(self.headers.values()):
             if col not in headers_csv:
                 raise ValueError("Wrong csv headers. No {} column.".format(col))
@@ -37,21 +93,102 @@ class CMJAttribute:
     def df(self):
         return self._df
 
+    @staticmethod
+    def _get_engine(engine):
+        if engine == "pyarrow":
+            try:
+                import pyarrow
+            except ImportError:
+                return "c"
+        return engine
+
     def create_df(self):
         """
-        Generates dataframe from csv file provided as attribute of object
+        Generates dataframe from csv file provided as attribute of object.
+        Header is read from first line of the stream and validated, then only
+        columns from headers dict are parsed, in order of the csv file
+        :return: pandas dataframe with data from csv file
+        """
+        if isinstance(self.csv_file, str):
+            with open(self.csv_file, newline="") as csv_file:
+                return self._read_csv(csv_file)
+        return self._read_csv(self.csv_file)
+
+    def _read_content(self):
+        if isinstance(self.csv_file, str):
+            with open(self.csv_file, "rb") as csv_file:
+                return csv_file.read()
+        content = self.csv_file.read()
+        return content.encode("utf-8") if isinstance(content, str) else content
+
+    def cache_key(self, content: bytes):
+        """
+        :param content: content of csv file
+        :return: hash of csv content, headers and dtype, any change of those gives new cache entry
+        """
+        key = hashlib.sha256(content)
+        key.update(json.dumps(self.headers, sort_keys=True).encode("utf-8"))
+        key.update(np.dtype(self.dtype).str.encode("utf-8"))
+        return key.hexdigest()
+
+    def create_df_cached(self):
+        """
+        Generates dataframe from cache entry of csv file or parses csv file and stores
+        selected columns as one .npy file per column in cache_dir/<cache key>/.
+        Cache is pruned to cache_max_bytes after every new entry, see prune_cache
         :return: pandas dataframe with data from csv file
         """
-        df = pd.read_csv(self.csv_file)
-        df = df[df.columns.intersection(list(self.headers.values()))]
+        content = self._read_content()
+        entry = os.path.join(self.cache_dir, self.cache_key(content))
+        try:
+            with open(os.path.join(entry, "columns.json")) as f:
+                columns = json.load(f)
+            # arrays are read whole, dataframe copies them into its own blocks anyway
+            df = pd.DataFrame({col: np.load(os.path.join(entry, "{}.npy".format(i)))
+                               for i, col in enumerate(columns)})
+            # entry marked as recently used, so it is pruned last
+            os.utime(entry)
+            return df
+        except FileNotFoundError:
+            # entry not stored yet or pruned meanwhile
+            pass
+
+        df = self._read_csv(io.BytesIO(content))
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_entry = tempfile.mkdtemp(prefix=CACHE_TMP_PREFIX, dir=self.cache_dir)
+        try:
+            for i, col in enumerate(df.columns):
+                np.save(os.path.join(tmp_entry, "{}.npy".format(i)), df[col].to_numpy())
+            with open(os.path.join(tmp_entry, "columns.json"), "w") as f:
+                json.dump(list(df.columns), f)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            # entry stored meanwhile by another worker or cache could not be written, parsed dataframe is used
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        prune_cache(self.cache_dir, self.cache_max_bytes)
+        return df
+
+    def _read_csv(self, csv_file):
+        first_line = csv_file.readline()
+        if isinstance(first_line, bytes):
+            first_line = first_line.decode("utf-8")
+        headers_csv = next(reader([first_line.lstrip("\ufeff")]))
+        self._verify_csv_header(headers_csv)
+
+        wanted = set(self.headers.values())
+        usecols = [i for i, col in enumerate(headers_csv) if col in wanted]
+        time_col = self.headers.get("time")
+        dtype = {i: np.float64 if headers_csv[i] == time_col else self.dtype for i in usecols}
+        df = pd.read_csv(csv_file, header=None, usecols=usecols, dtype=dtype, engine=self._get_engine(self.engine))
+        df.columns = [headers_csv[i] for i in usecols]
         return df
 
 
 class ForceCMJAttribute(CMJAttribute):
 
     def __init__(self, csv_path, headers={"time": "Time (s)", "left": "Left (N)", "right": "Right (N)",
-                                          "combined": "Combined (N)"}):
-        super().__init__(csv_path, headers)
+                                          "combined": "Combined (N)"}, **kwargs):
+        super().__init__(csv_path, headers, **kwargs)
 
 
 class VelocityCMJAttribute(CMJAttribute):
@@ -60,8 +197,8 @@ class VelocityCMJAttribute(CMJAttribute):
     Inherits from CMJAttribute
     """
 
-    def __init__(self, csv_path, headers={"time": "Time (s)", "velocity": "Velocity (M/s)"}):
-        super().__init__(csv_path, headers)
+    def __init__(self, csv_path, headers={"time": "Time (s)", "velocity": "Velocity (M/s)"}, **kwargs):
+        super().__init__(csv_path, headers, **kwargs)
 
 
 class CMJForceVelStats:
@@ -75,144 +212,324 @@ class CMJForceVelStats:
         """
         self.vel_attr = vel_attr
         self.force_attr = force_attr
-        self.df_base = pd.merge(vel_attr.df, force_attr.df, how="inner", on=join_on)
+        self.df_base = self.align(vel_attr.df, force_attr.df, join_on)
         self.g = 9.81
-        self.system_weight = self.get_system_weight(self.df_base, force_attr.headers["combined"])
+        force = self.df_base[force_attr.headers["combined"]].to_numpy(dtype=np.float64)
+        self.weight_window = window_samples(self.df_base[join_on].to_numpy())
+        # phases are searched after start of quiet standing, so stepping on the platform is not unweighting
+        self.quiet_start = find_quiet_window(force, self.weight_window)
+        self.system_weight = window_weight(force, self.quiet_start, self.weight_window)
 
     @staticmethod
-    def get_system_weight(df_base, col_name):
+    def grid_overlap(time_left, time_right):
+        """
+        Checks if both time arrays are sampled on the same evenly spaced grid
+        :return: tuple of start index in left, start index in right and number of
+            overlapping samples, None if grids differ
         """
-        Calculates system weight as mean from first 1000 entries in force data
+        if len(time_left) < 2 or len(time_right) < 2:
+            return None
+        interval = time_left[1] - time_left[0]
+        if interval <= 0 or not np.isclose(time_right[1] - time_right[0], interval, rtol=1e-6, atol=0):
+            return None
+        offset = (time_right[0] - time_left[0]) / interval
+        shift = int(round(offset))
+        if abs(offset - shift) > 1e-3:
+            return None
+        left_start, right_start = max(shift, 0), max(-shift, 0)
+        n = min(len(time_left) - left_start, len(time_right) - right_start)
+        if n <= 0:
+            return None
+        tolerance = interval * 1e-3
+        if not (np.allclose(np.diff(time_left), interval, rtol=0, atol=tolerance)
+                and np.allclose(np.diff(time_right), interval, rtol=0, atol=tolerance)
+                and np.allclose(time_left[left_start: left_start + n], time_right[right_start: right_start + n],
+                                rtol=0, atol=tolerance)):
+            return None
+        return left_start, right_start, n
+
+    @staticmethod
+    def align(vel_df, force_df, join_on, tolerance=None):
+        """
+        Joins velocity and force data on time column. Traces sampled on the same grid are
+        aligned by offset and their columns concatenated, without hash join on float time.
+        Otherwise rows with nearest time within tolerance are joined with merge_asof.
+        Only rows present in both traces are kept
+        :param join_on: name of time column
+        :param tolerance: max time difference of joined rows, half of sample interval if not set
+        :return: dataframe with velocity columns followed by force columns
+        """
+        time_vel = vel_df[join_on].to_numpy(dtype=np.float64)
+        time_force = force_df[join_on].to_numpy(dtype=np.float64)
+        overlap = CMJForceVelStats.grid_overlap(time_vel, time_force)
+        if overlap is not None:
+            vel_start, force_start, n = overlap
+            vel_part = vel_df.iloc[vel_start: vel_start + n].reset_index(drop=True)
+            force_part = force_df.drop(columns=join_on).iloc[force_start: force_start + n].reset_index(drop=True)
+            return pd.concat([vel_part, force_part], axis=1)
+
+        if tolerance is None:
+            tolerance = np.median(np.diff(time_vel)) / 2 if len(time_vel) > 1 else 0
+        force_df = force_df.assign(_force_row=np.arange(len(force_df)))
+        df = pd.merge_asof(vel_df, force_df, on=join_on, direction="nearest", tolerance=tolerance)
+        df = df[df["_force_row"].notna()].drop(columns="_force_row")
+        return df.reset_index(drop=True)
+
+    @staticmethod
+    def get_system_weight(df_base, col_name, window=1000):
+        """
+        Calculates system weight as mean from the most stable window of force data before take-off,
+        see service.system_weight.estimate_system_weight
         :param df_base: dataframe containing both velocity and force or only force
         :param col_name: name of column which contains combined force
+        :param window: number of samples in window, 1000 for 1 s at 1 kHz
         :return: tuple of mean and standard deviation of calculations
         """
-        df = df_base.iloc[0:1000]
-        return df[col_name].mean(), df[col_name].std()
+        return estimate_system_weight(df_base[col_name].to_numpy(dtype=np.float64), window)
 
     @staticmethod
-    def calculate_acceleration(df, time_interval, velocity_col):
+    def acceleration_array(velocity, time_interval):
+        """
+        Differentiates whole velocity column at once
+        :param velocity: array-like of velocity samples
+        :param time_interval: time between consecutive samples
+        :return: numpy array of acceleration, first value extrapolated as average of next 3 differences
+        """
         if time_interval > 0.01:
             raise ValueError("Time interval too small to safely interpolate first value")
-        first = 0
-        for index, row in df.iterrows():
-            if first == 0:
-                # assuming that first difference will be equal to average of next 3 differences
-                vel_diff = ((df.loc[index + 3, velocity_col] - df.loc[index + 2, velocity_col]) +
-                            (df.loc[index + 2, velocity_col] - df.loc[index + 1, velocity_col]) +
-                            (df.loc[index + 1, velocity_col] - df.loc[index, velocity_col])) / 3
-                df.loc[index, "Acceleration (m/s^2)"] = vel_diff / time_interval
-                first += 1
-            else:
-                df.loc[index, "Acceleration (m/s^2)"] = (
-                        (df.loc[index, velocity_col] - df.loc[index - 1, velocity_col]) / time_interval)
+        velocity = np.asarray(velocity, dtype=np.float64)
+        acceleration = np.empty_like(velocity)
+        acceleration[1:] = np.diff(velocity) / time_interval
+        if len(velocity) > 0:
+            acceleration[0] = CMJForceVelStats.first_acceleration(velocity, 0, time_interval)
+        return acceleration
+
+    @staticmethod
+    def first_acceleration(velocity, index, time_interval):
+        """
+        Acceleration of the first sample of a slice starting at index
+        assuming that first difference will be equal to average of next 3 differences
+        """
+        vel_diff = ((velocity[index + 3] - velocity[index + 2]) +
+                    (velocity[index + 2] - velocity[index + 1]) +
+                    (velocity[index + 1] - velocity[index])) / 3
+        return vel_diff / time_interval
+
+    @staticmethod
+    def calculate_acceleration(df, time_interval, velocity_col):
+        df = df.copy()
+        df["Acceleration (m/s^2)"] = CMJForceVelStats.acceleration_array(df[velocity_col].to_numpy(), time_interval)
         return df
 
-    def get_phases_idx(self):
+    @staticmethod
+    def first_true(mask, start=0):
+        """
+        Index of first True value in boolean array at or after start
+        :return: index or -1 when there is no such value
+        """
+        if start < 0 or start >= len(mask):
+            return -1
+        index = start + int(np.argmax(mask[start:]))
+        return index if mask[index] else -1
+
+    @staticmethod
+    def detect_phases(force, velocity, system_weight, search_from=0):
+        """
+        Finds phases of counter movement jump with threshold crossings on whole arrays
+        :param force: numpy array with combined force
+        :param velocity: numpy array with velocity sampled on the same grid as force
+        :param system_weight: tuple of mean and standard deviation of system weight
+        :param search_from: index from which unweighting is searched, e.g. start of quiet standing
+        :return: dict with tuples of start and end index of each phase, -1 if not found
+        """
         ind_unwght_start = -1
         ind_unwght_end = -1
         ind_brk_start = -1
         ind_brk_end = -1
         ind_prop_start = -1
         ind_prop_end = -1
-        force_col = self.force_attr.headers["combined"]
-        vel_col = self.vel_attr.headers["velocity"]
-
-        for index, row in self.df_base.iterrows():
-            # unweighting phase start
-            if ind_unwght_start < 0 and row[force_col] < self.system_weight[0] - 5 * self.system_weight[1]:
-                ind_unwght_start = index - 30  # minus 30 ms suggested by paper
-
-            # braking phase start when force equals to force in silent phase (weight
-            # of athlete)
-            if ind_unwght_start > 0 and ind_brk_start < 0:  # in unweighting phase (set ind) and ind_brk not set
-                if row[force_col] >= self.system_weight[0]:
-                    ind_brk_start = index
-                ind_unwght_end = ind_brk_start - 1
-
-            if ind_brk_start > 0 and ind_prop_start < 0:
-                if row[vel_col] >= 0.01:
-                    ind_prop_start = index
-                ind_brk_end = ind_prop_start - 1
-
-            if ind_prop_start > 0 and ind_prop_end < 0:
-                if row[force_col] < 10:
-                    ind_prop_end = index
+        first_true = CMJForceVelStats.first_true
+
+        # unweighting phase start minus 30 ms suggested by paper; crossings within
+        # first 30 samples would give negative index, hence search is repeated after them
+        unwght_mask = force < system_weight[0] - 5 * system_weight[1]
+        ind_unwght = first_true(unwght_mask, max(search_from, 30))
+        if ind_unwght >= 0:
+            ind_unwght_start = ind_unwght - 30
+        elif unwght_mask[search_from:30].any():
+            ind_unwght = search_from + int(np.flatnonzero(unwght_mask[search_from:30])[-1])
+            ind_unwght_start = ind_unwght - 30
+
+        # braking phase start when force equals to force in silent phase (weight of athlete)
+        if ind_unwght_start > 0:
+            ind_brk_start = first_true(force >= system_weight[0], ind_unwght)
+            ind_unwght_end = ind_brk_start - 1
+
+        if ind_brk_start > 0:
+            ind_prop_start = first_true(velocity >= 0.01, ind_brk_start)
+            ind_brk_end = ind_prop_start - 1
+
+        if ind_prop_start > 0:
+            ind_prop_end = first_true(force < 10, ind_prop_start)
 
         return {"unweighting": (ind_unwght_start, ind_unwght_end),
                 "braking": (ind_brk_start, ind_brk_end),
                 "propulsive": (ind_prop_start, ind_prop_end)}
 
-    def get_cmj_stats(self):
-        idxs = self.get_phases_idx()
-        ind_unwght_start = idxs["unweighting"][0]
-        ind_unwght_end = idxs["unweighting"][1]
-        ind_brk_start = idxs["braking"][0]
-        ind_brk_end = idxs["braking"][1]
-        ind_prop_start = idxs["propulsive"][0]
-        ind_prop_end = idxs["propulsive"][1]
-        vel_col = self.vel_attr.headers["velocity"]
-
-        df_unwght = self.calculate_acceleration(self.df_base.iloc[ind_unwght_start: ind_unwght_end], 0.001, vel_col)
-        df_brk = self.calculate_acceleration(self.df_base.iloc[ind_brk_start: ind_brk_end], 0.001, vel_col)
-        df_prop = self.calculate_acceleration(self.df_base.iloc[ind_prop_start: ind_prop_end], 0.001, vel_col)
-        df_neg_vel = self.calculate_acceleration(self.df_base.iloc[ind_unwght_start: ind_brk_end], 0.001, vel_col)
-        df_pos_a = self.calculate_acceleration(self.df_base.iloc[ind_brk_start: ind_prop_end], 0.001, vel_col)
-
-        """
-        print(ind_unwght_start)
-        print(ind_brk_start)
-        print(ind_prop_start)
-        print(ind_prop_end)
-        print("\n")
-        """
-        v_peak_prop_idx = df_prop["Velocity (M/s)"].idxmax()
-
-        stats = {'v_peak_prop': df_prop["Velocity (M/s)"].max(),
-                 'v_peak_neg': df_neg_vel["Velocity (M/s)"].min(),
-                 'v_avg_neg': df_neg_vel["Velocity (M/s)"].mean(),
-                 't_to_v_peak_prop': df_prop.loc[v_peak_prop_idx, "Time (s)"] - df_prop.loc[ind_prop_start, "Time (s)"],
-                 'v_avg_100_prop': df_prop.loc[ind_prop_start: ind_prop_start + 100, "Velocity (M/s)"].mean(),
-                 'a_avg_100_prop': df_prop.loc[ind_prop_start: ind_prop_start + 100, "Acceleration (m/s^2)"].mean(),
-                 'a_peak_100_prop': df_prop.loc[ind_prop_start: ind_prop_start + 100, "Acceleration (m/s^2)"].max(),
-                 'v_peak_100_prop': df_prop.loc[ind_prop_start: ind_prop_start + 100, "Velocity (M/s)"].max(),
-                 'a_peak_pos': df_pos_a["Acceleration (m/s^2)"].max()
-                 }
-        return stats
-
-        for key, item in stats.items():
-            print("{}: {:.4f}".format(key, item))
-
-        """
-        v_peak_prop = df_prop["Velocity (M/s)"].max()
-        v_peak_prop_idx = df_prop["Velocity (M/s)"].idxmax()
-        v_peak_neg = df_neg_vel["Velocity (M/s)"].min()
-        v_peak_neg_idx = df_neg_vel["Velocity (M/s)"].idxmin()
-        v_avg_neg = df_neg_vel["Velocity (M/s)"].mean()
-        t_to_v_peak_prop = df_prop.loc[v_peak_prop_idx, "Time (s)"] - df_prop.loc[ind_prop_start, "Time (s)"]
-        v_avg_100_prop = df_prop.loc[ind_prop_start: ind_prop_start + 100, "Velocity (M/s)"].mean()
-        a_avg_100_prop = df_prop.loc[ind_prop_start: ind_prop_start + 100, "Acceleration (m/s^2)"].mean()
-        a_peak_100_prop = df_prop.loc[ind_prop_start: ind_prop_start + 100, "Acceleration (m/s^2)"].max()
-        v_peak_100_prop = df_prop.loc[ind_prop_start: ind_prop_start + 100, "Velocity (M/s)"].max()
-        a_peak_pos = df_pos_a["Acceleration (m/s^2)"].max()
-
-        print("Time to v peak pos:                     {:.4f} s".format(t_to_v_peak_prop))
-        print("v peak pos:                             {:.4f} m/s".format(v_peak_prop))
-        print("v peak neg:                             {:.4f} m/s".format(v_peak_neg))
-        print("v avg 100ms pos:                        {:.4f} m/s".format(v_avg_100_prop))
-        print("a avg 100ms prop:                       {:.4f} m/s^2".format(a_avg_100_prop))
-        print("a peak 100ms prop:                      {:.4f} m/s^2".format(a_peak_100_prop))
-        print("v peak 100ms prop:                      {:.4f} m/s^2".format(v_peak_100_prop))
-        """
-        """
-        print("v peak neg /  Time to v peak pos:       {:.4f}".format(v_peak_neg / t_to_v_peak_prop))
-        print("v peak neg / V peak prop:               {:.4f}".format(v_peak_neg / v_peak_prop))
-        print("v avg neg / V peak prop:                {:.4f}".format(v_avg_neg / v_peak_prop))
-        print("v avg neg / first 100 ms v pos avg:     {:.4f} ".format(v_avg_neg / v_avg_100_prop))
-        print("v peak neg / first 100 ms v pos avg:    {:.4f}".format(v_peak_neg / v_avg_100_prop))
-        print("v avg neg / first 100 ms acc prop avg:  {:.4f}".format(v_avg_neg / a_avg_100_prop))
-        print("v peak neg / first 100 ms acc prop avg: {:.4f}".format(v_peak_neg / a_avg_100_prop))
+    def get_phases_idx(self):
+        force = self.df_base[self.force_attr.headers["combined"]].to_numpy(dtype=np.float64)
+        velocity = self.df_base[self.vel_attr.headers["velocity"]].to_numpy(dtype=np.float64)
+        return self.detect_phases(force, velocity, self.system_weight, self.quiet_start)
+
+    def get_cmj_stats(self, idxs=None, acc=None, windows=(100,)):
+        """
+        :param idxs: phases indexes from get_phases_idx, found if not provided
+        :param acc: acceleration of whole trace from acceleration_array, calculated if not provided
+        :param windows: lengths in ms of windows at start of propulsive phase, see service.cmj_metrics.cmj_metrics
+        :return: dict with stats
+        """
+        if idxs is None:
+            idxs = self.get_phases_idx()
+        time = self.df_base[self.vel_attr.headers["time"]].to_numpy()
+        vel = self.df_base[self.vel_attr.headers["velocity"]].to_numpy()
+        force = self.df_base[self.force_attr.headers["combined"]].to_numpy()
+        return cmj_metrics(time, vel, force, idxs, self.system_weight, 0.001, windows, acc)
+
+
+class CMJBatchStats:
+    """
+    Statistics of many counter movement jumps computed at once.
+    Traces are stacked into NaN padded 2-D arrays with one row per jump,
+    so phases and stats of every jump are found in the same array passes
+    """
+
+    def __init__(self, time: list, velocity: list, force: list, names: list = None, time_interval=0.001):
+        """
+        :param time: list of 1-D arrays with time of each jump
+        :param velocity: list of 1-D arrays with velocity of each jump
+        :param force: list of 1-D arrays with combined force of each jump, sampled on the same grid as velocity
+        :param names: list of jump names (e.g. filenames) used as index of results table
+        :param time_interval: time between consecutive samples
+        """
+        if not len(time) == len(velocity) == len(force):
+            raise ValueError("Different number of time, velocity and force traces")
+        self.names = list(names) if names is not None else list(range(len(time)))
+        self.time_interval = time_interval
+        self.lengths = np.array([len(t) for t in time], dtype=np.int64)
+        self.time = self.stack(time)
+        self.velocity = self.stack(velocity)
+        self.force = self.stack(force)
+        self.weight_window = window_samples(self.time)
+        self.quiet_start = find_quiet_window(self.force, self.weight_window)
+        self.system_weight = window_weight(self.force, self.quiet_start, self.weight_window)
+
+    @classmethod
+    def from_attributes(cls, attributes: list, names: list = None, join_on="Time (s)"):
+        """
+        :param attributes: list of tuples (velocity attribute, force attribute) of each jump
+        :param names: list of jump names
+        :param join_on: column on which joining should be performed between files
+        """
+        traces = [cls.aligned_trace(vel_attr, force_attr, join_on) for vel_attr, force_attr in attributes]
+        time, velocity, force = ([trace[i] for trace in traces] for i in range(3))
+        return cls(time, velocity, force, names)
+
+    @staticmethod
+    def aligned_trace(vel_attr, force_attr, join_on="Time (s)"):
+        """
+        :return: tuple of time, velocity and combined force arrays of one jump, aligned with CMJForceVelStats.align
+        """
+        df = CMJForceVelStats.align(vel_attr.df, force_attr.df, join_on)
+        return (df[join_on].to_numpy(dtype=np.float64),
+                df[vel_attr.headers["velocity"]].to_numpy(dtype=np.float64),
+                df[force_attr.headers["combined"]].to_numpy(dtype=np.float64))
+
+    @staticmethod
+    def stack(arrays):
+        """
+        :param arrays: list of 1-D arrays of different length
+        :return: 2-D array padded with NaN to the longest array
+        """
+        width = max((len(a) for a in arrays), default=0)
+        stacked = np.full((len(arrays), width), np.nan)
+        for row, a in enumerate(arrays):
+            stacked[row, :len(a)] = a
+        return stacked
+
+    @staticmethod
+    def get_system_weight(force, window=1000):
+        """
+        Calculates system weight of every jump from the most stable window of its force data
+        :return: tuple of arrays with mean and standard deviation
+        """
+        return estimate_system_weight(force, window)
+
+    @staticmethod
+    def first_true(mask, start):
+        """
+        Row-wise index of first True value at or after start
+        :param mask: 2-D boolean array
+        :param start: array with start index of every row, negative start means no search
+        :return: array of indexes, -1 when there is no such value
+        """
+        cols = np.arange(mask.shape[1])
+        mask = mask & (cols >= start[:, None])
+        index = np.argmax(mask, axis=1)
+        found = mask[np.arange(len(mask)), index] & (start >= 0)
+        return np.where(found, index, -1)
+
+    @staticmethod
+    def detect_phases(force, velocity, system_weight, search_from=None):
+        """
+        Row-wise equivalent of CMJForceVelStats.detect_phases
+        :param search_from: array with index from which unweighting is searched in every row
+        :return: dict with tuples of arrays of start and end index of each phase
         """
+        n = len(force)
+        no_search = np.full(n, -1)
+        first_true = CMJBatchStats.first_true
+        search_from = np.zeros(n, dtype=np.int64) if search_from is None else np.asarray(search_from)
+
+        unwght_mask = force < (system_weight[0] - 5 * system_weight[1])[:, None]
+        ind_unwght = first_true(unwght_mask, np.maximum(search_from, 30))
+        # crossing only within first 30 samples gives negative start, like in single jump detector
+        head = unwght_mask[:, :30] & (np.arange(min(30, unwght_mask.shape[1])) >= search_from[:, None])
+        head_found = (ind_unwght < 0) & head.any(axis=1)
+        last_in_head = head.shape[1] - 1 - np.argmax(head[:, ::-1], axis=1)
+        ind_unwght = np.where(head_found, last_in_head, ind_unwght)
+        ind_unwght_start = np.where(ind_unwght >= 0, ind_unwght - 30, -1)
+
+        searching = ind_unwght_start > 0
+        ind_brk_start = first_true(force >= system_weight[0][:, None], np.where(searching, ind_unwght, no_search))
+        ind_unwght_end = np.where(searching, ind_brk_start - 1, -1)
+
+        searching = ind_brk_start > 0
+        ind_prop_start = first_true(velocity >= 0.01, np.where(searching, ind_brk_start, no_search))
+        ind_brk_end = np.where(searching, ind_prop_start - 1, -1)
+
+        searching = ind_prop_start > 0
+        ind_prop_end = first_true(force < 10, np.where(searching, ind_prop_start, no_search))
+
+        return {"unweighting": (ind_unwght_start, ind_unwght_end),
+                "braking": (ind_brk_start, ind_brk_end),
+                "propulsive": (ind_prop_start, ind_prop_end)}
+
+    def get_phases_idx(self):
+        return self.detect_phases(self.force, self.velocity, self.system_weight, self.quiet_start)
+
+    def get_cmj_stats(self, windows=(100,)):
+        """
+        :param windows: lengths in ms of windows at start of propulsive phase, see service.cmj_metrics.cmj_metrics
+        :return: dataframe with stats of CMJForceVelStats.get_cmj_stats and phase indexes,
+            one row per jump, NaN for jumps where phases were not found
+        """
+        idxs = self.get_phases_idx()
+        stats = cmj_metrics(self.time, self.velocity, self.force, idxs, self.system_weight, self.time_interval,
+                            windows)
+        stats.update(zip(["ind_unwght_start", "ind_unwght_end", "ind_brk_start", "ind_brk_end",
+                          "ind_prop_start", "ind_prop_end"],
+                         idxs["unweighting"] + idxs["braking"] + idxs["propulsive"]))
+        return pd.DataFrame(stats, index=self.names)
 
 
 if __name__ == "__main__":
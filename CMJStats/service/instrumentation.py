@@ -0,0 +1,51 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Collects durations of pipeline stages (download, parse, merge etc.) of one job"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class Metrics:
+    """Process wide counters and stage timings exposed by /metrics endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.stages = {}
+
+    def incr(self, name: str, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, timings: dict):
+        """
+        :param timings: dict with stage name as key and duration in seconds as value, e.g. StageTimer.timings
+        """
+        with self._lock:
+            for name, seconds in timings.items():
+                stage = self.stages.setdefault(name, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+                stage["count"] += 1
+                stage["total_s"] += seconds
+                stage["max_s"] = max(stage["max_s"], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {name: dict(stage, mean_s=stage["total_s"] / stage["count"])
+                      for name, stage in self.stages.items()}
+            return {"counters": dict(self.counters), "stages": stages}
+
+
+metrics = Metrics()
@@ -0,0 +1,146 @@
+import datetime
+import os
+import sqlite3
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+
+from service.jump_name import jump_order, parse_jump_name
+
+INDEX_FIELDS = ("lastname", "firstname", "date", "time", "trial", "segment", "filename")
+
+
+def jump_entry(filename: str):
+    """
+    :param filename: canonical jump filename
+    :return: index entry of jump, every field is parsed from filename
+    """
+    name = parse_jump_name(filename)
+    return {"lastname": name.lastname, "firstname": name.firstname, "date": name.date.isoformat(),
+            "time": name.time, "trial": name.trial, "segment": name.segment, "filename": filename}
+
+
+def index_entries(rows: list):
+    """
+    Entries hold no results part file, results of jump are read from partition of its date
+    (service.results_store.ResultsStore.read_jumps), so entries stay valid when partition is compacted
+    :param rows: list of dicts from service.results_store.result_row
+    :return: list of index entries, one per jump
+    """
+    return [jump_entry(row["filename"]) for row in rows]
+
+
+def _date_bound(day):
+    return day.isoformat() if day is not None else None
+
+
+class SqliteJumpIndex:
+    """Index of jumps by athlete and date in SQLite database, for local runs and tests"""
+
+    def __init__(self, path: str):
+        """
+        :param path: path of database file, created when missing
+        """
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS jumps (lastname TEXT, firstname TEXT, date TEXT, "
+                               "time TEXT, trial INTEGER, segment INTEGER, filename TEXT)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jumps_athlete_date ON jumps (lastname, firstname, date)")
+            connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS jumps_filename ON jumps (filename)")
+
+    @contextmanager
+    def _connect(self):
+        # connection per call, so index can be used from any thread
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def add(self, entries: list):
+        """
+        :param entries: list of dicts from index_entries, jump computed again replaces its entry
+        """
+        with self._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO jumps VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                   [tuple(entry[field] for field in INDEX_FIELDS) for entry in entries])
+
+    def jumps_for(self, firstname: str, lastname: str, date_from=None, date_to=None):
+        """
+        :param date_from: datetime.date of first day (inclusive), no limit when None
+        :param date_to: datetime.date of last day (inclusive), no limit when None
+        :return: list of index entries of athlete sorted by service.jump_name.jump_order
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "SELECT {} FROM jumps WHERE lastname = ? AND firstname = ? AND date >= COALESCE(?, date) "
+                "AND date <= COALESCE(?, date) ORDER BY date, time, trial, segment".format(", ".join(INDEX_FIELDS)),
+                (lastname, firstname, _date_bound(date_from), _date_bound(date_to)))
+            return [dict(zip(INDEX_FIELDS, row)) for row in cursor.fetchall()]
+
+
+class BucketJumpIndex:
+    """
+    Index of jumps by athlete and date in bucket: {prefix}/athlete={lastname}_{firstname}/date=YYYY-MM-DD/{filename}.
+    There is one empty file per jump named after it, so jumps of athlete are found by listing athlete's directory
+    without downloading any file, concurrent instances never overwrite each other's entries
+    and jump computed again keeps one entry
+    """
+
+    def __init__(self, bucket, prefix="index", workers=8):
+        """
+        :param bucket: google.cloud.storage.Bucket or service.storage.LocalBucket
+        :param prefix: directory of index in bucket
+        :param workers: number of threads uploading index files in add
+        """
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.workers = workers
+
+    def athlete_prefix(self, firstname: str, lastname: str):
+        return "{}/athlete={}_{}/".format(self.prefix, quote(lastname, safe=""), quote(firstname, safe=""))
+
+    def blob_name(self, entry: dict):
+        return "{}date={}/{}".format(self.athlete_prefix(entry["firstname"], entry["lastname"]), entry["date"],
+                                     quote(entry["filename"], safe=""))
+
+    def add(self, entries: list):
+        """
+        :param entries: list of dicts from index_entries
+        """
+        if not entries:
+            return
+        with ThreadPoolExecutor(max_workers=max(min(self.workers, len(entries)), 1)) as pool:
+            list(pool.map(lambda entry: self.bucket.blob(self.blob_name(entry)).upload_from_string(b""), entries))
+
+    def jumps_for(self, firstname: str, lastname: str, date_from=None, date_to=None):
+        """
+        :param date_from: datetime.date of first day (inclusive), no limit when None
+        :param date_to: datetime.date of last day (inclusive), no limit when None
+        :return: list of index entries of athlete sorted by service.jump_name.jump_order
+        """
+        athlete_prefix = self.athlete_prefix(firstname, lastname)
+        entries = []
+        for blob in self.bucket.list_blobs(prefix=athlete_prefix + "date="):
+            day, filename = blob.name[len(athlete_prefix) + len("date="):].split("/", 1)
+            day = datetime.date.fromisoformat(day)
+            if (date_from is None or day >= date_from) and (date_to is None or day <= date_to):
+                entries.append(jump_entry(unquote(filename)))
+        return sorted(entries, key=jump_order)
+
+
+def jump_index(bucket, config):
+    """
+    :param bucket: bucket from service.storage.get_bucket
+    :param config: flask app config, JUMP_INDEX_BACKEND is "bucket" (default) or "sqlite",
+        JUMP_INDEX_PREFIX is directory of bucket index and JUMP_INDEX_PATH is path of SQLite database
+    """
+    backend = config.get("JUMP_INDEX_BACKEND", "bucket")
+    if backend == "sqlite":
+        return SqliteJumpIndex(config.get("JUMP_INDEX_PATH", "jump_index.sqlite"))
+    elif backend == "bucket":
+        return BucketJumpIndex(bucket, config.get("JUMP_INDEX_PREFIX", "index"))
+    raise ValueError("Unknown jump index backend: {}".format(backend))
@@ -0,0 +1,70 @@
+import re
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+# canonical name given to uploaded files by EntryPoint: First_Last-M_D_YYYY.csv, optionally with time
+# of export _HH-MM-SS and _{trial} (trial of export) after year. Jumps split from one recording
+# (service.session) get _s{segment} at the end. Surname may contain "_" and "-", so date is matched from the end
+JUMP_NAME_RE = re.compile(
+    r"^(?P<firstname>[^_]+)_(?P<lastname>.+)-"
+    r"(?P<month>\d{1,2})_(?P<day>\d{1,2})_(?P<year>\d{4})"
+    r"(?:_(?P<time>\d{1,2}-\d{2}-\d{2}))?"
+    r"(?:_(?P<trial>\d+))?"
+    r"(?:_s(?P<segment>\d+))?"
+    r"\.csv$",
+    re.IGNORECASE)
+
+JumpName = namedtuple("JumpName", ["firstname", "lastname", "date", "time", "trial", "segment"])
+
+
+def normalize_time(time):
+    """
+    :param time: time of export in format H-MM-SS or HH-MM-SS, None if missing
+    :return: time in format HH-MM-SS, so that times of one day sort as str
+    """
+    if time is None:
+        return None
+    hour, rest = time.split("-", 1)
+    return "{:02d}-{}".format(int(hour), rest)
+
+
+def jump_order(jump):
+    """
+    :param jump: JumpName or dict with date, time, trial and segment of jump
+    :return: key sorting jumps of athlete in order they were performed, missing fields first
+    """
+    if isinstance(jump, JumpName):
+        jump = jump._asdict()
+    return (jump["date"], jump.get("time") or "", jump.get("trial") if jump.get("trial") is not None else -1,
+            jump.get("segment") if jump.get("segment") is not None else -1)
+
+
+@lru_cache(maxsize=4096)
+def parse_jump_name(filename: str) -> JumpName:
+    """
+    :param filename: canonical jump filename, e.g. Adam_Lewandowski-10_14_2020_07-00-26_2.csv
+    :return: JumpName, time, trial and segment are None when not present in filename
+    """
+    match = JUMP_NAME_RE.match(filename)
+    if match is None:
+        raise ValueError("Wrong jump filename: {}".format(filename))
+    month, day, year = match.group("month", "day", "year")
+    trial, segment = match.group("trial", "segment")
+    return JumpName(firstname=match.group("firstname"),
+                    lastname=match.group("lastname"),
+                    date=date(int(year), int(month), int(day)),
+                    time=normalize_time(match.group("time")),
+                    trial=int(trial) if trial is not None else None,
+                    segment=int(segment) if segment is not None else None)
+
+
+def format_jump_name(name: JumpName) -> str:
+    """
+    :return: canonical jump filename of JumpName, inverse of parse_jump_name
+    """
+    time = "_{}".format(name.time) if name.time is not None else ""
+    trial = "_{}".format(name.trial) if name.trial is not None else ""
+    segment = "_s{}".format(name.segment) if name.segment is not None else ""
+    return "{}_{}-{}_{}_{}{}{}{}.csv".format(name.firstname, name.lastname, name.date.month, name.date.day,
+                                             name.date.year, time, trial, segment)
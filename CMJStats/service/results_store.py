@@ -0,0 +1,211 @@
+import datetime
+import io
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+from service.jump_name import parse_jump_name
+
+STATS_COLUMNS = ["v_peak_prop", "v_peak_neg", "v_avg_neg", "t_to_v_peak_prop", "v_avg_100_prop",
+                 "a_avg_100_prop", "a_peak_100_prop", "v_peak_100_prop", "a_peak_pos", "f_at_v_peak_prop",
+                 "net_impulse_brk", "net_impulse_prop", "jump_height", "rsi_mod"]
+PHASE_COLUMNS = ["ind_unwght_start", "ind_unwght_end", "ind_brk_start", "ind_brk_end",
+                 "ind_prop_start", "ind_prop_end"]
+# time of export, trial of export and segment of recording, see service.jump_name
+ORDER_COLUMNS = ["time", "trial", "segment"]
+ID_COLUMNS = ["filename", "firstname", "lastname", "date"] + ORDER_COLUMNS
+
+
+def phase_columns(idxs: dict):
+    """
+    :param idxs: phases indexes from CMJForceVelStats.get_phases_idx
+    :return: dict of phase indexes with names of CMJBatchStats.get_cmj_stats columns
+    """
+    return dict(zip(PHASE_COLUMNS, (int(i) for phase in ("unweighting", "braking", "propulsive")
+                                    for i in idxs[phase])))
+
+
+def result_row(filename: str, stats: dict, phases: dict):
+    """
+    :param filename: canonical jump filename, athlete, date, time, trial and segment are parsed from it
+    :param stats: dict from get_cmj_stats, stats of windows other than 100 ms are kept in extra columns
+    :param phases: dict from phase_columns
+    :return: dict with one row of results table
+    """
+    name = parse_jump_name(filename)
+    row = {"filename": filename, "firstname": name.firstname, "lastname": name.lastname,
+           "date": name.date, "time": name.time, "trial": name.trial, "segment": name.segment}
+    row.update({col: stats.get(col, np.nan) for col in STATS_COLUMNS})
+    row.update({col: value for col, value in stats.items() if col not in row})
+    row.update({col: phases.get(col, -1) for col in PHASE_COLUMNS})
+    return row
+
+
+class ResultsStore:
+    """
+    Results of computed jumps stored as parquet dataset in bucket, partitioned by date of jump:
+    {prefix}/date=YYYY-MM-DD/part-{id}.parquet. Every append writes new part files only,
+    so concurrent instances never overwrite each other; compact merges parts of partition into one file
+    """
+
+    def __init__(self, bucket, prefix="results", workers=8):
+        """
+        :param bucket: google.cloud.storage.Bucket or service.storage.LocalBucket
+        :param prefix: directory of dataset in bucket
+        :param workers: number of threads downloading part files in read
+        """
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.workers = workers
+
+    @staticmethod
+    def to_table(rows):
+        """
+        :param rows: list of dicts from result_row
+        :return: dataframe with typed columns of results table
+        """
+        columns = ID_COLUMNS + STATS_COLUMNS + PHASE_COLUMNS
+        extra = list(dict.fromkeys(col for row in rows for col in row if col not in columns))
+        df = pd.DataFrame(rows, columns=columns + extra)
+        df["date"] = pd.to_datetime(df["date"])
+        df["time"] = df["time"].astype(object)
+        df[["trial", "segment"]] = df[["trial", "segment"]].astype("Int64")
+        df[STATS_COLUMNS + extra] = df[STATS_COLUMNS + extra].astype(np.float64)
+        df[PHASE_COLUMNS] = df[PHASE_COLUMNS].astype(np.int64)
+        df["computed_at"] = pd.Timestamp(datetime.datetime.utcnow())
+        return df
+
+    def partition_prefix(self, day):
+        return "{}/date={}/".format(self.prefix, pd.Timestamp(day).date().isoformat())
+
+    def _write(self, df, blob_name):
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, engine="pyarrow", index=False)
+        self.bucket.blob(blob_name).upload_from_string(buffer.getvalue(), content_type="application/octet-stream")
+
+    def append(self, rows):
+        """
+        :param rows: list of dicts from result_row
+        :return: dict with datetime.date as key and name of part file written for that date as value
+        """
+        if not rows:
+            return {}
+        df = self.to_table(rows)
+        part = uuid.uuid4().hex
+        written = {}
+        for day, partition in df.groupby("date", sort=True):
+            blob_name = "{}part-{}.parquet".format(self.partition_prefix(day), part)
+            self._write(partition, blob_name)
+            written[pd.Timestamp(day).date()] = blob_name
+        return written
+
+    def _part_blobs(self, date_from=None, date_to=None):
+        blobs = []
+        for blob in self.bucket.list_blobs(prefix=self.prefix + "/date="):
+            if not blob.name.endswith(".parquet"):
+                continue
+            day = datetime.date.fromisoformat(blob.name[len(self.prefix) + len("/date="):].split("/", 1)[0])
+            if (date_from is None or day >= date_from) and (date_to is None or day <= date_to):
+                blobs.append(blob)
+        return blobs
+
+    def _partition_blobs(self, days):
+        def list_partition(day):
+            return [blob for blob in self.bucket.list_blobs(prefix=self.partition_prefix(day))
+                    if blob.name.endswith(".parquet")]
+
+        with ThreadPoolExecutor(max_workers=max(min(self.workers, len(days)), 1)) as pool:
+            return [blob for blobs in pool.map(list_partition, days) for blob in blobs]
+
+    @staticmethod
+    def _download(blob):
+        """
+        :return: content of part file, None when it was deleted since listing
+        """
+        try:
+            return blob.download_as_bytes()
+        except Exception:
+            if blob.exists():
+                raise
+            return None
+
+    def _read_parts(self, list_parts, attempts=3):
+        """
+        :param list_parts: function returning part blobs to read
+        :return: dataframe with latest row of every jump of all parts. When compact deleted listed part
+            before it was downloaded, parts are listed again, merged file holding its rows is written
+            before the part is deleted
+        """
+        for _ in range(attempts):
+            blobs = list_parts()
+            if not blobs:
+                return self.to_table([])
+            with ThreadPoolExecutor(max_workers=max(min(self.workers, len(blobs)), 1)) as pool:
+                contents = list(pool.map(self._download, blobs))
+            if all(content is not None for content in contents):
+                df = pd.concat([pd.read_parquet(io.BytesIO(content), engine="pyarrow") for content in contents],
+                               ignore_index=True)
+                # jump computed again is appended as new row, and listing between write of merged file
+                # and delete of its parts finds rows twice, latest result of every jump is kept
+                return df.sort_values("computed_at", kind="stable").drop_duplicates(
+                    "filename", keep="last", ignore_index=True)
+        raise FileNotFoundError("Part files of results under {} keep changing while read".format(self.prefix))
+
+    def read(self, date_from=None, date_to=None, firstname=None, lastname=None):
+        """
+        Loads results table in one pass, only partitions within dates are downloaded
+        :param date_from: datetime.date of first day (inclusive), no limit when None
+        :param date_to: datetime.date of last day (inclusive), no limit when None
+        :param firstname: athlete firstname to filter rows, no filter when None
+        :param lastname: athlete lastname to filter rows, no filter when None
+        :return: dataframe with results sorted by date, lastname, firstname, time, trial and segment
+        """
+        df = self._read_parts(lambda: self._part_blobs(date_from, date_to))
+        if firstname is not None:
+            df = df[df["firstname"] == firstname]
+        if lastname is not None:
+            df = df[df["lastname"] == lastname]
+        return df.sort_values(["date", "lastname", "firstname"] + ORDER_COLUMNS, kind="stable",
+                              na_position="first").reset_index(drop=True)
+
+    def read_jumps(self, entries: list):
+        """
+        Loads results of jumps found in service.jump_index, only partitions of their dates are listed
+        and downloaded, after compact with one request per date
+        :param entries: list of index entries with date and filename
+        :return: dataframe with latest result of every jump, sorted by date, time, trial and segment
+        """
+        days = sorted({entry["date"] for entry in entries})
+        if not days:
+            return self.to_table([])
+        df = self._read_parts(lambda: self._partition_blobs(days))
+        df = df[df["filename"].isin({entry["filename"] for entry in entries})]
+        # jumps without time, trial or segment first, in order of index entries (service.jump_name.jump_order)
+        return df.sort_values(["date"] + ORDER_COLUMNS, kind="stable", na_position="first").reset_index(drop=True)
+
+    def compact(self, day):
+        """
+        Merges part files of one date into single file, so that partition is read with one request.
+        Merged file is written before parts are deleted, so readers find every row at any time
+        :param day: datetime.date of partition
+        :return: name of merged file, None when partition has less than two parts
+        """
+        blobs = self._part_blobs(day, day)
+        if len(blobs) < 2:
+            return None
+        df = pd.concat([pd.read_parquet(io.BytesIO(blob.download_as_bytes()), engine="pyarrow") for blob in blobs],
+                       ignore_index=True)
+        blob_name = "{}part-{}.parquet".format(self.partition_prefix(day), uuid.uuid4().hex)
+        self._write(df, blob_name)
+        for blob in blobs:
+            blob.delete()
+        return blob_name
+
+
+def results_store(bucket, config):
+    """
+    :param bucket: bucket from service.storage.get_bucket
+    :param config: flask app config, RESULTS_PREFIX is directory of dataset in bucket
+    """
+    return ResultsStore(bucket, config.get("RESULTS_PREFIX", "results"))
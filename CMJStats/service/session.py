@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+from service.cmj_metrics import cmj_metrics
+from service.cmj_stats import CMJForceVelStats, CMJBatchStats
+from service.jump_name import parse_jump_name, format_jump_name
+from service.system_weight import rolling_mean_std, find_quiet_window, window_weight, window_samples
+
+PHASE_NAMES = ["ind_unwght_start", "ind_unwght_end", "ind_brk_start", "ind_brk_end",
+               "ind_prop_start", "ind_prop_end"]
+
+
+def next_true(mask):
+    """
+    :return: array with index of first True value at or after every index of 1-D mask, len(mask) when there is none
+    """
+    index = np.where(mask, np.arange(len(mask)), len(mask))
+    return np.minimum.accumulate(index[::-1])[::-1]
+
+
+def segment_jumps(force, system_weight, quiet_start=0, flight_threshold=10, min_flight=100, settle=250,
+                  settle_sd=3.0):
+    """
+    Splits recording with several jumps into trials in one pass over force. Flights are runs of force below
+    flight_threshold after athlete stepped on the platform, trial spans from landing of previous flight
+    (start of recording for first trial) to its own landing
+    :param force: 1-D array with combined force
+    :param system_weight: tuple of mean and standard deviation of system weight of session
+    :param quiet_start: index from which unweighting of first trial is searched, e.g. start of quiet standing
+    :param flight_threshold: force below which athlete is in the air
+    :param min_flight: number of samples of shortest flight taken as jump, shorter ones are noise
+    :param settle: number of samples of window in which athlete stands still again after landing
+    :param settle_sd: window is still when its mean and standard deviation are within settle_sd standard
+        deviations of system weight
+    :return: tuple of arrays with start, end (exclusive) and index from which unweighting is searched,
+        one value per trial. Whole recording is one trial when no flight is found
+    """
+    force = np.asarray(force, dtype=np.float64)
+    n = len(force)
+    standing = force >= 0.5 * np.nanmedian(force)
+    flight = np.maximum.accumulate(standing) & (force < flight_threshold)
+    edges = np.diff(flight.astype(np.int8), prepend=0, append=0)
+    take_offs, landings = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    jumps = landings - take_offs >= min_flight
+    take_offs, landings = take_offs[jumps], landings[jumps]
+    if len(landings) == 0:
+        return np.array([0]), np.array([n]), np.array([quiet_start])
+
+    # athlete stands still again once rolling window of force looks like quiet standing
+    settle = max(min(settle, n), 2)
+    mean, std = rolling_mean_std(force, settle)
+    tolerance = settle_sd * max(system_weight[1], 1.0)
+    still = np.zeros(n, dtype=bool)
+    still[:mean.shape[1]] = (np.abs(mean[0] - system_weight[0]) <= tolerance) & (std[0] <= tolerance)
+    settled = next_true(np.append(still, False))[np.minimum(landings[:-1], n)]
+    # when athlete did not stand still before next jump, search starts one window after landing
+    settled = np.where(settled < take_offs[1:], settled, np.minimum(landings[:-1] + settle, take_offs[1:]))
+
+    starts = np.concatenate([[0], landings[:-1]])
+    ends = landings.copy()
+    ends[-1] = n
+    search_from = np.concatenate([[max(quiet_start, 0)], settled])
+    return starts, ends, search_from
+
+
+def stack_segments(values, starts, ends):
+    """
+    :return: 2-D array with one segment of 1-D values per row, padded with NaN to the longest segment
+    """
+    width = int((ends - starts).max())
+    index = starts[:, None] + np.arange(width)
+    return np.where(index < ends[:, None], values[np.minimum(index, len(values) - 1)], np.nan)
+
+
+def trial_filename(filename: str, segment: int):
+    """
+    :param filename: canonical filename of recording
+    :param segment: number of jump in recording, from 1
+    :return: canonical filename of jump, segment is kept apart from trial of export (Hawkin trial suffix)
+    """
+    return format_jump_name(parse_jump_name(filename)._replace(segment=segment))
+
+
+class CMJSessionStats:
+    """
+    Statistics of every counter movement jump of one recording (session). System weight is estimated once
+    for session from quiet standing before first jump, recording is split into trials with segment_jumps
+    and trials are stacked into NaN padded 2-D arrays, so phases and stats of all trials are found
+    in the same array passes as in CMJBatchStats
+    """
+
+    def __init__(self, time, velocity, force, time_interval=0.001, **segment_kwargs):
+        """
+        :param time: 1-D array with time of recording
+        :param velocity: 1-D array with velocity
+        :param force: 1-D array with combined force, sampled on the same grid as velocity
+        :param time_interval: time between consecutive samples
+        :param segment_kwargs: kwargs of segment_jumps
+        """
+        self.time = np.asarray(time, dtype=np.float64)
+        self.velocity = np.asarray(velocity, dtype=np.float64)
+        self.force = np.asarray(force, dtype=np.float64)
+        self.time_interval = time_interval
+        self.weight_window = window_samples(self.time)
+        self.quiet_start = find_quiet_window(self.force, self.weight_window)
+        self.system_weight = window_weight(self.force, self.quiet_start, self.weight_window)
+        self.starts, self.ends, self.search_from = segment_jumps(self.force, self.system_weight, self.quiet_start,
+                                                                 **segment_kwargs)
+
+    @classmethod
+    def from_attributes(cls, vel_attr, force_attr, join_on="Time (s)", **kwargs):
+        df = CMJForceVelStats.align(vel_attr.df, force_attr.df, join_on)
+        return cls(df[join_on].to_numpy(dtype=np.float64),
+                   df[vel_attr.headers["velocity"]].to_numpy(dtype=np.float64),
+                   df[force_attr.headers["combined"]].to_numpy(dtype=np.float64), **kwargs)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def get_cmj_stats(self, windows=(100,)):
+        """
+        :param windows: lengths in ms of windows at start of propulsive phase, see service.cmj_metrics.cmj_metrics
+        :return: dataframe with stats of CMJForceVelStats.get_cmj_stats and phase indexes in recording,
+            one row per trial indexed by segment from 1, NaN for trials where phases were not found
+        """
+        time, velocity, force = (stack_segments(values, self.starts, self.ends)
+                                 for values in (self.time, self.velocity, self.force))
+        system_weight = tuple(np.full(len(self), value) for value in self.system_weight)
+        idxs = CMJBatchStats.detect_phases(force, velocity, system_weight, self.search_from - self.starts)
+        stats = cmj_metrics(time, velocity, force, idxs, system_weight, self.time_interval, windows)
+        for name, index in zip(PHASE_NAMES, idxs["unweighting"] + idxs["braking"] + idxs["propulsive"]):
+            stats[name] = np.where(index >= 0, index + self.starts, -1)
+        return pd.DataFrame(stats, index=pd.RangeIndex(1, len(self) + 1, name="segment"))
+
+
+def session_summary(trials: list, best_by="v_peak_prop"):
+    """
+    :param trials: list of tuples of trial filename and stats
+    :param best_by: stat by which best trial is chosen, higher is better
+    :return: dict with stats of every trial, of best trial (with its filename) and mean of every stat over
+        trials where it was found
+    """
+    table = pd.DataFrame([stats for _, stats in trials], index=[filename for filename, _ in trials],
+                         dtype=np.float64)
+    best = None
+    if best_by in table and table[best_by].notna().any():
+        best_filename = table[best_by].idxmax()
+        best = dict(trials[table.index.get_loc(best_filename)][1], filename=best_filename)
+    return {"trials": dict(trials), "best": best, "mean": table.mean().to_dict()}
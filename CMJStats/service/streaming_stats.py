@@ -0,0 +1,238 @@
+import numpy as np
+
+from service.cmj_metrics import G
+from service.cmj_stats import CMJForceVelStats
+from service.system_weight import find_quiet_window, window_weight
+
+
+class _RunningWindow:
+    """
+    Running count, sum, min and max of samples from start (inclusive) to end (exclusive)
+    index of a trace which is fed in chunks. End may be unknown when window is opened
+    """
+
+    def __init__(self, start: int, end=None):
+        self.start = start
+        self.end = end
+        self.next = start
+        self.count = 0
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self.argmax = None
+        self.at_argmax = ()
+
+    def close(self, end: int):
+        self.end = end if self.end is None else min(self.end, end)
+
+    def feed(self, values, offset: int, upto: int, at_max=()):
+        """
+        :param values: chunk of samples
+        :param offset: index of first sample of chunk in whole trace
+        :param upto: index up to which (exclusive) samples can be added to window
+        :param at_max: tuple of other chunks (e.g. time), their samples at max value are kept in at_argmax
+        """
+        hi = upto if self.end is None else min(upto, self.end)
+        lo = max(self.next, offset)
+        if hi <= lo:
+            return
+        segment = values[lo - offset: hi - offset]
+        self.count += len(segment)
+        self.sum += segment.sum()
+        self.min = min(self.min, segment.min())
+        seg_argmax = int(np.argmax(segment))
+        if segment[seg_argmax] > self.max:
+            self.max = segment[seg_argmax]
+            self.argmax = lo + seg_argmax
+            self.at_argmax = tuple(other[lo - offset + seg_argmax] for other in at_max)
+        self.next = hi
+
+
+class StreamingCMJStats:
+    """
+    Streaming variant of CMJForceVelStats. Force and velocity samples are pushed in chunks
+    while trace is still recorded and stats are emitted as soon as end of propulsive phase
+    is found. Apart from first samples kept for system weight, only last few samples
+    and running aggregates of phases are stored, so memory does not grow with recording length.
+    System weight is estimated from the most stable window within first weight_search samples only,
+    while CMJForceVelStats searches all samples before take-off. Stats are the same as of
+    CMJForceVelStats.get_cmj_stats with the same windows when that window lies within first weight_search
+    samples, i.e. quiet standing is shorter than about weight_search - weight_samples samples. With longer
+    quiet standing system weight, and so net impulses and possibly phases, may differ; weight_search
+    can be raised to cover it, at cost of more samples buffered before phases are searched
+    """
+    UNWEIGHTING_OFFSET = 30
+    # samples kept between chunks: unweighting offset and one sample of lag, as
+    # end of negative velocity window is known one sample after it
+    TAIL = UNWEIGHTING_OFFSET + 1
+
+    def __init__(self, time_interval=0.001, weight_samples=1000, weight_search=2000, windows=(100,)):
+        """
+        :param time_interval: time between consecutive samples
+        :param weight_samples: number of samples in window from which system weight is calculated
+        :param weight_search: number of first samples searched for the most stable window, they are buffered
+            until system weight is estimated and should cover quiet standing, see class docstring
+        :param windows: lengths in ms of windows at start of propulsive phase, see service.cmj_metrics.cmj_metrics
+        """
+        self.time_interval = time_interval
+        self.windows = tuple(windows)
+        self.weight_samples = weight_samples
+        self.weight_search = max(weight_search, weight_samples)
+        self.system_weight = None
+        self.stats = None
+        self.failed = False
+        self.n_samples = 0
+        self._weighing = ([], [], [])
+        self._tail = (np.empty(0), np.empty(0), np.empty(0))
+        self._search_from = 0
+        self._idx = {}
+        self._heads = {}
+        self._windows = {}
+
+    @property
+    def done(self):
+        return self.stats is not None or self.failed
+
+    def push(self, time, force, velocity):
+        """
+        :param time: chunk of time samples
+        :param force: chunk of combined force samples
+        :param velocity: chunk of velocity samples on the same grid as force
+        :return: dict with stats of CMJForceVelStats.get_cmj_stats once propulsive phase
+            has ended, None before that
+        """
+        if self.done:
+            return self.stats
+        chunk = tuple(np.asarray(a, dtype=np.float64) for a in (time, force, velocity))
+        if self.system_weight is None:
+            for buffer, values in zip(self._weighing, chunk):
+                buffer.append(values)
+            if sum(len(values) for values in self._weighing[1]) < self.weight_search:
+                return None
+            chunk = tuple(np.concatenate(buffer) for buffer in self._weighing)
+            searched = chunk[1][:self.weight_search]
+            quiet_start = find_quiet_window(searched, self.weight_samples)
+            self.system_weight = window_weight(searched, quiet_start, self.weight_samples)
+            self._search_from = quiet_start
+            self._weighing = None
+            self.n_samples = 0
+        return self._process(*chunk)
+
+    def get_phases_idx(self):
+        """
+        :return: phases indexes in format of CMJForceVelStats.get_phases_idx, -1 for phases not found yet
+        """
+        idx = self._idx
+        return {"unweighting": (idx.get("unwght_start", -1), idx.get("brk_start", 0) - 1),
+                "braking": (idx.get("brk_start", -1), idx.get("prop_start", 0) - 1),
+                "propulsive": (idx.get("prop_start", -1), idx.get("prop_end", -1))}
+
+    def _process(self, time, force, velocity):
+        tail_time, tail_force, tail_vel = self._tail
+        offset = self.n_samples - len(tail_vel)
+        time = np.concatenate([tail_time, time])
+        force = np.concatenate([tail_force, force])
+        velocity = np.concatenate([tail_vel, velocity])
+        end = offset + len(velocity)
+        self.n_samples = end
+        self._detect(time, force, velocity, offset)
+
+        acc = np.diff(velocity) / self.time_interval
+        for name, window in self._windows.items():
+            if name == "v_prop":
+                window.feed(velocity, offset, end - 1, (time, force))
+            elif name.startswith("v_"):
+                window.feed(velocity, offset, end - 1)
+            elif name.startswith("f_"):
+                window.feed(force, offset, end - 1)
+            else:
+                window.feed(acc, offset + 1, end - 1)
+        for name, start in (("brk", self._idx.get("brk_start")), ("prop", self._idx.get("prop_start"))):
+            if start is not None and name not in self._heads and start + 3 < end:
+                self._heads[name] = CMJForceVelStats.first_acceleration(velocity, start - offset, self.time_interval)
+
+        self._tail = (time[-self.TAIL:], force[-self.TAIL:], velocity[-self.TAIL:])
+        if "prop_end" in self._idx and len(self._heads) == 2:
+            self.stats = self._get_stats()
+        return self.stats
+
+    def _detect(self, time, force, velocity, offset):
+        """Advances phase state machine over chunk, same thresholds as CMJForceVelStats.detect_phases"""
+        first_true = CMJForceVelStats.first_true
+        weight_mean, weight_std = self.system_weight
+        idx = self._idx
+        while not self.failed and "prop_end" not in idx:
+            start = max(self._search_from, offset) - offset
+            if "unwght" not in idx:
+                found = first_true(force < weight_mean - 5 * weight_std, max(start, self.UNWEIGHTING_OFFSET - offset))
+            elif "brk_start" not in idx:
+                found = first_true(force >= weight_mean, start)
+            elif "prop_start" not in idx:
+                found = first_true(velocity >= 0.01, start)
+            else:
+                found = first_true(force < 10, start)
+            if found < 0:
+                self._search_from = offset + len(force)
+                return
+            found += offset
+            self._search_from = found
+
+            if "unwght" not in idx:
+                idx["unwght"] = found
+                idx["unwght_start"] = found - self.UNWEIGHTING_OFFSET
+                if idx["unwght_start"] <= 0:
+                    # no braking phase is searched for in that case by CMJForceVelStats.detect_phases
+                    self.failed = True
+                    return
+                idx["unwght_start_time"] = time[idx["unwght_start"] - offset]
+                self._windows["v_neg"] = _RunningWindow(idx["unwght_start"])
+            elif "brk_start" not in idx:
+                idx["brk_start"] = found
+                self._windows["a_pos"] = _RunningWindow(found + 1)
+                self._windows["f_brk"] = _RunningWindow(found)
+            elif "prop_start" not in idx:
+                idx["prop_start"] = found
+                idx["prop_start_time"] = time[found - offset]
+                self._windows["v_neg"].close(found - 1)
+                self._windows["f_brk"].close(found)
+                self._windows["v_prop"] = _RunningWindow(found)
+                self._windows["f_prop"] = _RunningWindow(found)
+                for ms in self.windows:
+                    window_end = found + int(round(ms / 1000 / self.time_interval)) + 1
+                    self._windows["v_{}".format(ms)] = _RunningWindow(found, window_end)
+                    self._windows["a_{}".format(ms)] = _RunningWindow(found + 1, window_end)
+            else:
+                idx["prop_end"] = found
+                idx["prop_end_time"] = time[found - offset]
+                idx["take_off_velocity"] = velocity[found - offset]
+                for name, window in self._windows.items():
+                    if name not in ("v_neg", "f_brk"):
+                        window.close(found)
+
+    def _get_stats(self):
+        w = self._windows
+        idx = self._idx
+        head_prop = self._heads["prop"]
+        head_brk = self._heads["brk"]
+        weight_mean = self.system_weight[0]
+        # take-off at first sample of propulsive phase leaves its windows empty, their peaks and means
+        # are NaN as in service.cmj_metrics.cmj_metrics
+        t_v_peak, f_v_peak = w["v_prop"].at_argmax if w["v_prop"].count else (np.nan, np.nan)
+        stats = {'v_peak_prop': w["v_prop"].max if w["v_prop"].count else np.nan,
+                 'v_peak_neg': w["v_neg"].min,
+                 'v_avg_neg': w["v_neg"].sum / w["v_neg"].count,
+                 't_to_v_peak_prop': t_v_peak - idx["prop_start_time"]}
+        for ms in self.windows:
+            v_window, a_window = w["v_{}".format(ms)], w["a_{}".format(ms)]
+            stats['v_avg_{}_prop'.format(ms)] = v_window.sum / v_window.count if v_window.count else np.nan
+            stats['a_avg_{}_prop'.format(ms)] = (head_prop + a_window.sum) / (a_window.count + 1)
+            stats['a_peak_{}_prop'.format(ms)] = max(head_prop, a_window.max)
+            stats['v_peak_{}_prop'.format(ms)] = v_window.max if v_window.count else np.nan
+        jump_height = idx["take_off_velocity"] ** 2 / (2 * G)
+        stats.update({'a_peak_pos': max(head_brk, w["a_pos"].max),
+                      'f_at_v_peak_prop': f_v_peak,
+                      'net_impulse_brk': (w["f_brk"].sum - weight_mean * w["f_brk"].count) * self.time_interval,
+                      'net_impulse_prop': (w["f_prop"].sum - weight_mean * w["f_prop"].count) * self.time_interval,
+                      'jump_height': jump_height,
+                      'rsi_mod': jump_height / (idx["prop_end_time"] - idx["unwght_start_time"])})
+        return stats
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+def rolling_mean_std(force, window: int):
+    """
+    Rolling mean and standard deviation (ddof=1) calculated with cumulative sums in O(n)
+    :param force: 1-D array or 2-D array with one trace per row
+    :param window: number of samples in window
+    :return: tuple of 2-D arrays of mean and std of windows starting at every sample,
+        NaN for windows containing NaN
+    """
+    force = np.atleast_2d(np.asarray(force, dtype=np.float64))
+    # shifted by first sample of each row, so sums of squares do not lose precision
+    x = force - force[:, :1]
+    zeros = np.zeros((len(x), 1))
+    sum1 = np.concatenate([zeros, np.cumsum(x, axis=1)], axis=1)
+    sum2 = np.concatenate([zeros, np.cumsum(x * x, axis=1)], axis=1)
+    s1 = sum1[:, window:] - sum1[:, :-window]
+    s2 = sum2[:, window:] - sum2[:, :-window]
+    mean = s1 / window + force[:, :1]
+    var = (s2 - s1 * s1 / window) / max(window - 1, 1)
+    return mean, np.sqrt(np.clip(var, 0, None))
+
+
+def window_samples(time, seconds=1.0):
+    """
+    :param time: 1-D or 2-D array of time samples
+    :param seconds: length of window in seconds
+    :return: number of samples in window, from median sample interval (1000 if it cannot be found)
+    """
+    time = np.atleast_2d(np.asarray(time, dtype=np.float64))
+    if time.shape[1] < 2:
+        return 1000
+    interval = np.nanmedian(np.diff(time, axis=1))
+    if not np.isfinite(interval) or interval <= 0:
+        return 1000
+    return int(round(seconds / interval))
+
+
+def find_quiet_window(force, window=1000, flight_threshold=10):
+    """
+    Finds the most stable window of quiet standing, i.e. window with the lowest standard deviation.
+    Windows are searched before take-off (first force below flight_threshold after force reached
+    half of its median), so flight phase is never taken as quiet one, and only among windows in which
+    athlete stands on the platform (every force at least half of median), so empty platform before athlete
+    stepped on is never taken either. When no such window fits before take-off, windows with athlete off
+    the platform are searched as well, and when no window fits at all, the first one is taken
+    :param force: 1-D array with combined force or 2-D array with one trace per row (NaN padded)
+    :param window: number of samples in window, 1000 for 1 s at 1 kHz
+    :param flight_threshold: force below which athlete is in the air
+    :return: index of first sample of window, array with index per row for 2-D force
+    """
+    force = np.asarray(force, dtype=np.float64)
+    single = force.ndim == 1
+    force = np.atleast_2d(force)
+    window = max(min(window, force.shape[1]), 2)
+
+    mean, std = rolling_mean_std(force, window)
+    # athlete stands on the platform once force reaches half of median force (close to body weight)
+    standing = force >= 0.5 * np.nanmedian(force, axis=1)[:, None]
+    off_plate = np.maximum.accumulate(standing, axis=1) & (force < flight_threshold)
+    take_off = np.where(off_plate.any(axis=1), np.argmax(off_plate, axis=1), force.shape[1])
+    starts = np.arange(std.shape[1])
+    valid = (starts <= (take_off - window)[:, None]) & np.isfinite(std)
+    # number of samples off the platform in every window, from prefix sums
+    off = np.concatenate([np.zeros((len(force), 1)), np.cumsum(~standing, axis=1)], axis=1)
+    on_plate = valid & (off[:, window:] - off[:, :-window] == 0)
+    valid = np.where(on_plate.any(axis=1)[:, None], on_plate, valid)
+    best = np.where(valid.any(axis=1), np.argmin(np.where(valid, std, np.inf), axis=1), 0)
+    return int(best[0]) if single else best
+
+
+def window_weight(force, start, window=1000):
+    """
+    :param force: 1-D or 2-D array with combined force
+    :param start: index of first sample of window, array with index per row for 2-D force
+    :param window: number of samples in window
+    :return: tuple of mean and standard deviation of force in window
+    """
+    force = np.asarray(force, dtype=np.float64)
+    single = force.ndim == 1
+    force = np.atleast_2d(force)
+    window = max(min(window, force.shape[1]), 2)
+    start = np.clip(np.atleast_1d(start), 0, force.shape[1] - window)
+    selected = np.take_along_axis(force, start[:, None] + np.arange(window), axis=1)
+    weight_mean = np.nanmean(selected, axis=1)
+    weight_std = np.nanstd(selected, axis=1, ddof=1)
+    if single:
+        return weight_mean[0], weight_std[0]
+    return weight_mean, weight_std
+
+
+def estimate_system_weight(force, window=1000, flight_threshold=10):
+    """
+    Estimates system weight from the most stable window of quiet standing, see find_quiet_window
+    :param force: 1-D array with combined force or 2-D array with one trace per row (NaN padded)
+    :param window: number of samples in window, 1000 for 1 s at 1 kHz
+    :param flight_threshold: force below which athlete is in the air
+    :return: tuple of mean and standard deviation, arrays with value per row for 2-D force
+    """
+    return window_weight(force, find_quiet_window(force, window, flight_threshold), window)
@@ -1,32 +1,255 @@
+import io
 import os
-from service.cmj_stats import VelocityCMJAttribute, ForceCMJAttribute, CMJForceVelStats
-from google.cloud import storage
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from service.cmj_stats import VelocityCMJAttribute, ForceCMJAttribute, CMJForceVelStats, CMJBatchStats
+from service.storage import get_bucket, bucket_config
+from service.instrumentation import StageTimer, metrics
+from service.results_store import phase_columns, result_row, results_store, PHASE_COLUMNS
+from service.jump_index import index_entries, jump_index
+from service.trends import trend_store
+from service.session import CMJSessionStats, session_summary, trial_filename
 from flask import current_app
-import tempfile
-from service.cloud_logging import log_message
+from service.cloud_logging import log_struct
 
 
-def thread_func_gcloud(filenames: list[str], force_subdir: str, velocity_subdir: str):
-    storage_client = storage.Client()
-    bucket = storage_client.get_bucket(current_app.config["UPLOAD_FOLDER"])
-    for filename in filenames:
-        blob = storage.Blob("{}{}".format(force_subdir, filename), bucket)
-        with tempfile.TemporaryFile() as tf:
-            storage_client.download_blob_to_file(blob, tf)
-            tf.seek(0)
-            cmj_force_attr = ForceCMJAttribute(tf)
-        blob.delete()
-        blob = bucket.blob(r"{}{}".format(velocity_subdir, filename))
-        with tempfile.TemporaryFile() as tf:
-            storage_client.download_blob_to_file(blob, tf)
-            tf.seek(0)
-            cmj_vel_attr = VelocityCMJAttribute(tf)
-        blob.delete()
-        blob = bucket.blob(r"stats/{}".format(filename))
+def _download(bucket, filename: str, force_subdir: str, velocity_subdir: str):
+    force_content = bucket.blob("{}{}".format(force_subdir, filename)).download_as_bytes()
+    velocity_content = bucket.blob(r"{}{}".format(velocity_subdir, filename)).download_as_bytes()
+    return velocity_content, force_content
+
+
+def _delete_sources(bucket, filenames: list[str], force_subdir: str, velocity_subdir: str, workers: int):
+    """
+    Deletes force and velocity files of recordings whose results were stored. Files which failed are kept,
+    so request can be retried with them
+    :return: list of names of blobs which could not be deleted
+    """
+    blobs = [bucket.blob("{}{}".format(subdir, filename)) for filename in filenames
+             for subdir in (force_subdir, velocity_subdir)]
+    if not blobs:
+        return []
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(blobs)), 1)) as pool:
+        errors = list(pool.map(lambda blob: _attempt(blob.delete)[1], blobs))
+    return [blob.name for blob, error in zip(blobs, errors) if error is not None]
+
+
+def _attempt(func, *args):
+    """
+    Module level function, so it can be sent to worker processes
+    :return: tuple of result of func and None, or None and error message when func raised
+    """
+    try:
+        return func(*args), None
+    except Exception as e:
+        return None, "{}: {}".format(type(e).__name__, e)
+
+
+def _parse(velocity_content: bytes, force_content: bytes, cache_dir=None, cache_max_bytes=None):
+    # blobs are parsed straight from memory, no temp file round-trip
+    cmj_force_attr = ForceCMJAttribute(io.BytesIO(force_content), cache_dir=cache_dir,
+                                       cache_max_bytes=cache_max_bytes)
+    cmj_vel_attr = VelocityCMJAttribute(io.BytesIO(velocity_content), cache_dir=cache_dir,
+                                        cache_max_bytes=cache_max_bytes)
+    return cmj_vel_attr, cmj_force_attr
+
+
+def compute_file(filename: str, force_subdir: str, velocity_subdir: str, storage_config: dict, cache_dir=None,
+                 windows=(100,), cache_max_bytes=None):
+    """
+    Downloads force and velocity file and computes stats of single jump.
+    Module level function, so it can be sent to worker processes
+    :param storage_config: kwargs of service.storage.get_bucket
+    :param cache_dir: directory of parsed csv cache, see service.cmj_stats.CMJAttribute
+    :param windows: lengths in ms of windows at start of propulsive phase, see service.cmj_metrics.cmj_metrics
+    :param cache_max_bytes: max size of parsed csv cache, see service.cmj_stats.prune_cache
+    :return: tuple of filename, stats, phase indexes (see service.results_store.phase_columns)
+        and durations of stages
+    """
+    timer = StageTimer()
+    bucket = get_bucket(**storage_config)
+    with timer.stage("download"):
+        contents = _download(bucket, filename, force_subdir, velocity_subdir)
+    with timer.stage("parse"):
+        cmj_vel_attr, cmj_force_attr = _parse(*contents, cache_dir, cache_max_bytes)
+    with timer.stage("merge"):
         cmj = CMJForceVelStats(cmj_vel_attr, cmj_force_attr, "Time (s)")
-        stats = cmj.get_cmj_stats()
-        with tempfile.TemporaryFile(mode="w+t") as tf:
-            tf.write(str(stats))
-            tf.seek(0)
-            blob.upload_from_file(tf)
-        log_message(str(stats))
+    with timer.stage("phases"):
+        idxs = cmj.get_phases_idx()
+    with timer.stage("acceleration"):
+        acc = cmj.acceleration_array(cmj.df_base[cmj_vel_attr.headers["velocity"]].to_numpy(), 0.001)
+    with timer.stage("stats"):
+        stats = cmj.get_cmj_stats(idxs, acc, windows)
+    return filename, stats, phase_columns(idxs), timer.timings
+
+
+def compute_batch(filenames: list[str], force_subdir: str, velocity_subdir: str, storage_config: dict, workers: int,
+                  cache_dir=None, windows=(100,), cache_max_bytes=None):
+    """
+    Downloads all files in threads and computes stats of all jumps with CMJBatchStats.
+    Files which fail to download, parse or align are left out of array job
+    :return: tuple of list of tuples of filename, stats, phase indexes and durations of stages of whole batch,
+        and dict with failed filename as key and error message as value
+    """
+    timer = StageTimer()
+    bucket = get_bucket(**storage_config)
+    failed = {}
+
+    def succeeded(names, attempts):
+        """:return: tuple of names and results of attempts which succeeded, errors of others are kept in failed"""
+        kept_names, results = [], []
+        for name, (result, error) in zip(names, attempts):
+            if error is None:
+                kept_names.append(name)
+                results.append(result)
+            else:
+                failed[name] = error
+        return kept_names, results
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        with timer.stage("download"):
+            names, contents = succeeded(filenames, pool.map(
+                lambda filename: _attempt(_download, bucket, filename, force_subdir, velocity_subdir), filenames))
+        with timer.stage("parse"):
+            names, attributes = succeeded(names, [_attempt(_parse, *content, cache_dir, cache_max_bytes)
+                                                  for content in contents])
+        with timer.stage("merge"):
+            names, traces = succeeded(names, [_attempt(CMJBatchStats.aligned_trace, *attribute)
+                                              for attribute in attributes])
+    if not names:
+        return [], failed
+    with timer.stage("stats"):
+        stats_table, error = _attempt(lambda: CMJBatchStats(*([trace[i] for trace in traces] for i in range(3)),
+                                                            names).get_cmj_stats(windows))
+    if error is not None:
+        failed.update(dict.fromkeys(names, error))
+        return [], failed
+    stats_columns = [col for col in stats_table.columns if col not in PHASE_COLUMNS]
+    return [(filename, {col: float(row[col]) for col in stats_columns},
+             {col: int(row[col]) for col in PHASE_COLUMNS}, timer.timings)
+            for filename, row in stats_table.iterrows()], failed
+
+
+def compute_session(filename: str, force_subdir: str, velocity_subdir: str, storage_config: dict, cache_dir=None,
+                    windows=(100,), cache_max_bytes=None):
+    """
+    Downloads force and velocity file of recording with several jumps and computes stats of every trial
+    with CMJSessionStats. Module level function, so it can be sent to worker processes
+    :return: tuple of filename, list of tuples of trial filename (see service.session.trial_filename), stats
+        and phase indexes, and durations of stages
+    """
+    timer = StageTimer()
+    bucket = get_bucket(**storage_config)
+    with timer.stage("download"):
+        contents = _download(bucket, filename, force_subdir, velocity_subdir)
+    with timer.stage("parse"):
+        cmj_vel_attr, cmj_force_attr = _parse(*contents, cache_dir, cache_max_bytes)
+    with timer.stage("merge"):
+        session = CMJSessionStats.from_attributes(cmj_vel_attr, cmj_force_attr)
+    with timer.stage("stats"):
+        stats_table = session.get_cmj_stats(windows)
+    stats_columns = [col for col in stats_table.columns if col not in PHASE_COLUMNS]
+    trials = [(trial_filename(filename, segment), {col: float(row[col]) for col in stats_columns},
+               {col: int(row[col]) for col in PHASE_COLUMNS}) for segment, row in stats_table.iterrows()]
+    return filename, trials, timer.timings
+
+
+def _fan_out(func, filenames: list[str], executor: str, workers: int, *args):
+    """
+    Runs func(filename, *args) for every file one after another (serial) or across thread or process pool,
+    error of one file does not stop others
+    :return: tuple of list of results of files which succeeded and dict with failed filename as key
+        and error message as value
+    """
+    if executor == "serial":
+        attempts = [_attempt(func, filename, *args) for filename in filenames]
+    else:
+        pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            attempts = list(pool.map(_attempt, [func] * len(filenames), filenames,
+                                     *([arg] * len(filenames) for arg in args)))
+    return ([result for result, error in attempts if error is None],
+            {filename: error for filename, (_, error) in zip(filenames, attempts) if error is not None})
+
+
+def thread_func_gcloud(filenames: list[str], force_subdir: str, velocity_subdir: str):
+    """
+    Computes stats of every file with executor set in COMPUTE_EXECUTOR config:
+        serial - one file after another in request thread
+        thread - files fanned out across thread pool
+        process - files fanned out across process pool, each process downloads, parses and computes its files
+        batch - files downloaded in thread pool and computed together as one array job
+    With SESSION_MODE config every file is recording with several jumps, split into trials with
+    service.session.CMJSessionStats, and every trial is stored as separate jump.
+    Results of all files which succeeded are appended at once to results dataset,
+    see service.results_store.ResultsStore, jumps are added to athlete index, see service.jump_index,
+    and athlete trends are updated, see service.trends. Only then force and velocity files of those
+    recordings are deleted, files which failed are kept and reported, so they can be sent again.
+    Stage timings are added to service.instrumentation.metrics and sent as one structured log record
+    :return: dict with filename as key and stats as value, in session mode dict of service.session.session_summary
+        with stats of every trial, best trial and mean as value. Failed files are under "failed" key,
+        as dict with filename as key and error message as value
+    """
+    start = time.perf_counter()
+    storage_config = bucket_config(current_app.config)
+    executor = current_app.config.get("COMPUTE_EXECUTOR", "serial")
+    workers = current_app.config.get("COMPUTE_WORKERS") or os.cpu_count()
+    cache_dir = current_app.config.get("PARSE_CACHE_DIR")
+    cache_max_bytes = current_app.config.get("PARSE_CACHE_MAX_BYTES")
+    windows = tuple(current_app.config.get("METRIC_WINDOWS", (100,)))
+    session_mode = current_app.config.get("SESSION_MODE", False)
+    metrics.incr("requests")
+
+    try:
+        args = (force_subdir, velocity_subdir, storage_config, cache_dir, windows, cache_max_bytes)
+        if executor == "batch" and not session_mode:
+            results, failed = compute_batch(filenames, force_subdir, velocity_subdir, storage_config, workers,
+                                            cache_dir, windows, cache_max_bytes)
+        elif executor in ("serial", "thread", "process", "batch"):
+            # in session mode trials of each recording are already computed together as one array job,
+            # so batch executor fans recordings out across thread pool
+            results, failed = _fan_out(compute_session if session_mode else compute_file, filenames,
+                                       "thread" if executor == "batch" else executor, workers, *args)
+        else:
+            raise ValueError("Unknown compute executor: {}".format(executor))
+        if session_mode:
+            jumps = [trial for _, trials, _ in results for trial in trials]
+        else:
+            jumps = [(filename, stats, phases) for filename, stats, phases, _ in results]
+        store_start = time.perf_counter()
+        bucket = get_bucket(**storage_config)
+        rows = [result_row(filename, stats, phases) for filename, stats, phases in jumps]
+        results_store(bucket, current_app.config).append(rows)
+        jump_index(bucket, current_app.config).add(index_entries(rows))
+        trend_store(bucket, current_app.config).update(rows)
+        store_seconds = time.perf_counter() - store_start
+    except Exception:
+        metrics.incr("failed_requests")
+        raise
+    undeleted = _delete_sources(bucket, [result[0] for result in results], force_subdir, velocity_subdir, workers)
+
+    stages = {}
+    if executor == "batch" and not session_mode:
+        stages = dict(results[0][-1]) if results else {}
+        metrics.observe(stages)
+    else:
+        for *_, timings in results:
+            metrics.observe(timings)
+            for name, seconds in timings.items():
+                stages[name] = stages.get(name, 0.0) + seconds
+    metrics.observe({"store": store_seconds})
+    stages["store"] = store_seconds
+    metrics.incr("jumps", len(jumps))
+    metrics.incr("failed_files", len(failed))
+    elapsed = time.perf_counter() - start
+    metrics.observe({"request": elapsed})
+    log_struct({"event": "compute", "executor": executor, "session_mode": session_mode, "jumps": len(jumps),
+                "seconds": elapsed, "stages_s": stages, "failed": failed, "undeleted": undeleted,
+                "stats": {filename: stats for filename, stats, _ in jumps}})
+    if session_mode:
+        response = {filename: session_summary([(trial, stats) for trial, stats, _ in trials])
+                    for filename, trials, _ in results}
+    else:
+        response = {filename: stats for filename, stats, _ in jumps}
+    response["failed"] = failed
+    return response
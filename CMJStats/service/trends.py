@@ -0,0 +1,258 @@
+import datetime
+import json
+import math
+from urllib.parse import quote
+from google.api_core import exceptions
+
+from service.jump_index import BucketJumpIndex, jump_index
+from service.jump_name import jump_order
+from service.results_store import ResultsStore, results_store
+
+# metrics followed over season, with 1 when higher value is better and -1 when lower value is better
+TREND_METRICS = {"v_peak_prop": 1, "t_to_v_peak_prop": -1, "a_peak_pos": 1, "jump_height": 1, "rsi_mod": 1}
+# metrics whose drop below baseline flags fatigue
+FATIGUE_METRICS = ("rsi_mod", "v_peak_prop", "t_to_v_peak_prop")
+
+
+class MetricTrend:
+    """
+    Running aggregates of one metric of one athlete, each update is O(1):
+    EWMA, mean and SD of last window jumps (running sums over fixed size window)
+    and mean and SD of baseline from first baseline_size jumps (Welford)
+    """
+
+    def __init__(self, n=0, ewma=None, window=None, window_sum=0.0, window_sumsq=0.0,
+                 baseline_n=0, baseline_mean=0.0, baseline_m2=0.0):
+        self.n = n
+        self.ewma = ewma
+        self.window = list(window) if window is not None else []
+        self.window_sum = window_sum
+        self.window_sumsq = window_sumsq
+        self.baseline_n = baseline_n
+        self.baseline_mean = baseline_mean
+        self.baseline_m2 = baseline_m2
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    def update(self, value: float, alpha: float, window: int, baseline_size: int):
+        self.n += 1
+        self.ewma = value if self.ewma is None else alpha * value + (1 - alpha) * self.ewma
+
+        self.window.append(value)
+        self.window_sum += value
+        self.window_sumsq += value * value
+        if len(self.window) > window:
+            dropped = self.window.pop(0)
+            self.window_sum -= dropped
+            self.window_sumsq -= dropped * dropped
+
+        if self.baseline_n < baseline_size:
+            self.baseline_n += 1
+            delta = value - self.baseline_mean
+            self.baseline_mean += delta / self.baseline_n
+            self.baseline_m2 += delta * (value - self.baseline_mean)
+
+    @property
+    def rolling_mean(self):
+        return self.window_sum / len(self.window) if self.window else None
+
+    @property
+    def rolling_sd(self):
+        k = len(self.window)
+        if k < 2:
+            return None
+        return math.sqrt(max(self.window_sumsq - self.window_sum * self.window_sum / k, 0.0) / (k - 1))
+
+    @property
+    def baseline_sd(self):
+        return math.sqrt(self.baseline_m2 / (self.baseline_n - 1)) if self.baseline_n > 1 else None
+
+    def z_score(self, value: float):
+        """
+        :return: z-score of value against baseline, None while baseline has less than 2 jumps or no spread
+        """
+        sd = self.baseline_sd
+        return (value - self.baseline_mean) / sd if sd else None
+
+
+class AthleteTrend:
+    """
+    Trends of TREND_METRICS of one athlete, updated with every new jump in O(1). Only running aggregates
+    and summary of last jump are kept, jumps have to be added in chronological order (service.jump_name.jump_order)
+    """
+
+    def __init__(self, alpha=0.3, window=5, baseline_size=5, z_threshold=1.5, metrics=None, last=None):
+        """
+        :param alpha: smoothing factor of EWMA
+        :param window: number of last jumps of rolling mean and SD
+        :param baseline_size: number of first jumps from which baseline is calculated
+        :param z_threshold: fatigue is flagged when metric of FATIGUE_METRICS is worse than baseline
+            by more than z_threshold SD
+        :param metrics: dict with state of MetricTrend of every metric, from to_dict
+        :param last: summary returned by last update
+        """
+        self.alpha = alpha
+        self.window = window
+        self.baseline_size = baseline_size
+        self.z_threshold = z_threshold
+        self.metrics = {name: MetricTrend(**(metrics or {}).get(name, {})) for name in TREND_METRICS}
+        self.last = last
+
+    def to_dict(self):
+        return {"alpha": self.alpha, "window": self.window, "baseline_size": self.baseline_size,
+                "z_threshold": self.z_threshold, "last": self.last,
+                "metrics": {name: trend.to_dict() for name, trend in self.metrics.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+    def follows(self, row: dict):
+        """
+        :param row: dict from service.results_store.result_row
+        :return: False when jump is older than last added jump or is last added jump computed again,
+            then trends have to be rebuilt from all jumps of athlete
+        """
+        if self.last is None:
+            return True
+        last = dict(self.last, date=datetime.date.fromisoformat(self.last["date"]))
+        if jump_order(row) != jump_order(last):
+            return jump_order(row) > jump_order(last)
+        return row["filename"] is None or row["filename"] != last["filename"]
+
+    def update(self, stats: dict, filename=None, date=None, time=None, trial=None, segment=None):
+        """
+        Jumps are expected in chronological order
+        :param stats: dict from get_cmj_stats, NaN metrics (phases not found) are skipped
+        :param date: date of jump in iso format
+        :param time: time, trial and segment of jump (see service.jump_name), order jumps of one date
+        :return: dict with filename, date, time, trial, segment, fatigue flag and value, z-score, EWMA,
+            rolling mean and SD of every metric
+        """
+        summary = {"filename": filename, "date": date, "time": time, "trial": trial, "segment": segment,
+                   "fatigue": False, "metrics": {}}
+        for name, direction in TREND_METRICS.items():
+            value = stats.get(name)
+            if value is None or not math.isfinite(value):
+                continue
+            trend = self.metrics[name]
+            z = trend.z_score(value)
+            trend.update(float(value), self.alpha, self.window, self.baseline_size)
+            summary["metrics"][name] = {"value": float(value), "z": z, "ewma": trend.ewma,
+                                        "rolling_mean": trend.rolling_mean, "rolling_sd": trend.rolling_sd}
+            if name in FATIGUE_METRICS and z is not None and direction * z < -self.z_threshold:
+                summary["fatigue"] = True
+        self.last = summary
+        return summary
+
+    def update_row(self, row: dict):
+        """
+        :param row: dict from service.results_store.result_row
+        :return: summary of update
+        """
+        return self.update(row, row["filename"], row["date"].isoformat(), row["time"], row["trial"], row["segment"])
+
+
+class TrendStore:
+    """
+    State of AthleteTrend of every athlete kept as json in bucket: {prefix}/{lastname}_{firstname}.json.
+    State is written only when it was not changed since it was read (generation precondition), otherwise
+    it is read and updated again, so concurrent instances updating the same athlete do not lose jumps.
+    Late jumps and jumps computed again rebuild state of athlete from results store
+    """
+
+    def __init__(self, bucket, prefix="trends", retries=5, results=None, index=None, **trend_kwargs):
+        """
+        :param bucket: google.cloud.storage.Bucket or service.storage.LocalBucket
+        :param prefix: directory of trends in bucket
+        :param retries: number of attempts of update of athlete whose state is changed concurrently
+        :param results: service.results_store.ResultsStore with results of all jumps, in bucket when None
+        :param index: jump index of service.jump_index, BucketJumpIndex in bucket when None
+        :param trend_kwargs: parameters of AthleteTrend of athletes without stored state
+        """
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+        self.retries = retries
+        self.results = results if results is not None else ResultsStore(bucket)
+        self.index = index if index is not None else BucketJumpIndex(bucket)
+        self.trend_kwargs = trend_kwargs
+
+    def blob_name(self, firstname: str, lastname: str):
+        return "{}/{}_{}.json".format(self.prefix, quote(lastname, safe=""), quote(firstname, safe=""))
+
+    def _read(self, firstname: str, lastname: str):
+        """
+        :return: tuple of AthleteTrend and generation of its blob, 0 when athlete has no stored state
+        """
+        blob = self.bucket.get_blob(self.blob_name(firstname, lastname))
+        if blob is None:
+            return AthleteTrend(**self.trend_kwargs), 0
+        return AthleteTrend.from_dict(json.loads(blob.download_as_bytes())), blob.generation
+
+    def load(self, firstname: str, lastname: str):
+        return self._read(firstname, lastname)[0]
+
+    def save(self, firstname: str, lastname: str, trend: AthleteTrend, if_generation_match=None):
+        """
+        :param if_generation_match: generation of state trend was read from, see _read, no precondition when None
+        """
+        self.bucket.blob(self.blob_name(firstname, lastname)).upload_from_string(
+            json.dumps(trend.to_dict()), content_type="application/json", if_generation_match=if_generation_match)
+
+    def rebuild(self, firstname: str, lastname: str):
+        """
+        :return: tuple of AthleteTrend with all jumps of athlete in results store added in chronological
+            order and dict with filename as key and its summary as value
+        """
+        trend = AthleteTrend(**self.trend_kwargs)
+        results = self.results.read_jumps(self.index.jumps_for(firstname, lastname))
+        results["date"] = results["date"].dt.date
+        rows = results.astype(object).where(results.notna(), None).to_dict(orient="records")
+        return trend, {row["filename"]: trend.update_row(row) for row in rows}
+
+    def update(self, rows: list):
+        """
+        Updates trends of athletes with new jumps, state of every athlete is read and written once
+        unless it was changed concurrently. Jumps have to be in results store and jump index already,
+        athlete with jump older than the last added one or with the last jump computed again is rebuilt
+        :param rows: list of dicts from service.results_store.result_row
+        :return: dict with (firstname, lastname) as key and list of summaries of AthleteTrend.update as value
+        """
+        athletes = {}
+        for row in rows:
+            athletes.setdefault((row["firstname"], row["lastname"]), []).append(row)
+        summaries = {}
+        for (firstname, lastname), athlete_rows in athletes.items():
+            athlete_rows.sort(key=jump_order)
+            for attempt in range(self.retries):
+                trend, generation = self._read(firstname, lastname)
+                if trend.follows(athlete_rows[0]):
+                    athlete_summaries = [trend.update_row(row) for row in athlete_rows]
+                else:
+                    trend, rebuilt = self.rebuild(firstname, lastname)
+                    athlete_summaries = [rebuilt[row["filename"]] for row in athlete_rows if row["filename"] in rebuilt]
+                try:
+                    self.save(firstname, lastname, trend, if_generation_match=generation)
+                    break
+                except exceptions.PreconditionFailed:
+                    if attempt == self.retries - 1:
+                        raise
+            summaries[(firstname, lastname)] = athlete_summaries
+        return summaries
+
+
+def trend_store(bucket, config):
+    """
+    :param bucket: bucket from service.storage.get_bucket
+    :param config: flask app config, TRENDS_PREFIX is directory of trends in bucket, TREND_ALPHA, TREND_WINDOW,
+        TREND_BASELINE and TREND_Z_THRESHOLD are parameters of AthleteTrend, results store and jump index
+        are configured as in service.results_store.results_store and service.jump_index.jump_index
+    """
+    return TrendStore(bucket, config.get("TRENDS_PREFIX", "trends"),
+                      results=results_store(bucket, config),
+                      index=jump_index(bucket, config),
+                      alpha=config.get("TREND_ALPHA", 0.3),
+                      window=config.get("TREND_WINDOW", 5),
+                      baseline_size=config.get("TREND_BASELINE", 5),
+                      z_threshold=config.get("TREND_Z_THRESHOLD", 1.5))
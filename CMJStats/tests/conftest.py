@@ -0,0 +1,12 @@
+"""
+Test setup of CMJStats, run from CMJStats directory: python -m pytest tests.
+Service modules are imported from CMJStats, synthetic traces from Additionals
+and shared helpers from other test modules
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (TESTS_DIR, os.path.join(TESTS_DIR, ".."), os.path.join(TESTS_DIR, "..", "..", "Additionals")):
+    if os.path.abspath(path) not in map(os.path.abspath, sys.path):
+        sys.path.insert(0, os.path.abspath(path))
@@ -0,0 +1,85 @@
+"""
+LogSink sends queued records in batches from background thread, writes everything queued before exit
+and drops only the bad record of a batch that cannot be sent.
+"""
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from service.cloud_logging import LogSink
+
+CMJ_STATS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+class FakeBatch:
+    """Batch of google.cloud.logging.Logger, rejects records like Cloud Logging rejects NaN in struct payload"""
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.entries = []
+
+    def log_text(self, text):
+        self.entries.append(text)
+
+    def log_struct(self, info):
+        self.entries.append(info)
+
+    def commit(self):
+        for entry in self.entries:
+            json.dumps(entry, allow_nan=False)
+        self.logger.batches.append(self.entries)
+
+
+class FakeLogger:
+
+    def __init__(self):
+        self.batches = []
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class LogSinkTest(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = FakeLogger()
+        patcher = mock.patch("service.cloud_logging.logging.Client")
+        self.addCleanup(patcher.stop)
+        patcher.start().return_value.logger.return_value = self.logger
+
+    def test_batches(self):
+        # long flush interval, batches are cut by size and by flush only
+        sink = LogSink("test", sink="cloud", batch_size=3, flush_interval=10.0)
+        for i in range(7):
+            sink.emit("text", str(i))
+        self.assertTrue(sink.flush())
+        self.assertEqual(self.logger.batches, [["0", "1", "2"], ["3", "4", "5"], ["6"]])
+
+    def test_bad_record_is_dropped_alone(self):
+        sink = LogSink("test", sink="cloud", batch_size=10, flush_interval=10.0)
+        sink.emit("text", "first")
+        sink.emit("struct", {"v_peak_prop": math.nan})
+        sink.emit("struct", {"v_peak_prop": 2.5})
+        with mock.patch("sys.stderr"):
+            self.assertTrue(sink.flush())
+        self.assertEqual(self.logger.batches, [["first"], [{"v_peak_prop": 2.5}]])
+        self.assertEqual(sink.dropped, 1)
+
+    def test_records_written_on_exit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "log.jsonl")
+            script = "from service.cloud_logging import log_message\nfor i in range(500):\n    log_message(i)\n"
+            subprocess.run([sys.executable, "-c", script], cwd=CMJ_STATS_DIR, check=True,
+                           env=dict(os.environ, LOG_SINK=path))
+            with open(path) as f:
+                payloads = [json.loads(line)["payload"] for line in f]
+        self.assertEqual(payloads, [str(i) for i in range(500)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+"""
+Equivalence of single jump path of service.cmj_metrics.cmj_metrics (slices of 1-D traces)
+with its 2-D kernel (prefix sums and running maxima).
+"""
+import unittest
+import numpy as np
+
+from service.cmj_metrics import cmj_metrics
+from service.cmj_stats import CMJForceVelStats
+from test_detect_phases import synthetic_traces, edge_traces
+
+WINDOWS = (50, 100, 200, 1000)
+
+
+class CmjMetricsTest(unittest.TestCase):
+
+    def assert_equivalent(self, traces, with_acc=False):
+        for force, velocity, system_weight in traces:
+            time = np.arange(len(force)) * 0.001
+            idxs = CMJForceVelStats.detect_phases(force, velocity, system_weight)
+            acc = np.gradient(velocity, 0.001) if with_acc else None
+            single = cmj_metrics(time, velocity, force, idxs, system_weight, 0.001, WINDOWS, acc)
+            batch = cmj_metrics(time[None], velocity[None], force[None],
+                                {phase: tuple(np.array([i]) for i in index) for phase, index in idxs.items()},
+                                tuple(np.array([value]) for value in system_weight), 0.001, WINDOWS,
+                                None if acc is None else acc[None])
+            self.assertEqual(list(single), list(batch))
+            for key, value in single.items():
+                self.assertIsInstance(value, float)
+                np.testing.assert_allclose(value, batch[key][0], rtol=1e-9, atol=1e-9, err_msg=key)
+
+    def test_synthetic_traces(self):
+        self.assert_equivalent(synthetic_traces())
+        self.assert_equivalent(synthetic_traces(), with_acc=True)
+
+    def test_edge_arrays(self):
+        self.assert_equivalent(edge_traces())
+
+
+if __name__ == "__main__":
+    unittest.main()
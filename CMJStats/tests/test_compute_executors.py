@@ -0,0 +1,60 @@
+"""
+Compute request gives the same stats with every COMPUTE_EXECUTOR: serial, thread, process and batch.
+Runs against local bucket.
+"""
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+
+os.environ.setdefault("ENV", "LOCAL")
+os.environ.setdefault("BUCKET", "bucket")
+os.environ.setdefault("LOG_SINK", os.devnull)
+import main  # noqa: E402
+from service.storage import get_bucket  # noqa: E402
+from synthetic_cmj import cmj_csv  # noqa: E402
+
+FILENAMES = ["Adam_Lewandowski-10_14_2020.csv", "Robin_Volkmar-10_14_2020.csv", "Szymon_Karpecki-10_14_2020.csv",
+             "Szymon_Karpecki-10_14_2020_07-00-26_2.csv"]
+
+
+class ComputeExecutorsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(main.app.config.update, dict(main.app.config))
+
+    def compute(self, executor):
+        with tempfile.TemporaryDirectory() as tmp:
+            main.app.config.update(STORAGE_BACKEND="local", LOCAL_STORAGE_ROOT=tmp, UPLOAD_FOLDER="bucket",
+                                   JUMP_INDEX_BACKEND="bucket", SESSION_MODE=False, COMPUTE_EXECUTOR=executor,
+                                   COMPUTE_WORKERS=2, METRIC_WINDOWS=(50, 100))
+            bucket = get_bucket("bucket", "local", tmp)
+            for seed, filename in enumerate(FILENAMES):
+                force_csv, velocity_csv = cmj_csv(seed=seed)
+                bucket.blob("force/" + filename).upload_from_string(force_csv)
+                bucket.blob("velocity/" + filename).upload_from_string(velocity_csv)
+            response = main.app.test_client().post("/", data=json.dumps(
+                {"filenames": FILENAMES, "force_path": "force/", "velocity_path": "velocity/"}))
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body.pop("failed"), {})
+        return body
+
+    def test_executors_give_identical_results(self):
+        expected = self.compute("serial")
+        self.assertEqual(sorted(expected), sorted(FILENAMES))
+        for executor in ("thread", "process", "batch"):
+            with self.subTest(executor=executor):
+                results = self.compute(executor)
+                self.assertEqual(results.keys(), expected.keys())
+                for filename, stats in expected.items():
+                    self.assertEqual(results[filename].keys(), stats.keys())
+                    for key, value in stats.items():
+                        # batch sums windows with prefix sums, others on slices, so they differ by rounding only
+                        np.testing.assert_allclose(results[filename][key], value, rtol=1e-9, atol=1e-12,
+                                                   err_msg="{} {}".format(filename, key))
+
+
+if __name__ == "__main__":
+    unittest.main()
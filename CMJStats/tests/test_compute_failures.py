@@ -0,0 +1,79 @@
+"""
+Compute request with one broken file: results of other files are stored, broken file is reported and kept
+in bucket, so it can be sent again. Runs against local bucket.
+"""
+import json
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("ENV", "LOCAL")
+os.environ.setdefault("BUCKET", "bucket")
+os.environ.setdefault("LOG_SINK", os.devnull)
+import main  # noqa: E402
+from service.results_store import ResultsStore  # noqa: E402
+from service.storage import get_bucket  # noqa: E402
+from synthetic_cmj import cmj_csv  # noqa: E402
+
+FILENAMES = ["Adam_Lewandowski-10_14_2020.csv", "Robin_Volkmar-10_14_2020.csv", "Szymon_Karpecki-10_14_2020.csv"]
+
+
+class ComputeFailuresTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp
+        main.app.config.update(STORAGE_BACKEND="local", LOCAL_STORAGE_ROOT=self.tmp.name, UPLOAD_FOLDER="bucket",
+                               JUMP_INDEX_BACKEND="bucket", SESSION_MODE=False)
+        self.bucket = get_bucket("bucket", "local", self.tmp.name)
+        self.upload(FILENAMES)
+
+    def upload(self, filenames):
+        for filename in filenames:
+            force_csv, velocity_csv = cmj_csv(seed=FILENAMES.index(filename))
+            if filename == FILENAMES[1]:
+                velocity_csv = velocity_csv.replace(b"Velocity (M/s)", b"Velocity", 1)
+            self.bucket.blob("force/" + filename).upload_from_string(force_csv)
+            self.bucket.blob("velocity/" + filename).upload_from_string(velocity_csv)
+
+    def compute(self, filenames):
+        return main.app.test_client().post("/", data=json.dumps(
+            {"filenames": filenames, "force_path": "force/", "velocity_path": "velocity/"}))
+
+    def test_failed_file_does_not_drop_others(self):
+        for executor in ("serial", "thread", "batch"):
+            with self.subTest(executor=executor):
+                # fresh bucket with all files for every executor
+                self.setUp()
+                main.app.config["COMPUTE_EXECUTOR"] = executor
+                response = self.compute(FILENAMES)
+                self.assertEqual(response.status_code, 200)
+                body = response.get_json()
+                self.assertEqual(list(body["failed"]), [FILENAMES[1]])
+                self.assertEqual(sorted(key for key in body if key != "failed"), [FILENAMES[0], FILENAMES[2]])
+
+                stored = ResultsStore(self.bucket).read()["filename"].tolist()
+                self.assertEqual(sorted(stored), [FILENAMES[0], FILENAMES[2]])
+                remaining = {blob.name for blob in self.bucket.list_blobs(prefix="force/")} | \
+                    {blob.name for blob in self.bucket.list_blobs(prefix="velocity/")}
+                self.assertEqual(remaining, {"force/" + FILENAMES[1], "velocity/" + FILENAMES[1]})
+
+    def test_recomputed_jump_is_returned_once(self):
+        main.app.config["COMPUTE_EXECUTOR"] = "serial"
+        for _ in range(2):
+            self.upload([FILENAMES[0]])
+            self.assertEqual(self.compute([FILENAMES[0]]).status_code, 200)
+        response = main.app.test_client().get("/jumps", query_string={"firstname": "Adam",
+                                                                      "lastname": "Lewandowski"})
+        self.assertEqual([jump["filename"] for jump in response.get_json()], [FILENAMES[0]])
+
+    def test_all_files_failed_is_retried(self):
+        main.app.config["COMPUTE_EXECUTOR"] = "serial"
+        response = self.compute([FILENAMES[1]])
+        self.assertEqual(response.status_code, 500)
+        self.assertTrue(self.bucket.blob("force/" + FILENAMES[1]).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
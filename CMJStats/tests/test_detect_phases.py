@@ -0,0 +1,122 @@
+"""
+Equivalence of array phase detection (CMJForceVelStats.detect_phases and CMJBatchStats.detect_phases)
+with the iterrows state machine it replaced.
+"""
+import unittest
+import numpy as np
+import pandas as pd
+
+from service.cmj_stats import CMJForceVelStats, CMJBatchStats
+from synthetic_cmj import cmj_trace
+
+
+def iterrows_phases(force, velocity, system_weight):
+    """Phase detection of CMJForceVelStats.get_phases_idx before it was vectorized"""
+    ind_unwght_start = -1
+    ind_unwght_end = -1
+    ind_brk_start = -1
+    ind_brk_end = -1
+    ind_prop_start = -1
+    ind_prop_end = -1
+    df_base = pd.DataFrame({"force": force, "velocity": velocity})
+
+    for index, row in df_base.iterrows():
+        if ind_unwght_start < 0 and row["force"] < system_weight[0] - 5 * system_weight[1]:
+            ind_unwght_start = index - 30
+
+        if ind_unwght_start > 0 and ind_brk_start < 0:
+            if row["force"] >= system_weight[0]:
+                ind_brk_start = index
+            ind_unwght_end = ind_brk_start - 1
+
+        if ind_brk_start > 0 and ind_prop_start < 0:
+            if row["velocity"] >= 0.01:
+                ind_prop_start = index
+            ind_brk_end = ind_prop_start - 1
+
+        if ind_prop_start > 0 and ind_prop_end < 0:
+            if row["force"] < 10:
+                ind_prop_end = index
+
+    return {"unweighting": (ind_unwght_start, ind_unwght_end),
+            "braking": (ind_brk_start, ind_brk_end),
+            "propulsive": (ind_prop_start, ind_prop_end)}
+
+
+def synthetic_traces():
+    traces = []
+    for seed, (quiet, depth, noise) in enumerate([(1.5, 0.6, 2.0), (0.5, 0.4, 5.0), (2.5, 0.7, 1.0),
+                                                   (1.0, 0.3, 8.0)]):
+        _, _, _, force, velocity = cmj_trace(quiet=quiet, unweighting_depth=depth, noise=noise, seed=seed)
+        traces.append((force, velocity, (float(np.mean(force[:400])), float(np.std(force[:400], ddof=1)))))
+    return traces
+
+
+def edge_traces():
+    weight = (700.0, 2.0)
+    n = 400
+    base = np.full(n, 700.0)
+    velocity = np.zeros(n)
+    traces = []
+
+    # crossings within first 30 samples only, and crossing in head followed by another after it
+    for head_dips, take_off in (([10], False), ([5, 12, 29], False), ([10, 80], True)):
+        force = base.copy()
+        force[head_dips] = 600.0
+        force[150:] = 720.0
+        vel = velocity.copy()
+        vel[200:] = 0.5
+        if take_off:
+            force[300:] = 0.0
+        traces.append((force, vel, weight))
+    # crossing exactly at sample 30 gives unweighting start 0, which does not open braking
+    force = base.copy()
+    force[30] = 600.0
+    traces.append((force, velocity.copy(), weight))
+    # no unweighting, no braking, no propulsion and no take-off
+    traces.append((base.copy(), velocity.copy(), weight))
+    force = base.copy()
+    force[100:] = 600.0
+    traces.append((force, velocity.copy(), weight))
+    force = base.copy()
+    force[100:150] = 600.0
+    traces.append((force, velocity.copy(), weight))
+    force = base.copy()
+    force[100:150] = 600.0
+    vel = velocity.copy()
+    vel[200:] = 0.5
+    traces.append((force, vel, weight))
+
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        force = rng.choice([0.0, 600.0, 700.0, 720.0], size=n, p=[0.02, 0.05, 0.83, 0.1])
+        vel = rng.choice([0.0, 0.5], size=n, p=[0.95, 0.05])
+        traces.append((force, vel, weight))
+    return traces
+
+
+class DetectPhasesTest(unittest.TestCase):
+
+    def assert_equivalent(self, traces):
+        for force, velocity, system_weight in traces:
+            expected = iterrows_phases(force, velocity, system_weight)
+            self.assertEqual(CMJForceVelStats.detect_phases(force, velocity, system_weight), expected)
+
+        stacked_force = CMJBatchStats.stack([force for force, _, _ in traces])
+        stacked_velocity = CMJBatchStats.stack([velocity for _, velocity, _ in traces])
+        weights = tuple(np.array([weight[i] for _, _, weight in traces]) for i in (0, 1))
+        batch = CMJBatchStats.detect_phases(stacked_force, stacked_velocity, weights)
+        for row, (force, velocity, system_weight) in enumerate(traces):
+            expected = iterrows_phases(force, velocity, system_weight)
+            self.assertEqual({phase: tuple(int(index[row]) for index in indexes)
+                              for phase, indexes in batch.items()}, expected)
+
+    def test_synthetic_traces(self):
+        self.assert_equivalent(synthetic_traces())
+
+    def test_edge_arrays(self):
+        self.assert_equivalent(edge_traces())
+
+
+if __name__ == "__main__":
+    unittest.main()
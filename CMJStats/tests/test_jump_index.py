@@ -0,0 +1,74 @@
+"""
+Jumps found in jump index are read from results store after its partitions were compacted,
+and bucket index finds jumps without downloading index files.
+"""
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from service.jump_index import BucketJumpIndex, SqliteJumpIndex, index_entries
+from service.results_store import ResultsStore, result_row
+from service.storage import LocalBlob, LocalBucket
+
+FILENAMES = [["Adam_Lewandowski-10_14_2020.csv", "Robin_Hood-10_14_2020.csv"],
+             ["Adam_Lewandowski-10_14_2020_2.csv", "Adam_Lewandowski-10_15_2020.csv"],
+             ["Adam_Lewandowski-10_15_2020_2.csv"]]
+
+
+class JumpIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.bucket = LocalBucket("bucket", tmp.name)
+        self.store = ResultsStore(self.bucket)
+        self.indexes = [BucketJumpIndex(self.bucket), SqliteJumpIndex(os.path.join(tmp.name, "index.sqlite"))]
+        # every request appends its own part files
+        for request, filenames in enumerate(FILENAMES):
+            rows = [result_row(filename, {"v_peak_prop": float(request)}, {}) for filename in filenames]
+            self.store.append(rows)
+            for index in self.indexes:
+                index.add(index_entries(rows))
+
+    def adam_jumps(self, index):
+        return [entry["filename"] for entry in index.jumps_for("Adam", "Lewandowski")]
+
+    def test_jumps_for(self):
+        expected = ["Adam_Lewandowski-10_14_2020.csv", "Adam_Lewandowski-10_14_2020_2.csv",
+                    "Adam_Lewandowski-10_15_2020.csv", "Adam_Lewandowski-10_15_2020_2.csv"]
+        with mock.patch.object(LocalBlob, "download_as_bytes", side_effect=AssertionError("index file downloaded")):
+            for index in self.indexes:
+                self.assertEqual(self.adam_jumps(index), expected)
+                entries = index.jumps_for("Adam", "Lewandowski", date_from=datetime.date(2020, 10, 15))
+                self.assertEqual([entry["filename"] for entry in entries], expected[2:])
+
+    def test_repeated_jump_keeps_one_entry(self):
+        for index in self.indexes:
+            index.add(index_entries([result_row("Adam_Lewandowski-10_14_2020.csv", {}, {})]))
+            self.assertEqual(len(self.adam_jumps(index)), 4)
+
+    def test_read_jumps_after_compact(self):
+        entries = self.indexes[0].jumps_for("Adam", "Lewandowski")
+        before = self.store.read_jumps(entries)
+        for day in (datetime.date(2020, 10, 14), datetime.date(2020, 10, 15)):
+            self.assertIsNotNone(self.store.compact(day))
+        after = self.store.read_jumps(entries)
+        self.assertEqual(list(after["filename"]), [entry["filename"] for entry in entries])
+        self.assertEqual(list(after["v_peak_prop"]), list(before["v_peak_prop"]))
+
+    def test_read_jumps_while_compacting(self):
+        entries = self.indexes[0].jumps_for("Adam", "Lewandowski")
+        day = datetime.date(2020, 10, 14)
+        listed = self.store._partition_blobs([day])
+        merged = self.store.compact(day)
+        # first listing is taken before compact, part files it found are gone when they are downloaded
+        with mock.patch.object(self.store, "_partition_blobs",
+                               side_effect=[listed, [self.bucket.blob(merged)]]):
+            jumps = self.store.read_jumps(entries[:2])
+        self.assertEqual(list(jumps["filename"]), [entry["filename"] for entry in entries[:2]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Canonical filenames given by EntryPoint keep time of export, trial of export and segment of recording
+apart, so exports of one athlete and day never collide and parse back in CMJStats.
+"""
+import datetime
+import importlib.util
+import os
+import unittest
+
+from service.jump_name import JumpName, format_jump_name, jump_order, parse_jump_name
+from service.results_store import ResultsStore, result_row
+from service.session import trial_filename
+
+# EntryPoint has its own service package, so parser module is loaded from its file
+ENTRY_POINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "EntryPoint")
+_spec = importlib.util.spec_from_file_location(
+    "hawkin_csv_parser", os.path.join(ENTRY_POINT_DIR, "service", "hawkin_csv_parser.py"))
+hawkin_csv_parser = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(hawkin_csv_parser)
+
+EXPORTS = ["Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26.csv",
+           "Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_9-30-00.csv",
+           "Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_09-30-00 2.csv",
+           "Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020.csv"]
+
+
+class JumpNameTest(unittest.TestCase):
+
+    def test_exports_of_one_day(self):
+        files = [hawkin_csv_parser.CmjCsvFile(hawkin_csv_parser.MockFile(export)) for export in EXPORTS]
+        self.assertEqual(len({csv_file.key for csv_file in files}), len(EXPORTS))
+        filenames = [csv_file.csv_filename.filename for csv_file in files]
+        self.assertEqual(filenames, ["Adam_Lewandowski-10_14_2020_07-00-26.csv",
+                                     "Adam_Lewandowski-10_14_2020_09-30-00.csv",
+                                     "Adam_Lewandowski-10_14_2020_09-30-00_2.csv",
+                                     "Adam_Lewandowski-10_14_2020.csv"])
+        names = [parse_jump_name(filename) for filename in filenames]
+        self.assertEqual([(name.time, name.trial) for name in names],
+                         [("07-00-26", None), ("09-30-00", None), ("09-30-00", 2), (None, None)])
+        self.assertEqual(sorted(filenames, key=lambda filename: jump_order(parse_jump_name(filename))),
+                         [filenames[i] for i in (3, 0, 1, 2)])
+
+    def test_segments_of_recording(self):
+        self.assertEqual(trial_filename("Adam_Lewandowski-10_14_2020_07-00-26_2.csv", 3),
+                         "Adam_Lewandowski-10_14_2020_07-00-26_2_s3.csv")
+        self.assertEqual(parse_jump_name("Adam_Lewandowski-10_14_2020_07-00-26_2_s3.csv"),
+                         JumpName("Adam", "Lewandowski", datetime.date(2020, 10, 14), "07-00-26", 2, 3))
+        # segment 12 of recording without trial is not trial 12, nor segment 2 of trial 1
+        names = [parse_jump_name(trial_filename(filename, segment)) for filename, segment in
+                 (("Adam_Lewandowski-10_14_2020.csv", 12), ("Adam_Lewandowski-10_14_2020_1.csv", 2))]
+        self.assertEqual([(name.trial, name.segment) for name in names], [(None, 12), (1, 2)])
+        for name in names:
+            self.assertEqual(parse_jump_name(format_jump_name(name)), name)
+
+    def test_result_columns(self):
+        df = ResultsStore.to_table([result_row("Adam_Lewandowski-10_14_2020_07-00-26_2_s3.csv", {}, {})])
+        self.assertEqual(df.loc[0, ["time", "trial", "segment"]].tolist(), ["07-00-26", 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Parsed csv cache of CMJAttribute: cache hit gives the same dataframe as parsing, changed csv is parsed again,
+size limit with least recently used eviction and cleanup of temp directories left by crashed workers.
+"""
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+import numpy as np
+import pandas as pd
+
+from service.cmj_stats import CMJAttribute, ForceCMJAttribute, CACHE_TMP_PREFIX, prune_cache
+from synthetic_cmj import cmj_csv
+
+
+def cache_size(cache_dir):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(cache_dir) for name in names)
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp.name
+        self.csvs = [cmj_csv(seed=seed)[0] for seed in range(4)]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_hit_gives_parsed_dataframe(self):
+        for dtype in (np.float64, np.float32):
+            parsed = ForceCMJAttribute(self.csvs[0], dtype=dtype)
+            miss = ForceCMJAttribute(self.csvs[0], dtype=dtype, cache_dir=self.cache_dir)
+            with mock.patch.object(CMJAttribute, "_read_csv", side_effect=AssertionError("csv parsed")):
+                hit = ForceCMJAttribute(self.csvs[0], dtype=dtype, cache_dir=self.cache_dir)
+            pd.testing.assert_frame_equal(miss.df, parsed.df)
+            pd.testing.assert_frame_equal(hit.df, parsed.df)
+
+    def test_changed_csv_parsed_again(self):
+        ForceCMJAttribute(self.csvs[0], cache_dir=self.cache_dir)
+        changed = self.csvs[0].replace(b",3", b",4", 1)
+        self.assertNotEqual(changed, self.csvs[0])
+        attr = ForceCMJAttribute(changed, cache_dir=self.cache_dir)
+        pd.testing.assert_frame_equal(attr.df, ForceCMJAttribute(changed).df)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_size_bound_evicts_least_recently_used(self):
+        ForceCMJAttribute(self.csvs[0], cache_dir=self.cache_dir)
+        entry_size = cache_size(self.cache_dir)
+        max_bytes = int(2.5 * entry_size)
+        for csv in self.csvs[1:3]:
+            time.sleep(0.01)
+            ForceCMJAttribute(csv, cache_dir=self.cache_dir, cache_max_bytes=max_bytes)
+        time.sleep(0.01)
+        # hit of first entry makes it most recently used, so second entry is evicted
+        first = ForceCMJAttribute(self.csvs[0], cache_dir=self.cache_dir, cache_max_bytes=max_bytes)
+        time.sleep(0.01)
+        ForceCMJAttribute(self.csvs[3], cache_dir=self.cache_dir, cache_max_bytes=max_bytes)
+
+        self.assertLessEqual(cache_size(self.cache_dir), max_bytes)
+        entries = set(os.listdir(self.cache_dir))
+        self.assertIn(first.cache_key(self.csvs[0]), entries)
+        self.assertNotIn(first.cache_key(self.csvs[1]), entries)
+        self.assertEqual(len(entries), 2)
+
+    def test_stale_temp_directories_removed(self):
+        stale = tempfile.mkdtemp(prefix=CACHE_TMP_PREFIX, dir=self.cache_dir)
+        fresh = tempfile.mkdtemp(prefix=CACHE_TMP_PREFIX, dir=self.cache_dir)
+        old = time.time() - 3600
+        os.utime(stale, (old, old))
+        prune_cache(self.cache_dir, 2 ** 30)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+    def test_pruned_entry_parsed_again(self):
+        attr = ForceCMJAttribute(self.csvs[0], cache_dir=self.cache_dir)
+        prune_cache(self.cache_dir, 0)
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        again = ForceCMJAttribute(self.csvs[0], cache_dir=self.cache_dir)
+        self.assertTrue(attr.df.equals(again.df))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+"""
+Jump computed again is appended to results store as new row, reads return only its latest result.
+"""
+import datetime
+import tempfile
+import unittest
+
+from service.results_store import ResultsStore, result_row
+from service.storage import LocalBucket
+
+
+class ResultsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.store = ResultsStore(LocalBucket("bucket", tmp.name))
+
+    def test_recomputed_jump(self):
+        filenames = ["Adam_Lewandowski-10_14_2020.csv", "Robin_Hood-10_14_2020.csv"]
+        self.store.append([result_row(filename, {"v_peak_prop": 1.0}, {}) for filename in filenames])
+        self.store.append([result_row(filenames[0], {"v_peak_prop": 2.0}, {})])
+        for df in (self.store.read(), self.store.read(datetime.date(2020, 10, 14), datetime.date(2020, 10, 14))):
+            self.assertEqual(sorted(df["filename"]), sorted(filenames))
+            self.assertEqual(df.set_index("filename").loc[filenames[0], "v_peak_prop"], 2.0)
+        # after compact both results of jump are in one part file
+        self.assertIsNotNone(self.store.compact(datetime.date(2020, 10, 14)))
+        df = self.store.read()
+        self.assertEqual(df.set_index("filename")["v_peak_prop"].to_dict(), {filenames[0]: 2.0, filenames[1]: 1.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+LocalBucket and LocalBlob behave like GCS bucket and blob used by services: blobs are files in
+{root}/{bucket}, generation changes with every write and if_generation_match preconditions fail like in GCS.
+"""
+import io
+import os
+import tempfile
+import unittest
+from google.api_core import exceptions
+
+from service.storage import LocalBucket, bucket_config, get_bucket
+
+
+class LocalBucketTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp
+        self.bucket = LocalBucket("upload", tmp.name)
+
+    def test_blob_is_file_in_bucket_directory(self):
+        blob = self.bucket.blob("force/123/Adam_Lewandowski-10_14_2020.csv")
+        self.assertFalse(blob.exists())
+        blob.upload_from_string("Time,Force\n")
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp.name, "upload", "force", "123",
+                                                    "Adam_Lewandowski-10_14_2020.csv")))
+        self.assertEqual(blob.download_as_bytes(), b"Time,Force\n")
+        self.bucket.blob("velocity/x.csv").upload_from_file(io.BytesIO(b"Time,Velocity\n"))
+        out = io.BytesIO()
+        self.bucket.blob("velocity/x.csv").download_to_file(out)
+        self.assertEqual(out.getvalue(), b"Time,Velocity\n")
+        blob.delete()
+        self.assertFalse(blob.exists())
+
+    def test_list_blobs(self):
+        for name in ("force/b.csv", "velocity/a.csv", "force/a.csv", "force/1/c.csv"):
+            self.bucket.blob(name).upload_from_string(b"")
+        self.assertEqual([blob.name for blob in self.bucket.list_blobs(prefix="force/")],
+                         ["force/1/c.csv", "force/a.csv", "force/b.csv"])
+        self.assertEqual(len(self.bucket.list_blobs()), 4)
+        self.assertEqual(LocalBucket("missing", self.tmp.name).list_blobs(), [])
+
+    def test_get_blob(self):
+        self.assertIsNone(self.bucket.get_blob("trends/a.json"))
+        self.bucket.blob("trends/a.json").upload_from_string("{}")
+        blob = self.bucket.get_blob("trends/a.json")
+        self.assertEqual(blob.name, "trends/a.json")
+        self.assertEqual(blob.generation, self.bucket.blob("trends/a.json").generation)
+
+    def test_generation_changes_with_every_write(self):
+        blob = self.bucket.blob("trends/a.json")
+        self.assertIsNone(blob.generation)
+        generations = []
+        # writes in quick succession, within resolution of file modification time
+        for i in range(20):
+            blob.upload_from_string(str(i))
+            generations.append(blob.generation)
+        self.assertEqual(generations, sorted(set(generations)))
+
+    def test_generation_preconditions(self):
+        blob = self.bucket.blob("trends/a.json")
+        blob.upload_from_string("first", if_generation_match=0)
+        with self.assertRaises(exceptions.PreconditionFailed):
+            blob.upload_from_string("second", if_generation_match=0)
+        generation = blob.generation
+        blob.upload_from_string("second", if_generation_match=generation)
+        with self.assertRaises(exceptions.PreconditionFailed):
+            blob.upload_from_string("third", if_generation_match=generation)
+        self.assertEqual(blob.download_as_bytes(), b"second")
+        blob.upload_from_string("third")
+        self.assertEqual(blob.download_as_bytes(), b"third")
+
+    def test_default_local_bucket(self):
+        config = {"UPLOAD_FOLDER": "upload", "STORAGE_BACKEND": "local", "LOCAL_STORAGE_ROOT": None}
+        bucket = get_bucket(**bucket_config(config))
+        self.assertEqual(bucket.root, os.path.join("data", "upload"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""
+Equivalence of StreamingCMJStats fed in chunks with CMJForceVelStats.get_cmj_stats,
+when quiet standing fits in weight_search samples.
+"""
+import unittest
+import numpy as np
+
+from service.cmj_metrics import cmj_metrics
+from service.cmj_stats import CMJForceVelStats, ForceCMJAttribute, VelocityCMJAttribute
+from service.streaming_stats import StreamingCMJStats
+from synthetic_cmj import cmj_csv
+
+
+def stream(cmj, chunk, **kwargs):
+    time, force, velocity = (cmj.df_base[col].to_numpy() for col in ("Time (s)", "Combined (N)", "Velocity (M/s)"))
+    streaming = StreamingCMJStats(**kwargs)
+    for pos in range(0, len(time), chunk):
+        streaming.push(time[pos: pos + chunk], force[pos: pos + chunk], velocity[pos: pos + chunk])
+    return streaming
+
+
+class StreamingCMJStatsTest(unittest.TestCase):
+
+    def assert_equivalent(self, quiet, **kwargs):
+        for seed in range(5):
+            force_csv, velocity_csv = cmj_csv(seed=seed, quiet=quiet, after_landing=3)
+            cmj = CMJForceVelStats(VelocityCMJAttribute(velocity_csv), ForceCMJAttribute(force_csv), "Time (s)")
+            expected = cmj.get_cmj_stats(windows=(50, 100))
+            for chunk in (7, 64, 333, 5000):
+                streaming = stream(cmj, chunk, windows=(50, 100), **kwargs)
+                self.assertEqual(streaming.get_phases_idx(), cmj.get_phases_idx())
+                np.testing.assert_allclose(streaming.system_weight, cmj.system_weight, rtol=1e-12)
+                self.assertEqual(streaming.stats.keys(), expected.keys())
+                for key, value in expected.items():
+                    self.assertAlmostEqual(streaming.stats[key], value, places=9, msg=key)
+
+    def test_quiet_standing_within_weight_search(self):
+        for quiet in (1.0, 1.2):
+            self.assert_equivalent(quiet)
+
+    def test_long_quiet_standing_with_raised_weight_search(self):
+        self.assert_equivalent(3.0, weight_search=4000)
+
+    def test_take_off_at_start_of_propulsive_phase(self):
+        force_csv, velocity_csv = cmj_csv(seed=0, after_landing=3)
+        cmj = CMJForceVelStats(VelocityCMJAttribute(velocity_csv), ForceCMJAttribute(force_csv), "Time (s)")
+        prop_start = cmj.get_phases_idx()["propulsive"][0]
+        cmj.df_base.loc[prop_start, "Combined (N)"] = 0.0
+        time, force, velocity = (cmj.df_base[col].to_numpy() for col in ("Time (s)", "Combined (N)",
+                                                                         "Velocity (M/s)"))
+        for chunk in (7, 5000):
+            streaming = stream(cmj, chunk, windows=(50, 100))
+            idxs = CMJForceVelStats.detect_phases(force, velocity, streaming.system_weight)
+            self.assertEqual(idxs["propulsive"], (prop_start, prop_start))
+            self.assertEqual(streaming.get_phases_idx(), idxs)
+            expected = cmj_metrics(time, velocity, force, idxs, streaming.system_weight, 0.001, (50, 100))
+            self.assertEqual(streaming.stats.keys(), expected.keys())
+            for key in ("v_peak_prop", "t_to_v_peak_prop", "f_at_v_peak_prop", "v_avg_50_prop", "v_peak_100_prop"):
+                self.assertTrue(np.isnan(streaming.stats[key]), key)
+            for key, value in expected.items():
+                np.testing.assert_allclose(streaming.stats[key], value, rtol=1e-9, err_msg=key)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Quiet window search of service.system_weight on synthetic traces, including recordings
+which start with empty platform before athlete steps on it.
+"""
+import unittest
+import numpy as np
+
+from service.cmj_stats import CMJForceVelStats, CMJBatchStats
+from service.system_weight import estimate_system_weight, find_quiet_window
+from synthetic_cmj import cmj_trace
+
+
+def with_empty_plate(seconds, seed=0, step_on=0.2):
+    """
+    :return: force and velocity of synthetic jump preceded by seconds of empty platform
+        and step_on seconds of force rising to body weight
+    """
+    _, _, _, force, velocity = cmj_trace(seed=seed)
+    rng = np.random.default_rng(seed)
+    empty = np.abs(rng.normal(0, 0.5, int(seconds * 1000)))
+    ramp = np.linspace(0, force[:200].mean(), int(step_on * 1000))
+    head = np.concatenate([empty, ramp])
+    return np.concatenate([head, force]), np.concatenate([np.zeros(len(head)), velocity]), len(head)
+
+
+class QuietWindowTest(unittest.TestCase):
+
+    def test_empty_plate_before_step_on(self):
+        for seconds in (0.5, 1.5, 3.0):
+            for seed in range(3):
+                _, _, _, reference, _ = cmj_trace(seed=seed)
+                force, velocity, head = with_empty_plate(seconds, seed)
+                weight = estimate_system_weight(force)
+                self.assertGreaterEqual(find_quiet_window(force), head)
+                np.testing.assert_allclose(weight, estimate_system_weight(reference), rtol=1e-12)
+
+                expected = CMJForceVelStats.detect_phases(reference, velocity[head:], weight)
+                phases = CMJForceVelStats.detect_phases(force, velocity, weight, find_quiet_window(force))
+                self.assertEqual({phase: tuple(i - head for i in indexes) for phase, indexes in phases.items()},
+                                 expected)
+
+    def test_empty_plate_in_batch(self):
+        traces = [with_empty_plate(seconds, seed) for seed, seconds in enumerate((0.0, 1.5, 3.0))]
+        force = CMJBatchStats.stack([force for force, _, _ in traces])
+        weight = estimate_system_weight(force)
+        for row, (single_force, _, _) in enumerate(traces):
+            np.testing.assert_allclose([weight[0][row], weight[1][row]], estimate_system_weight(single_force),
+                                       rtol=1e-12)
+            self.assertGreater(weight[0][row], 700)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""
+TrendStore keeps only running aggregates of athlete, gives the same trends whatever order jumps are computed in,
+uses the latest result of jump computed again and does not lose jumps of concurrent updates.
+"""
+import json
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from service.jump_index import BucketJumpIndex, index_entries
+from service.results_store import ResultsStore, result_row
+from service.storage import LocalBucket
+from service.trends import AthleteTrend, TrendStore
+
+
+def jump_row(i, v_peak_prop=None):
+    rng = random.Random(i)
+    stats = {"v_peak_prop": 2.5 + rng.gauss(0, 0.1) if v_peak_prop is None else v_peak_prop,
+             "rsi_mod": 0.4 + rng.gauss(0, 0.05), "jump_height": float("nan")}
+    return result_row("Adam_Lewandowski-10_{}_2020_{}.csv".format(1 + i // 2, i % 2 + 1), stats, {})
+
+
+class TrendStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.bucket = LocalBucket("bucket", tmp.name)
+
+    def store(self, name):
+        return TrendStore(self.bucket, name + "/trends", results=ResultsStore(self.bucket, name + "/results"),
+                          index=BucketJumpIndex(self.bucket, name + "/index"), window=3, baseline_size=4)
+
+    @staticmethod
+    def compute(store, rows):
+        """Stores rows like compute request: results and index first, trends after them"""
+        store.results.append(rows)
+        store.index.add(index_entries(rows))
+        return store.update(rows)
+
+    def assert_same_trend(self, trend, expected):
+        self.assertEqual(trend.last, expected.last)
+        for name, metric in expected.metrics.items():
+            for field, value in metric.to_dict().items():
+                if isinstance(value, float):
+                    self.assertAlmostEqual(getattr(trend.metrics[name], field), value, places=12)
+                else:
+                    self.assertEqual(getattr(trend.metrics[name], field), value)
+
+    def test_state_has_no_history(self):
+        store = self.store("trends")
+        for i in range(12):
+            self.compute(store, [jump_row(i)])
+        state = json.loads(self.bucket.blob(store.blob_name("Adam", "Lewandowski")).download_as_bytes())
+        self.assertEqual(set(state), {"alpha", "window", "baseline_size", "z_threshold", "last", "metrics"})
+        self.assertEqual(len(state["metrics"]["v_peak_prop"]["window"]), 3)
+
+    def test_jumps_in_order_do_not_read_results(self):
+        store = self.store("trends")
+        with mock.patch.object(store.results, "read_jumps", side_effect=AssertionError("results read")):
+            for i in range(0, 6, 2):
+                self.compute(store, [jump_row(i), jump_row(i + 1)])
+
+    def test_late_jumps(self):
+        rows = [jump_row(i) for i in range(12)]
+        in_order = self.store("in_order")
+        self.compute(in_order, rows)
+        shuffled = self.store("shuffled")
+        for row in random.Random(0).sample(rows, len(rows)):
+            summaries = self.compute(shuffled, [row])
+            self.assertEqual([summary["filename"] for summary in summaries[("Adam", "Lewandowski")]],
+                             [row["filename"]])
+        self.assert_same_trend(shuffled.load("Adam", "Lewandowski"), in_order.load("Adam", "Lewandowski"))
+
+    def test_recomputed_jump(self):
+        rows = [jump_row(i) for i in range(6)]
+        expected = self.store("expected")
+        self.compute(expected, rows[:2] + [jump_row(2, v_peak_prop=9.0)] + rows[3:])
+        store = self.store("trends")
+        self.compute(store, rows)
+        for recomputed in ([jump_row(2, v_peak_prop=9.0)], [rows[5]]):
+            summaries = self.compute(store, recomputed)
+            self.assertEqual([summary["filename"] for summary in summaries[("Adam", "Lewandowski")]],
+                             [recomputed[0]["filename"]])
+        self.assert_same_trend(store.load("Adam", "Lewandowski"), expected.load("Adam", "Lewandowski"))
+
+    def test_jumps_without_filename_follow(self):
+        trend = AthleteTrend()
+        row = dict(jump_row(0), filename=None)
+        trend.update_row(row)
+        self.assertTrue(trend.follows(row))
+
+    def test_concurrent_update(self):
+        store, other = self.store("trends"), self.store("trends")
+        self.compute(store, [jump_row(0)])
+        read = store._read
+
+        def read_then_concurrent_update(firstname, lastname):
+            state = read(firstname, lastname)
+            if read_then_concurrent_update.first:
+                read_then_concurrent_update.first = False
+                self.compute(other, [jump_row(1)])
+            return state
+
+        read_then_concurrent_update.first = True
+        store.results.append([jump_row(2)])
+        store.index.add(index_entries([jump_row(2)]))
+        with mock.patch.object(store, "_read", side_effect=read_then_concurrent_update) as patched:
+            summaries = store.update([jump_row(2)])
+        self.assertEqual(patched.call_count, 2)
+        self.assertEqual([summary["filename"] for summary in summaries[("Adam", "Lewandowski")]],
+                         [jump_row(2)["filename"]])
+        trend = store.load("Adam", "Lewandowski")
+        self.assertEqual(trend.last["filename"], jump_row(2)["filename"])
+        self.assertEqual(trend.metrics["v_peak_prop"].n, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,15 @@
 class Config(object):
     DEUBG = False
     TESTING = False
-    UPLOAD_FOLDER = r"data\upload"
+    UPLOAD_FOLDER = "upload"
+    STORAGE_BACKEND = "local"
+    LOCAL_STORAGE_ROOT = "data"
+    UPLOAD_WORKERS = 8
+    UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+    UPLOAD_RETRIES = 3
+    DISPATCH_BACKEND = "local"
+    DISPATCH_CHUNK_SIZE = 0
+    DISPATCH_DELAY = 0
     CMJ_COMP_URL = r"http://127.0.0.1:5001/cmj/compute"
 
 
@@ -30,6 +30,9 @@ try:
         app.config["PROJECT_ID"] = os.environ["PROJECT_ID"]
         app.config["QUEUE_ID"] = os.environ["QUEUE_ID"]
         app.config["QUEUE_LOCATION"] = os.environ["QUEUE_LOCATION"]
+        app.config["DISPATCH_BACKEND"] = os.environ.get("DISPATCH_BACKEND", "cloud_tasks")
+        app.config["DISPATCH_CHUNK_SIZE"] = int(os.environ.get("DISPATCH_CHUNK_SIZE", 0))
+        app.config["DISPATCH_DELAY"] = float(os.environ.get("DISPATCH_DELAY", 0))
     else:
         if os.environ["ENV"] == "LOCAL":
                 app.config.from_envvar('CMJ_SETTINGS')
@@ -37,9 +40,10 @@ try:
                 print("Settings from path loaded")
         elif os.environ["ENV"] == "DEFAULT":
             app.config.from_object('EntryPoint.default_settings.DevelopmentConfig')
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        os.makedirs(r"{}\{}".format(app.config['UPLOAD_FOLDER'], "velocity"), exist_ok=True)
-        os.makedirs(r"{}\{}".format(app.config['UPLOAD_FOLDER'], "force"), exist_ok=True)
+        # local bucket is directory UPLOAD_FOLDER in LOCAL_STORAGE_ROOT, the same as in CMJStats
+        bucket_dir = os.path.join(app.config.get('LOCAL_STORAGE_ROOT', "data"), app.config['UPLOAD_FOLDER'])
+        os.makedirs(os.path.join(bucket_dir, "velocity"), exist_ok=True)
+        os.makedirs(os.path.join(bucket_dir, "force"), exist_ok=True)
 except TypeError:
     log_message(traceback.extract_stack())
     sys.exit(2)
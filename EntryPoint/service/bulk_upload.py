@@ -0,0 +1,76 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core import exceptions
+import requests
+
+from service.cloud_logging import log_message
+
+# errors after which upload is repeated, other errors are raised at once
+TRANSIENT_ERRORS = (exceptions.TooManyRequests, exceptions.ServerError, requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout, ConnectionError, TimeoutError)
+# GCS requires chunk size to be a multiple of 256 kB
+CHUNK_MULTIPLE = 256 * 1024
+
+
+def file_size(file_obj):
+    """
+    :return: number of bytes from current position to the end of seekable file, None if file is not seekable
+    """
+    try:
+        position = file_obj.tell()
+        file_obj.seek(0, os.SEEK_END)
+        size = file_obj.tell() - position
+        file_obj.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def upload_blob(bucket, blob_name: str, file_obj, chunk_size=5 * 1024 * 1024, retries=3, backoff=0.5):
+    """
+    Uploads file to bucket. Files larger than chunk_size are sent in chunks with resumable upload,
+    so connection drop does not restart the whole file. Upload is repeated on transient errors
+    with exponential backoff, file is rewound before every attempt
+    :param bucket: google.cloud.storage.Bucket or service.storage.LocalBucket
+    :param blob_name: name of uploaded blob
+    :param file_obj: file like object opened in binary mode
+    :param chunk_size: size of chunk of resumable upload in bytes, rounded to multiple of 256 kB
+    :param retries: number of repeated attempts after the first one
+    :param backoff: sleep before first repeated attempt in s, doubled after each attempt
+    :return: blob_name
+    """
+    blob = bucket.blob(blob_name)
+    size = file_size(file_obj)
+    if chunk_size and (size is None or size > chunk_size):
+        blob.chunk_size = max(chunk_size // CHUNK_MULTIPLE, 1) * CHUNK_MULTIPLE
+    start = file_obj.tell() if size is not None else None
+    for attempt in range(retries + 1):
+        try:
+            if start is not None:
+                file_obj.seek(start)
+            blob.upload_from_file(file_obj)
+            return blob_name
+        except TRANSIENT_ERRORS as e:
+            if attempt == retries or start is None:
+                raise
+            log_message("Upload of {} failed ({}), retrying in {} s".format(blob_name, e, backoff * 2 ** attempt))
+            time.sleep(backoff * 2 ** attempt)
+
+
+def upload_blobs(bucket, uploads, workers=8, **kwargs):
+    """
+    Uploads files concurrently with bounded number of threads
+    :param bucket: google.cloud.storage.Bucket or service.storage.LocalBucket
+    :param uploads: list of tuples (blob name, file like object)
+    :param workers: maximal number of concurrent uploads
+    :param kwargs: see upload_blob
+    :return: list of uploaded blob names in order of uploads, first error is raised
+        after all uploads have finished
+    """
+    if not uploads:
+        return []
+    with ThreadPoolExecutor(max_workers=max(min(workers, len(uploads)), 1)) as executor:
+        futures = [executor.submit(upload_blob, bucket, blob_name, file_obj, **kwargs)
+                   for blob_name, file_obj in uploads]
+    return [future.result() for future in futures]
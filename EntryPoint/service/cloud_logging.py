@@ -1,7 +1,150 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
 from google.cloud import logging
 
+LOGGER_NAME = "auth-log"
+
+
+class LogSink:
+    """
+    Log records are queued and sent in batches from background thread, so request
+    latency does not include logging RPC. When queue is full emit blocks up to
+    put_timeout (backpressure) and then drops the record. Record that cannot be written is dropped
+    too, other records of its batch are still written.
+    Sink is set with LOG_SINK env variable: "cloud" (default) for Cloud Logging,
+    "stdout" or path to file for local development
+    """
+
+    def __init__(self, logger_name: str, sink=None, max_queue=10000, batch_size=100, flush_interval=1.0,
+                 put_timeout=0.1):
+        self.logger_name = logger_name
+        self.sink = sink if sink is not None else os.environ.get("LOG_SINK", "cloud")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._logger = None
+
+    def _start(self):
+        # started lazily and again in forked worker processes, as threads are not copied by fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue)
+                self._logger = None
+                thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+                thread.start()
+                self._pid = os.getpid()
+
+    def emit(self, kind: str, payload):
+        """
+        :param kind: "text" or "struct"
+        :param payload: str message or dict
+        """
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._queue.put((kind, payload), timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        """
+        Waits until records queued so far are written
+        :return: True if flushed before timeout
+        """
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(("flush", done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _run(self):
+        records_queue = self._queue
+        while True:
+            records = [records_queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(records) < self.batch_size and records[-1][0] != "flush":
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    records.append(records_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            events = [payload for kind, payload in records if kind == "flush"]
+            self._write_batch([record for record in records if record[0] != "flush"])
+            for event in events:
+                event.set()
+
+    def _write_batch(self, records: list):
+        try:
+            self._write(records)
+        except Exception as e:
+            # logging must never break the service
+            print("Log sink write failed: {}".format(e), file=sys.stderr)
+            if len(records) < 2:
+                self.dropped += len(records)
+                return
+            # batch is sent in one call, so one bad record (e.g. NaN in struct payload) fails all of them,
+            # records are written one by one then and only the bad ones are dropped
+            for record in records:
+                try:
+                    self._write([record])
+                except Exception as e:
+                    self.dropped += 1
+                    print("Log record dropped: {}".format(e), file=sys.stderr)
+
+    def _write(self, records: list):
+        if not records:
+            return
+        if self.sink == "cloud":
+            if self._logger is None:
+                self._logger = logging.Client().logger(self.logger_name)
+            batch = self._logger.batch()
+            for kind, payload in records:
+                if kind == "struct":
+                    batch.log_struct(payload)
+                else:
+                    batch.log_text(payload)
+            batch.commit()
+            return
+
+        lines = "".join(json.dumps({"logger": self.logger_name, "kind": kind, "payload": payload}, default=str) + "\n"
+                        for kind, payload in records)
+        if self.sink == "stdout":
+            sys.stdout.write(lines)
+            sys.stdout.flush()
+        else:
+            with open(self.sink, "a") as f:
+                f.write(lines)
+
+
+_sink = LogSink(LOGGER_NAME)
+atexit.register(_sink.flush)
+
 
 def log_message(message):
-    logging_client = logging.Client()
-    logger = logging_client.logger("auth-log")
-    logger.log_text(message)
+    _sink.emit("text", str(message))
+
+
+def log_struct(info: dict):
+    """
+    :param info: dict sent as one structured log record
+    """
+    _sink.emit("struct", info)
+
+
+def flush(timeout=5.0):
+    return _sink.flush(timeout)
@@ -0,0 +1,167 @@
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+from functools import lru_cache
+from google.protobuf import timestamp_pb2
+from google.cloud import tasks_v2
+import requests
+
+from service.cloud_logging import log_message
+
+
+def chunk_manifest(manifest: dict, chunk_size=0):
+    """
+    :param manifest: dict returned by service.upload.upload_gcloud
+    :param chunk_size: number of jumps per chunk, 0 for one chunk with all jumps
+    :return: list of manifests with the same paths and consecutive chunks of filenames
+    """
+    filenames = manifest["filenames"]
+    if chunk_size <= 0 or len(filenames) <= chunk_size:
+        return [manifest]
+    return [dict(manifest, filenames=filenames[i:i + chunk_size]) for i in range(0, len(filenames), chunk_size)]
+
+
+def task_id():
+    """
+    str(datetime.utcnow()) returns string with illegal characters for task's name like "-", ".", ":" etc.
+    (e.g '2021-02-27 17:01:23.864414'), hence only digits are kept
+    """
+    return "".join(filter(str.isdigit, str(datetime.datetime.utcnow())))
+
+
+class Dispatcher:
+    """Sends manifest of uploaded files to compute service, split in chunks of chunk_size jumps"""
+
+    def __init__(self, url: str, chunk_size=0, delay=0):
+        """
+        :param url: url of compute endpoint
+        :param chunk_size: number of jumps per task, 0 for one task with all jumps
+        :param delay: delay of task in s, 0 to compute right after files were uploaded
+        """
+        self.url = url
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    def dispatch(self, manifest: dict):
+        """
+        :param manifest: dict returned by service.upload.upload_gcloud
+        :return: list of names of created tasks, one per chunk
+        """
+        base = task_id()
+        chunks = chunk_manifest(manifest, self.chunk_size)
+        if len(chunks) == 1:
+            return [self.send(base, chunks[0])]
+        return [self.send("{}_{}".format(base, i), chunk) for i, chunk in enumerate(chunks)]
+
+    def send(self, name: str, body: dict):
+        raise NotImplementedError
+
+
+@lru_cache(maxsize=None)
+def _get_tasks_client(pid: int):
+    """One client per process, see service.storage._get_client"""
+    return tasks_v2.CloudTasksClient()
+
+
+class CloudTasksDispatcher(Dispatcher):
+    """Creates one Cloud Tasks http task per chunk"""
+
+    def __init__(self, url: str, project: str, location: str, queue_id: str, chunk_size=0, delay=0):
+        super().__init__(url, chunk_size, delay)
+        self.project = project
+        self.location = location
+        self.queue_id = queue_id
+
+    def send(self, name: str, body: dict):
+        client = _get_tasks_client(os.getpid())
+        parent = client.queue_path(self.project, self.location, self.queue_id)
+        task = {
+            'name': '{}/tasks/{}'.format(parent, name),
+            'http_request': {
+                'http_method': tasks_v2.HttpMethod.POST,
+                'headers': {'Content-Type': 'application/json'},
+                'url': self.url,
+                'body': json.dumps(body).encode(),
+            }
+        }
+        if self.delay > 0:
+            timestamp = timestamp_pb2.Timestamp()
+            timestamp.FromDatetime(datetime.datetime.utcnow() + datetime.timedelta(seconds=self.delay))
+            task['schedule_time'] = timestamp
+        response = client.create_task(request={"parent": parent, "task": task})
+        log_message("Request {}: {} sent to url: {}".format(response.name, response.view, self.url))
+        return response.name
+
+
+class LocalDispatcher(Dispatcher):
+    """
+    In-process queue, chunks are posted to compute url one after another by background thread,
+    so upload request is not blocked by computations. Meant for local runs and tests
+    """
+
+    def __init__(self, url: str, chunk_size=0, delay=0, post=None):
+        """
+        :param post: callable taking url and json body used instead of requests.post, e.g. post of flask test client
+        """
+        super().__init__(url, chunk_size, delay)
+        self.post = post if post is not None else self._post
+        self.queue = queue.Queue()
+        self.responses = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _post(url, json):
+        return requests.post(url, json=json, timeout=600)
+
+    def send(self, name: str, body: dict):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="local-dispatcher", daemon=True)
+                self._thread.start()
+        self.queue.put((name, time.monotonic() + self.delay, body))
+        log_message("Task {} queued locally for url: {}".format(name, self.url))
+        return name
+
+    def join(self):
+        """Blocks until all queued tasks are sent"""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            name, due, body = self.queue.get()
+            try:
+                time.sleep(max(due - time.monotonic(), 0))
+                self.responses[name] = self.post(self.url, json=body)
+            except Exception as e:
+                log_message("Task {} failed: {}".format(name, e))
+            finally:
+                self.queue.task_done()
+
+
+@lru_cache(maxsize=None)
+def _get_local_dispatcher(pid: int, url: str, chunk_size: int, delay: float):
+    return LocalDispatcher(url, chunk_size, delay)
+
+
+def get_dispatcher(config):
+    """
+    :param config: flask app config, DISPATCH_BACKEND is "cloud_tasks" (default) or "local",
+        DISPATCH_CHUNK_SIZE is number of jumps per task (0 for one task) and DISPATCH_DELAY is delay of task in s
+    :return: dispatcher sending manifests to CMJ_COMP_URL
+    """
+    backend = config.get("DISPATCH_BACKEND", "cloud_tasks")
+    chunk_size = int(config.get("DISPATCH_CHUNK_SIZE", 0))
+    delay = float(config.get("DISPATCH_DELAY", 0))
+    if backend == "local":
+        return _get_local_dispatcher(os.getpid(), config["CMJ_COMP_URL"], chunk_size, delay)
+    elif backend == "cloud_tasks":
+        return CloudTasksDispatcher(config["CMJ_COMP_URL"],
+                                    project=config.get("PROJECT_ID", 'athletes-dashboard-306517'),
+                                    location=config.get("QUEUE_LOCATION", "europe-west1"),
+                                    queue_id=config.get("QUEUE_ID", 'athletes-dashboard'),
+                                    chunk_size=chunk_size, delay=delay)
+    raise ValueError("Unknown dispatch backend: {}".format(backend))
@@ -1,44 +1,97 @@
-from copy import deepcopy
+import re
+from collections import namedtuple
 from datetime import date
+from functools import lru_cache
+
+# Force-First_Last_Countermovement_Jump-10_14_2020_07-00-26 2.csv, optionally preceded by directories.
+# Surname takes everything between first name and test name, so multi-part and hyphenated surnames are kept
+HAWKIN_NAME_RE = re.compile(
+    r"^(?:.*[\\/])?"
+    r"(?P<kind>[^-_\\/]+)-"
+    r"(?P<firstname>[^_]+)_(?P<lastname>.+?)_(?P<test>[A-Za-z]+_Jump)-"
+    r"(?P<month>\d{1,2})_(?P<day>\d{1,2})_(?P<year>\d{4})"
+    r"(?:_(?P<time>\d{1,2}-\d{2}-\d{2}))?"
+    r"(?: (?P<trial>\d+))?"
+    r"\.csv$",
+    re.IGNORECASE)
+
+HawkinName = namedtuple("HawkinName", ["filename", "firstname", "lastname", "date", "time", "trial"])
+
+
+@lru_cache(maxsize=4096)
+def parse_hawkin_name(filename: str) -> HawkinName:
+    """
+    :param filename: str in format of Hawkin Dynamics platform
+    :return: HawkinName with filename in format First_Last-M_D_YYYY.csv, with _HH-MM-SS for time of export
+        and _N for trial N after year, time of jump as str HH-MM-SS (None if missing) and trial number
+        (None if missing)
+    """
+    match = HAWKIN_NAME_RE.match(filename)
+    if match is None:
+        raise ValueError("Provided file has wrong format")
+    month, day, year = match.group("month", "day", "year")
+    firstname, lastname = match.group("firstname", "lastname")
+    trial, time = match.group("trial", "time")
+    if time is not None:
+        hour, rest = time.split("-", 1)
+        time = "{:02d}-{}".format(int(hour), rest)
+    # time and trial are kept in filename, so exports of the same athlete and day do not overwrite each other
+    suffix = "".join("_{}".format(part) for part in (time, trial) if part is not None)
+    return HawkinName(filename="{}_{}-{}_{}_{}{}.csv".format(firstname, lastname, month, day, year, suffix),
+                      firstname=firstname,
+                      lastname=lastname,
+                      date=date(int(year), int(month), int(day)),
+                      time=time,
+                      trial=int(trial) if trial is not None else None)
 
 
 class CmjCsvName:
     """Class that parses filename in format from Hawkin Dynamics force platform"""
+    __slots__ = ("name", )
 
     def __init__(self, filename: str):
         """
         :param filename: str in format of Hawkin Dynamics platform.
         """
-        self.filename = CmjCsvName.parse_cmj_csv_name(filename)
-        if not self._check_extension():
-            raise ValueError("Provided file has wrong format")
-        self.firstname = self.get_firstname()
-        self.lastname = self.get_lastname()
-        self.date = self.get_date()
+        self.name = parse_hawkin_name(filename)
 
     @classmethod
     def parse_cmj_csv_name(cls, filename):
-        jump = filename.split('-')
-        jump_athlete = jump[1].split('_')[0:2]
-        jump_date = jump[2].split('_')[0:3]
-        jump_athlete = "_".join(jump_athlete)
-        jump_date = "_".join(jump_date)
-        jump = "-".join((jump_athlete, jump_date))
-        return jump + ".csv"
+        return parse_hawkin_name(filename).filename
 
-    def _check_extension(self):
-        return self.filename.rsplit('.', 1)[1].lower() == "csv"
+    @property
+    def filename(self):
+        return self.name.filename
+
+    @property
+    def firstname(self):
+        return self.name.firstname
+
+    @property
+    def lastname(self):
+        return self.name.lastname
+
+    @property
+    def date(self):
+        """us date format"""
+        return self.name.date
+
+    @property
+    def time(self):
+        return self.name.time
+
+    @property
+    def trial(self):
+        return self.name.trial
 
     def get_lastname(self):
-        return self.filename.split("-")[0].split("_")[1]
+        return self.lastname
 
     def get_firstname(self):
-        return self.filename.split("-")[0].split("_")[0]
+        return self.firstname
 
     def get_date(self):
-        """us date format"""
-        date_str = self.filename.split("-")[1].split(".")[0].split("_")
-        return date(int(date_str[2]), int(date_str[0]), int(date_str[1]))
+        return self.date
 
     def __repr__(self):
         return "CmjCsvName({})".format(self.filename)
@@ -49,6 +102,7 @@ class CmjCsvName:
 
 class CmjCsvFile:
     """Class that represents file-like csv from Hawkin Dynamics """
+    __slots__ = ("file", "csv_filename")
 
     def __init__(self, _file):
         """
@@ -64,56 +118,55 @@ class CmjCsvFile:
         else:
             raise TypeError("Wrong file type")
 
+    @property
+    def key(self):
+        """Key on which files are sorted and force files are paired with velocity files"""
+        trial = self.csv_filename.trial
+        return (self.csv_filename.lastname, self.csv_filename.firstname, self.csv_filename.date,
+                self.csv_filename.time or "", trial if trial is not None else -1)
+
 
 class CmjCsvFilesList:
-    """List of CSV files from Hawking Dynamics"""
+    """List of CSV files from Hawking Dynamics indexed by (lastname, firstname, date, time, trial)"""
 
-    def __init__(self, files_list=[]):
+    def __init__(self, files_list=None):
         """
         :param files_list: list of file like objects from Hawkin Dynamics
         """
         self.filenames = []
         self.files_list = []
+        self.index = {}
         if files_list:
             for _file in files_list:
-                csv_file = CmjCsvFile(_file)
-                self.files_list.append(csv_file)
-                self.filenames.append(csv_file.csv_filename.filename)
+                self.append(_file)
 
     def append(self, _file):
         csv_file = CmjCsvFile(_file)
         self.files_list.append(csv_file)
         self.filenames.append(csv_file.csv_filename.filename)
+        self.index.setdefault(csv_file.key, []).append(csv_file)
 
     def sort_list(self):
-        athletes = self.files_list
-        n = len(athletes)
-        for i in range(n):
-            for j in range(n - 1 - i):
-                temp1 = athletes[j]
-                temp2 = athletes[j + 1]
-
-                if temp1.csv_filename.lastname > temp2.csv_filename.lastname:
-                    athletes[j], athletes[j + 1] = athletes[j + 1], athletes[j]
-
-        for i in range(n):
-            for j in range(n - 1 - i):
-                temp1 = athletes[j]
-                temp2 = athletes[j + 1]
-                if temp1.csv_filename.lastname == temp2.csv_filename.lastname \
-                        and temp1.csv_filename.firstname > temp2.csv_filename.firstname:
-                    athletes[j], athletes[j + 1] = athletes[j + 1], athletes[j]
-
-        for i in range(n):
-            for j in range(n - 1 - i):
-                temp1 = athletes[j]
-                temp2 = athletes[j + 1]
-
-                if temp1.csv_filename.lastname == temp2.csv_filename.lastname \
-                        and temp1.csv_filename.firstname == temp2.csv_filename.firstname \
-                        and temp1.csv_filename.date > temp2.csv_filename.date:
-                    athletes[j], athletes[j + 1] = athletes[j + 1], athletes[j]
-        self.files_list = athletes
+        """Stable sort by lastname, firstname, date, time and trial"""
+        self.files_list.sort(key=lambda csv_file: csv_file.key)
+        self.filenames = [csv_file.csv_filename.filename for csv_file in self.files_list]
+
+    def pair_with(self, other: 'CmjCsvFilesList'):
+        """
+        Pairs files of this list with files of other list having the same key, e.g. force with velocity files
+        :return: tuple of list of paired files (file from this list, file from other list),
+            list of unmatched files from this list and list of unmatched files from other list
+        """
+        pairs, unmatched, other_unmatched = [], [], []
+        for key, files in self.index.items():
+            other_files = other.index.get(key, [])
+            pairs.extend(zip(files, other_files))
+            unmatched.extend(files[len(other_files):])
+            other_unmatched.extend(other_files[len(files):])
+        for key, other_files in other.index.items():
+            if key not in self.index:
+                other_unmatched.extend(other_files)
+        return pairs, unmatched, other_unmatched
 
     def get_len(self):
         return len(self.files_list)
@@ -123,26 +176,3 @@ class MockFile:
     def __init__(self, filename):
         self.filename = filename
 
-
-if __name__ == "__main__":
-    athletess = [MockFile("Force-Robin_Volkmar_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
-                 MockFile("Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
-                 MockFile("Force-Robin_Volkmar_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
-                 MockFile("Force-Szymon_Karpecki_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
-                 MockFile("Force-Robin_Volkmar_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
-                 MockFile("Force-Bartlomiej_Karpecki_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
-                 MockFile("Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 2.csv")]
-
-    cmj_list = CmjCsvFilesList(athletess)
-    cmj_list.sort_list()
-    for file in cmj_list.files_list:
-        s = file.csv_filename
-        print(s)
-    print(cmj_list.get_len())
-
-
-    with open(
-            r"C:\Users\Szymon\Desktop\data\force\Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 2.csv") as file:
-        cmj_file = CmjCsvFile(file)
-        print()
-        print(cmj_file.csv_filename)
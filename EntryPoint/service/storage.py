@@ -0,0 +1,136 @@
+import os
+import shutil
+import threading
+import time
+from functools import lru_cache
+from google.api_core import exceptions
+from google.cloud import storage
+
+# check of generation and write of local blob are one step for all threads of process
+_local_write_lock = threading.Lock()
+
+
+class LocalBlob:
+    """Stand-in of google.cloud.storage.Blob backed by file on local disk"""
+
+    def __init__(self, name: str, bucket: 'LocalBucket'):
+        self.name = name
+        self.bucket = bucket
+
+    @property
+    def path(self):
+        return os.path.join(self.bucket.root, self.name)
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    @property
+    def generation(self):
+        """Generation of blob, like in GCS it changes with every write, None when blob does not exist"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def download_to_file(self, file_obj):
+        with open(self.path, "rb") as f:
+            shutil.copyfileobj(f, file_obj)
+
+    def download_as_bytes(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def upload_from_file(self, file_obj):
+        self.upload_from_string(file_obj.read())
+
+    def upload_from_string(self, data, content_type="text/plain", if_generation_match=None):
+        """
+        :param if_generation_match: blob is written only when its generation is still the same, 0 when it must
+            not exist, raises google.api_core.exceptions.PreconditionFailed otherwise like GCS
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with _local_write_lock:
+            generation = self.generation
+            if if_generation_match is not None and if_generation_match != (generation or 0):
+                raise exceptions.PreconditionFailed("Generation of {} is not {}".format(self.name,
+                                                                                       if_generation_match))
+            with open(self.path, "wb") as f:
+                f.write(data.encode() if isinstance(data, str) else data)
+            # generation is modification time, kept increasing when writes fall within clock resolution
+            if generation is not None:
+                os.utime(self.path, ns=(time.time_ns(), max(time.time_ns(), generation + 1)))
+
+    def delete(self):
+        os.remove(self.path)
+
+
+class LocalBucket:
+    """Stand-in of google.cloud.storage.Bucket, blobs are files in directory named after the bucket"""
+
+    def __init__(self, name: str, root: str):
+        """
+        :param name: bucket name
+        :param root: directory in which bucket directory is placed
+        """
+        self.name = name
+        self.root = os.path.join(root, name)
+
+    def blob(self, blob_name):
+        return LocalBlob(blob_name, self)
+
+    def get_blob(self, blob_name):
+        """
+        :return: blob with its generation, None when it does not exist
+        """
+        blob = LocalBlob(blob_name, self)
+        return blob if blob.exists() else None
+
+    def list_blobs(self, prefix=""):
+        """
+        :return: blobs with names starting with prefix, sorted by name
+        """
+        names = []
+        for directory, _, files in os.walk(self.root):
+            for file in files:
+                name = os.path.relpath(os.path.join(directory, file), self.root).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    names.append(name)
+        return [LocalBlob(name, self) for name in sorted(names)]
+
+
+@lru_cache(maxsize=None)
+def _get_client(pid: int):
+    """
+    One client per process, reused for its whole life, so client construction and auth
+    is not paid on every request. Keyed by pid as client must not be shared with forked workers
+    """
+    return storage.Client()
+
+
+@lru_cache(maxsize=None)
+def _get_bucket(pid: int, name: str, backend: str, root: str):
+    if backend == "local":
+        return LocalBucket(name, root if root is not None else "data")
+    elif backend == "gcs":
+        return _get_client(pid).bucket(name)
+    raise ValueError("Unknown storage backend: {}".format(backend))
+
+
+def get_bucket(name: str, backend="gcs", root=None):
+    """
+    :param name: bucket name
+    :param backend: "gcs" for Google Cloud Storage or "local" for local disk
+    :param root: directory with buckets for local backend
+    :return: bucket object, cached for the life of the process
+    """
+    return _get_bucket(os.getpid(), name, backend, root)
+
+
+def bucket_config(config):
+    """
+    :param config: flask app config
+    :return: kwargs of get_bucket for bucket set in UPLOAD_FOLDER, STORAGE_BACKEND and LOCAL_STORAGE_ROOT
+    """
+    return {"name": config["UPLOAD_FOLDER"],
+            "backend": config.get("STORAGE_BACKEND", "gcs"),
+            "root": config.get("LOCAL_STORAGE_ROOT")}
@@ -1,27 +1,26 @@
 from flask import current_app
-from google.cloud import storage
 import datetime
-from collections import Counter
 
 from service.hawkin_csv_parser import CmjCsvFile, CmjCsvFilesList
 from service.cloud_logging import log_message
+from service.storage import get_bucket, bucket_config
+from service.bulk_upload import upload_blobs
 
 def upload_gcloud(force_files: CmjCsvFilesList, velocity_files: CmjCsvFilesList):
-    storage_client = storage.Client()
-    bucket = storage_client.bucket(current_app.config['UPLOAD_FOLDER'])
+    bucket = get_bucket(**bucket_config(current_app.config))
 
     now = datetime.datetime.now()
     now = "{}{}{}{}".format(now.hour, now.minute, now.second, now.microsecond)
-    force_path = current_app.config['UPLOAD_FOLDER'] + r"force/{}/".format(now)
-    velocity_path = current_app.config['UPLOAD_FOLDER'] + r"velocity/{}/".format(now)
+    force_path = "force/{}/".format(now)
+    velocity_path = "velocity/{}/".format(now)
 
-    for csv_file in force_files.files_list:
-        blob = bucket.blob(force_path + csv_file.csv_filename.filename)
-        blob.upload_from_file(csv_file.file)
-
-    for csv_file in velocity_files.files_list:
-        blob = bucket.blob(velocity_path + csv_file.csv_filename.filename)
-        blob.upload_from_file(csv_file.file)
+    uploads = [(force_path + csv_file.csv_filename.filename, csv_file.file) for csv_file in force_files.files_list]
+    uploads += [(velocity_path + csv_file.csv_filename.filename, csv_file.file)
+                for csv_file in velocity_files.files_list]
+    upload_blobs(bucket, uploads,
+                 workers=current_app.config.get("UPLOAD_WORKERS", 8),
+                 chunk_size=current_app.config.get("UPLOAD_CHUNK_SIZE", 5 * 1024 * 1024),
+                 retries=current_app.config.get("UPLOAD_RETRIES", 3))
 
     return {"filenames": velocity_files.filenames,
             "force_path": force_path,
@@ -40,13 +39,17 @@ def verify_files(force_files: CmjCsvFilesList, velocity_files: CmjCsvFilesList):
     if len(velocity_files.files_list) == 0 or len(force_files.files_list) == 0:
         raise ValueError("No velocity or force files provided")
 
-    force_files_counter = dict(Counter(force_files.files_list))
-    velocity_files_counter = dict(Counter(force_files.files_list))
-
-    log_message("Force: {}".format(str(force_files_counter)))
-    log_message("Velocity: {}".format(str(velocity_files_counter)))
-
-    if force_files_counter != velocity_files_counter:
+    # files with the same key would be uploaded under the same canonical filename and overwrite each other
+    duplicates = [str(files[0].csv_filename) for files_list in (force_files, velocity_files)
+                  for files in files_list.index.values() if len(files) > 1]
+    if duplicates:
+        log_message("Duplicate files: {}".format(duplicates))
+        raise ValueError("Files of the same jump provided more than once")
+
+    _, unmatched_force, unmatched_velocity = force_files.pair_with(velocity_files)
+    if unmatched_force or unmatched_velocity:
+        log_message("Unmatched force: {}, unmatched velocity: {}".format(
+            [str(f.csv_filename) for f in unmatched_force], [str(f.csv_filename) for f in unmatched_velocity]))
         raise ValueError("Different velocity and force files provided")
 
     return force_files, velocity_files
@@ -0,0 +1,12 @@
+"""
+Test setup of EntryPoint, run from EntryPoint directory: python -m pytest tests.
+Service modules are imported from EntryPoint, log records are discarded
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (TESTS_DIR, os.path.join(TESTS_DIR, "..")):
+    if os.path.abspath(path) not in map(os.path.abspath, sys.path):
+        sys.path.insert(0, os.path.abspath(path))
+os.environ.setdefault("LOG_SINK", os.devnull)
@@ -0,0 +1,92 @@
+"""
+upload_blobs repeats uploads failing with transient errors with exponential backoff, rewinding file
+before every attempt, and a file that keeps failing does not stop upload of other files.
+"""
+import io
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from google.api_core import exceptions
+
+from service.bulk_upload import upload_blob, upload_blobs
+from service.storage import LocalBlob, LocalBucket
+
+
+class FlakyBlob(LocalBlob):
+
+    def upload_from_file(self, file_obj):
+        with self.bucket.lock:
+            self.bucket.attempts[self.name] = self.bucket.attempts.get(self.name, 0) + 1
+            failing = self.bucket.failures.get(self.name, 0) >= self.bucket.attempts[self.name]
+        if failing:
+            # part of file is read before connection drops
+            file_obj.read(2)
+            raise self.bucket.error("Upload of {} failed".format(self.name))
+        super().upload_from_file(file_obj)
+
+
+class FlakyBucket(LocalBucket):
+    """Local bucket whose blobs fail first failures[blob name] uploads"""
+
+    def __init__(self, root, failures, error=exceptions.ServiceUnavailable):
+        super().__init__("upload", root)
+        self.failures = failures
+        self.error = error
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def blob(self, blob_name):
+        return FlakyBlob(blob_name, self)
+
+
+class BulkUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        patcher = mock.patch("service.bulk_upload.time.sleep")
+        self.addCleanup(patcher.stop)
+        self.sleep = patcher.start()
+
+    @staticmethod
+    def uploads(n):
+        return [("force/1/{}.csv".format(i), io.BytesIO("Time,Force\n{}\n".format(i).encode())) for i in range(n)]
+
+    def test_retries_with_backoff(self):
+        bucket = FlakyBucket(self.root, {"force/1/0.csv": 2})
+        self.assertEqual(upload_blob(bucket, *self.uploads(1)[0], retries=3, backoff=0.5), "force/1/0.csv")
+        self.assertEqual(bucket.attempts["force/1/0.csv"], 3)
+        self.assertEqual([c.args[0] for c in self.sleep.call_args_list], [0.5, 1.0])
+        # file is rewound before every attempt, so whole file is uploaded
+        self.assertEqual(bucket.blob("force/1/0.csv").download_as_bytes(), b"Time,Force\n0\n")
+
+    def test_failing_file_does_not_stop_others(self):
+        bucket = FlakyBucket(self.root, {"force/1/1.csv": 10, "force/1/2.csv": 1})
+        uploads = self.uploads(4)
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            upload_blobs(bucket, uploads, workers=2, retries=3, backoff=0.5)
+        self.assertEqual(bucket.attempts, {"force/1/0.csv": 1, "force/1/1.csv": 4, "force/1/2.csv": 2,
+                                           "force/1/3.csv": 1})
+        self.assertEqual(sorted(c.args[0] for c in self.sleep.call_args_list), [0.5, 0.5, 1.0, 2.0])
+        self.assertEqual([blob.name for blob in bucket.list_blobs()],
+                         ["force/1/0.csv", "force/1/2.csv", "force/1/3.csv"])
+
+    def test_other_errors_are_not_retried(self):
+        bucket = FlakyBucket(self.root, {"force/1/0.csv": 1}, error=exceptions.Forbidden)
+        with self.assertRaises(exceptions.Forbidden):
+            upload_blobs(bucket, self.uploads(2), retries=3)
+        self.assertEqual(bucket.attempts, {"force/1/0.csv": 1, "force/1/1.csv": 1})
+        self.sleep.assert_not_called()
+
+    def test_large_file_is_uploaded_in_chunks(self):
+        bucket = FlakyBucket(self.root, {})
+        blob = bucket.blob("force/1/0.csv")
+        with mock.patch.object(bucket, "blob", return_value=blob):
+            upload_blob(bucket, "force/1/0.csv", io.BytesIO(b"0" * (600 * 1024)), chunk_size=500 * 1024)
+        self.assertEqual(blob.chunk_size, 256 * 1024)
+
+
+if __name__ == "__main__":
+    unittest.main()
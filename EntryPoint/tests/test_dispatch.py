@@ -0,0 +1,111 @@
+"""
+Dispatchers split manifest of uploaded files into chunks of DISPATCH_CHUNK_SIZE jumps: CloudTasksDispatcher
+creates one task per chunk scheduled DISPATCH_DELAY s later, LocalDispatcher posts chunks in order
+from background thread.
+"""
+import datetime
+import json
+import time
+import types
+import unittest
+from unittest import mock
+
+from service.dispatch import CloudTasksDispatcher, LocalDispatcher, chunk_manifest, get_dispatcher
+
+MANIFEST = {"filenames": ["Adam_Lewandowski-10_14_2020_{}.csv".format(i) for i in range(1, 6)],
+            "force_path": "force/123/", "velocity_path": "velocity/123/"}
+URL = "http://127.0.0.1:5001/cmj/compute"
+
+
+class StubTasksClient:
+    """Stand-in of tasks_v2.CloudTasksClient, keeps created tasks"""
+
+    def __init__(self):
+        self.requests = []
+
+    @staticmethod
+    def queue_path(project, location, queue_id):
+        return "projects/{}/locations/{}/queues/{}".format(project, location, queue_id)
+
+    def create_task(self, request):
+        self.requests.append(request)
+        return types.SimpleNamespace(name=request["task"]["name"], view="BASIC")
+
+
+class CloudTasksDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = StubTasksClient()
+        patcher = mock.patch("service.dispatch._get_tasks_client", return_value=self.client)
+        self.addCleanup(patcher.stop)
+        patcher.start()
+
+    def dispatch(self, chunk_size, delay):
+        dispatcher = CloudTasksDispatcher(URL, "project", "europe-west1", "queue", chunk_size=chunk_size, delay=delay)
+        return dispatcher.dispatch(MANIFEST)
+
+    def test_task_per_chunk(self):
+        names = self.dispatch(chunk_size=2, delay=0)
+        tasks = [request["task"] for request in self.client.requests]
+        self.assertEqual([task["name"] for task in tasks], names)
+        self.assertEqual(len(set(names)), 3)
+        for request, task in zip(self.client.requests, tasks):
+            self.assertEqual(request["parent"], "projects/project/locations/europe-west1/queues/queue")
+            self.assertTrue(task["name"].startswith(request["parent"] + "/tasks/"))
+            self.assertEqual(task["http_request"]["url"], URL)
+            self.assertNotIn("schedule_time", task)
+        bodies = [json.loads(task["http_request"]["body"]) for task in tasks]
+        self.assertEqual([len(body["filenames"]) for body in bodies], [2, 2, 1])
+        self.assertEqual(sum((body["filenames"] for body in bodies), []), MANIFEST["filenames"])
+        self.assertEqual({body["force_path"] for body in bodies}, {MANIFEST["force_path"]})
+
+    def test_one_task_without_chunk_size(self):
+        self.dispatch(chunk_size=0, delay=0)
+        self.assertEqual(len(self.client.requests), 1)
+        self.assertEqual(json.loads(self.client.requests[0]["task"]["http_request"]["body"]), MANIFEST)
+
+    def test_schedule_time(self):
+        before = datetime.datetime.utcnow()
+        self.dispatch(chunk_size=2, delay=30)
+        after = datetime.datetime.utcnow()
+        for request in self.client.requests:
+            scheduled = request["task"]["schedule_time"].ToDatetime()
+            self.assertLessEqual(before + datetime.timedelta(seconds=30), scheduled)
+            self.assertLessEqual(scheduled, after + datetime.timedelta(seconds=30))
+
+
+class LocalDispatcherTest(unittest.TestCase):
+
+    def test_chunks_are_posted_in_order(self):
+        posted = []
+
+        def post(url, json):
+            posted.append((url, json, time.monotonic()))
+            if len(posted) == 2:
+                raise ConnectionError("compute service is down")
+            return len(posted)
+
+        dispatcher = LocalDispatcher(URL, chunk_size=2, delay=0.05, post=post)
+        start = time.monotonic()
+        names = dispatcher.dispatch(MANIFEST)
+        dispatcher.join()
+        self.assertEqual([body["filenames"] for _, body, _ in posted],
+                         [MANIFEST["filenames"][i:i + 2] for i in (0, 2, 4)])
+        self.assertEqual({url for url, _, _ in posted}, {URL})
+        self.assertGreaterEqual(posted[0][2] - start, 0.05)
+        # failed chunk does not stop the next ones
+        self.assertEqual(dispatcher.responses, {names[0]: 1, names[2]: 3})
+
+    def test_get_dispatcher(self):
+        config = {"DISPATCH_BACKEND": "local", "CMJ_COMP_URL": URL, "DISPATCH_CHUNK_SIZE": "2"}
+        dispatcher = get_dispatcher(config)
+        self.assertIsInstance(dispatcher, LocalDispatcher)
+        self.assertIs(get_dispatcher(config), dispatcher)
+        self.assertEqual(len(chunk_manifest(MANIFEST, dispatcher.chunk_size)), 3)
+        self.assertIsInstance(get_dispatcher(dict(config, DISPATCH_BACKEND="cloud_tasks")), CloudTasksDispatcher)
+        with self.assertRaises(ValueError):
+            get_dispatcher(dict(config, DISPATCH_BACKEND="pubsub"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Hawkin Dynamics filenames are parsed with one compiled regex into HawkinName records cached by filename.
+"""
+import datetime
+import io
+import unittest
+
+from service.hawkin_csv_parser import (HAWKIN_NAME_RE, CmjCsvFile, CmjCsvFilesList, HawkinName, MockFile,
+                                       parse_hawkin_name)
+
+
+class HawkinNameTest(unittest.TestCase):
+
+    def setUp(self):
+        parse_hawkin_name.cache_clear()
+
+    def test_parse(self):
+        self.assertEqual(parse_hawkin_name("Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 2.csv"),
+                         HawkinName("Adam_Lewandowski-10_14_2020_07-00-26_2.csv", "Adam", "Lewandowski",
+                                    datetime.date(2020, 10, 14), "07-00-26", 2))
+        self.assertEqual(parse_hawkin_name("Velocity-Adam_Lewandowski_Countermovement_Jump-1_4_2021.csv"),
+                         HawkinName("Adam_Lewandowski-1_4_2021.csv", "Adam", "Lewandowski",
+                                    datetime.date(2021, 1, 4), None, None))
+
+    def test_regex(self):
+        match = HAWKIN_NAME_RE.match(r"C:\data\force\force-Jan_Nowak-Kowalski_Squat_Jump-10_14_2020_7-05-09.CSV")
+        self.assertEqual(match.group("kind", "firstname", "lastname", "test", "time", "trial"),
+                         ("force", "Jan", "Nowak-Kowalski", "Squat_Jump", "7-05-09", None))
+        self.assertEqual(HAWKIN_NAME_RE.match("data/velocity/Velocity-Jan_de_la_Cruz_Countermovement_Jump-"
+                                              "10_14_2020.csv").group("lastname"), "de_la_Cruz")
+        for filename in ("Force-Adam_Lewandowski_Countermovement_Jump-10_14_20.csv",
+                         "Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020.txt",
+                         "Force-Adam_Countermovement_Jump-10_14_2020.csv",
+                         "Adam_Lewandowski-10_14_2020.csv"):
+            with self.subTest(filename=filename):
+                self.assertIsNone(HAWKIN_NAME_RE.match(filename))
+                with self.assertRaises(ValueError):
+                    parse_hawkin_name(filename)
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            parse_hawkin_name("Force-Adam_Lewandowski_Countermovement_Jump-13_14_2020.csv")
+
+    def test_parse_is_cached(self):
+        filename = "Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 2.csv"
+        files = CmjCsvFilesList([MockFile(filename), MockFile(filename.replace("Force", "Velocity"))])
+        self.assertEqual(parse_hawkin_name.cache_info().misses, 2)
+        self.assertIs(CmjCsvFile(MockFile(filename)).csv_filename.name, files.files_list[0].csv_filename.name)
+        self.assertEqual(parse_hawkin_name.cache_info().hits, 1)
+
+    def test_file_like_object(self):
+        file = io.BytesIO(b"Time (s),Combined (N)\n")
+        file.name = "data/force/Force-Adam_Lewandowski_Countermovement_Jump-10_14_2020.csv"
+        self.assertEqual(str(CmjCsvFile(file).csv_filename), "Adam_Lewandowski-10_14_2020.csv")
+        with self.assertRaises(TypeError):
+            CmjCsvFile(io.BytesIO())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+Force and velocity files are paired by athlete, date, time and trial of export: trials of one day are kept
+apart, time-stamped names are matched and the same jump sent twice is rejected before upload.
+"""
+import unittest
+
+from service.hawkin_csv_parser import CmjCsvFilesList, CmjCsvName, MockFile
+from service.upload import verify_files
+
+NAMES = ["Adam_Lewandowski_Countermovement_Jump-10_14_2020.csv",
+         "Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26.csv",
+         "Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 2.csv",
+         "Robin_Volkmar_Countermovement_Jump-10_14_2020_9-30-00.csv"]
+
+
+def files(kind, names):
+    return [MockFile("{}-{}".format(kind, name)) for name in names]
+
+
+class CmjCsvNameTest(unittest.TestCase):
+
+    def test_trials_of_one_day(self):
+        first, second = CmjCsvName("Force-" + NAMES[1]), CmjCsvName("Force-" + NAMES[2])
+        self.assertEqual((first.date, first.time, first.trial), (second.date, second.time, None))
+        self.assertEqual(second.trial, 2)
+        self.assertEqual([first.filename, second.filename], ["Adam_Lewandowski-10_14_2020_07-00-26.csv",
+                                                             "Adam_Lewandowski-10_14_2020_07-00-26_2.csv"])
+
+    def test_time_stamped_name(self):
+        name = CmjCsvName("Velocity-" + NAMES[3])
+        self.assertEqual((name.firstname, name.lastname, name.time), ("Robin", "Volkmar", "09-30-00"))
+        self.assertEqual(str(name), "Robin_Volkmar-10_14_2020_09-30-00.csv")
+        self.assertIsNone(CmjCsvName("Force-" + NAMES[0]).time)
+
+
+class VerifyFilesTest(unittest.TestCase):
+
+    def test_pairs_trials_of_one_day(self):
+        force_files, velocity_files = verify_files(files("Force", NAMES), files("Velocity", reversed(NAMES)))
+        pairs, unmatched_force, unmatched_velocity = force_files.pair_with(velocity_files)
+        self.assertEqual((unmatched_force, unmatched_velocity), ([], []))
+        self.assertEqual(sorted((str(force.csv_filename), str(velocity.csv_filename)) for force, velocity in pairs),
+                         sorted((filename, filename) for filename in force_files.filenames))
+        self.assertEqual(len(set(force_files.filenames)), len(NAMES))
+
+    def test_duplicate_upload_rejected(self):
+        with self.assertRaisesRegex(ValueError, "more than once"):
+            verify_files(files("Force", NAMES + NAMES[2:3]), files("Velocity", NAMES + NAMES[2:3]))
+
+    def test_unmatched_files_rejected(self):
+        # the same number of files, but trial 2 of force has no velocity file
+        with self.assertRaisesRegex(ValueError, "Different velocity and force"):
+            verify_files(files("Force", NAMES), files("Velocity", NAMES[:2] + NAMES[3:] + [
+                "Adam_Lewandowski_Countermovement_Jump-10_14_2020_07-00-26 3.csv"]))
+        with self.assertRaisesRegex(ValueError, "Different number"):
+            verify_files(files("Force", NAMES), files("Velocity", NAMES[:3]))
+
+    def test_pair_with_reports_unmatched(self):
+        force_files = CmjCsvFilesList(files("Force", NAMES[:3]))
+        velocity_files = CmjCsvFilesList(files("Velocity", NAMES[1:]))
+        pairs, unmatched_force, unmatched_velocity = force_files.pair_with(velocity_files)
+        self.assertEqual(len(pairs), 2)
+        self.assertEqual([str(f.csv_filename) for f in unmatched_force], ["Adam_Lewandowski-10_14_2020.csv"])
+        self.assertEqual([str(f.csv_filename) for f in unmatched_velocity], ["Robin_Volkmar-10_14_2020_09-30-00.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
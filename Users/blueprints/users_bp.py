@@ -1,4 +1,6 @@
-from flask import Blueprint, request, render_template, redirect
+from flask import Blueprint, request, render_template, redirect, jsonify
+import csv
+import io
 from service import users as users_srvc
 
 bp = Blueprint('users', __name__)
@@ -12,3 +14,15 @@ def users():
         return redirect("https://athletes-dashboard-306517.ew.r.appspot.com/index")
     else:
         return render_template("add-users.html")
+
+
+@bp.route("/import", methods=['POST'])
+def import_roster():
+    """Bulk import of roster sent as json list of athletes or as csv file in "roster" field"""
+    if "roster" in request.files:
+        content = io.StringIO(request.files["roster"].read().decode("utf-8-sig"))
+        roster = [{key: value or None for key, value in row.items()} for row in csv.DictReader(content)]
+    else:
+        roster = request.get_json(force=True)
+    keys = users_srvc.import_roster(roster)
+    return jsonify({"imported": len(keys)})
@@ -1,19 +1,19 @@
 import datetime
 from google.cloud.datastore import Entity
 import json
+import numpy as np
 
 
 class Athlete:
+    __slots__ = ("first_name", "last_name", "coaches", "_birthdate", "sport")
     birthdate_format = "%Y-%m-%d"
 
-    def __init__(self, first_name, last_name, coaches=[], **kwargs):
+    def __init__(self, first_name, last_name, coaches=None, **kwargs):
         self.first_name = first_name
         self.last_name = last_name
-        self.coaches = coaches
+        self.coaches = list(coaches) if coaches is not None else []
         self.birthdate = kwargs.get('birthdate')
         self.sport = kwargs.get('sport')
-        if self.birthdate is not None:
-            self.age = Athlete.calc_age(self.birthdate)
 
     @property
     def birthdate(self):
@@ -23,6 +23,13 @@ class Athlete:
     def birthdate(self, birthdate):
         self._birthdate = birthdate
 
+    @property
+    def age(self):
+        """Age on the day it is read, None when birthdate is not known"""
+        if self.birthdate is None:
+            return None
+        return Athlete.calc_age(self.birthdate)
+
     @staticmethod
     def calc_age(birthdate):
         curr_date = datetime.datetime.now().date()
@@ -34,29 +41,111 @@ class Athlete:
         else:
             return year_diff - 1
 
+    def copy(self):
+        """
+        :return: new Athlete with the same fields and its own list of coaches
+        """
+        return Athlete(self.first_name, self.last_name, self.coaches, birthdate=self.birthdate, sport=self.sport)
+
     def get_datastore_dict(self):
-        athlete_dict = {
+        return {
             "first_name": self.first_name,
             "last_name": self.last_name,
             # "coaches": self.coaches,
-            "sport": getattr(self, "sport", None)
+            "sport": self.sport,
+            "birthdate": self.birthdate.isoformat() if self.birthdate is not None else None
         }
-        birthdate = getattr(self, "birthdate")
-        if birthdate is not None:
-            athlete_dict["birthdate"] = birthdate.strftime(self.birthdate_format)
-        else:
-            athlete_dict["birthdate"] = None
-        return athlete_dict
 
     @classmethod
     def create_from_dict(cls, data: dict):
+        birthdate = data.get("birthdate")
+        if isinstance(birthdate, str):
+            # date.fromisoformat is much faster than strptime, but it rejects dates of birthdate_format
+            # without zero padding (2000-1-5), which are parsed with strptime
+            try:
+                birthdate = datetime.date.fromisoformat(birthdate)
+            except ValueError:
+                birthdate = datetime.datetime.strptime(birthdate, cls.birthdate_format).date()
         athlete = Athlete(
             first_name=data["first_name"],
             last_name=data["last_name"],
             # coaches=data.get("coaches") if data.get("coaches") is not None else None,
             # following are optional kwargs, hence using get which doesn't raise KeyError
-            birthdate=datetime.datetime.strptime(data.get("birthdate"), cls.birthdate_format).date() if \
-                data.get("birthdate") is not None else None,
-            sport=data.get("sport") if data.get("sport") is not None else None
+            birthdate=birthdate,
+            sport=data.get("sport")
         )
         return athlete
+
+
+class AthleteTable:
+    """
+    Columnar collection of athletes, one numpy array per field, for listing many athletes at once.
+    Birthdates are kept as datetime64[D] (NaT when not known), so ages of all athletes are computed in one pass
+    """
+    fields = ("first_name", "last_name", "sport")
+
+    def __init__(self, first_name, last_name, sport, birthdate, keys=None):
+        """
+        :param first_name: sequence of first names
+        :param last_name: sequence of last names
+        :param sport: sequence of sports, None when not known
+        :param birthdate: sequence of iso date strings, dates or None, converted to datetime64[D]
+        :param keys: sequence of datastore keys of athletes, None when not known
+        """
+        self.first_name = np.asarray(first_name, dtype=object)
+        self.last_name = np.asarray(last_name, dtype=object)
+        self.sport = np.asarray(sport, dtype=object)
+        self.birthdate = np.array([b if b is not None else "NaT" for b in birthdate], dtype="datetime64[D]")
+        self.keys = list(keys) if keys is not None else [None] * len(self.first_name)
+
+    @classmethod
+    def from_entities(cls, entities: list):
+        """
+        :param entities: list of datastore entities or dicts in format of Athlete.get_datastore_dict
+        """
+        return cls(*([entity.get(field) for entity in entities] for field in cls.fields + ("birthdate",)),
+                   keys=[getattr(entity, "key", None) for entity in entities])
+
+    @classmethod
+    def from_athletes(cls, athletes: list):
+        return cls(*([getattr(athlete, field) for athlete in athletes] for field in cls.fields + ("birthdate",)))
+
+    def __len__(self):
+        return len(self.first_name)
+
+    def copy(self):
+        """
+        :return: AthleteTable with copies of all columns
+        """
+        table = AthleteTable.__new__(AthleteTable)
+        for field in self.fields + ("birthdate",):
+            setattr(table, field, getattr(self, field).copy())
+        table.keys = list(self.keys)
+        return table
+
+    def ages(self, today=None):
+        """
+        :param today: datetime.date on which age is calculated, today when None
+        :return: float array of ages in full years, NaN when birthdate is not known
+        """
+        today = np.datetime64(today if today is not None else datetime.date.today(), "D")
+        birth_year = self.birthdate.astype("datetime64[Y]")
+        birth_month = self.birthdate.astype("datetime64[M]")
+        years = (today.astype("datetime64[Y]") - birth_year).astype(np.int64)
+        # birthday not reached yet this year, compared by month and then by day of month
+        month, day = (birth_month - birth_year).astype(np.int64), (self.birthdate - birth_month).astype(np.int64)
+        today_month = (today.astype("datetime64[M]") - today.astype("datetime64[Y]")).astype(np.int64)
+        today_day = (today - today.astype("datetime64[M]")).astype(np.int64)
+        before_birthday = (today_month < month) | ((today_month == month) & (today_day < day))
+        return np.where(np.isnat(self.birthdate), np.nan, years - before_birthday)
+
+    def to_datastore_dicts(self):
+        """
+        :return: list of dicts in format of Athlete.get_datastore_dict
+        """
+        birthdate = np.where(np.isnat(self.birthdate), None, np.datetime_as_string(self.birthdate, unit="D"))
+        return [dict(zip(self.fields + ("birthdate",), row))
+                for row in zip(self.first_name, self.last_name, self.sport, birthdate)]
+
+    def to_athletes(self):
+        return [Athlete.create_from_dict(data) for data in self.to_datastore_dicts()]
@@ -0,0 +1,62 @@
+import itertools
+import threading
+from google.cloud import datastore
+
+
+class MemoryQuery:
+    """Stand-in of google.cloud.datastore.Query supporting equality filters"""
+
+    def __init__(self, client: 'MemoryClient', kind: str):
+        self.client = client
+        self.kind = kind
+        self.filters = []
+
+    def add_filter(self, property_name, operator, value):
+        if operator != "=":
+            raise ValueError("Only equality filters are supported: {}".format(operator))
+        self.filters.append((property_name, value))
+        return self
+
+    def fetch(self, limit=None):
+        with self.client.lock:
+            entities = [entity for key, entity in self.client.entities.items()
+                        if key.kind == self.kind and all(entity.get(name) == value for name, value in self.filters)]
+        return iter(entities[:limit] if limit is not None else entities)
+
+
+class MemoryClient:
+    """
+    Stand-in of google.cloud.datastore.Client keeping entities in memory, for tests and local runs.
+    Real client can be pointed to Datastore emulator with DATASTORE_EMULATOR_HOST instead
+    """
+
+    def __init__(self, project="local"):
+        self.project = project
+        self.entities = {}
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def key(self, *path_args, **kwargs):
+        return datastore.Key(*path_args, project=self.project, **kwargs)
+
+    def _complete(self, key):
+        return key if not key.is_partial else key.completed_key(next(self._ids))
+
+    def put(self, entity):
+        self.put_multi([entity])
+
+    def put_multi(self, entities):
+        with self.lock:
+            for entity in entities:
+                entity.key = self._complete(entity.key)
+                self.entities[entity.key] = entity
+
+    def get(self, key):
+        return self.entities.get(key)
+
+    def get_multi(self, keys):
+        with self.lock:
+            return [self.entities[key] for key in keys if key in self.entities]
+
+    def query(self, kind):
+        return MemoryQuery(self, kind)
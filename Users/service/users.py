@@ -1,18 +1,145 @@
+import os
 from google.cloud import datastore
-from model.Athlete import Athlete
+from model.Athlete import Athlete, AthleteTable
+from functools import lru_cache
+from service.cache import TTLCache
+from service.memory_datastore import MemoryClient
 import datetime
 
+# limits of Datastore on number of entities in one put_multi and keys in one get_multi
+PUT_BATCH = 500
+GET_BATCH = 1000
 
-def insert_athlete(data: dict, json_srvc_account=None):
+
+@lru_cache(maxsize=None)
+def get_client(json_srvc_account=None, backend=None):
+    """
+    Datastore client reused for the life of the process, one per service account.
+    Datastore emulator is used instead of Datastore when DATASTORE_EMULATOR_HOST is set
+    :param json_srvc_account: path to json service account details
+    :param backend: "datastore" or "memory" for in-memory stand-in, DATASTORE_BACKEND env (default datastore)
+        when not provided
+    """
+    backend = backend or os.environ.get("DATASTORE_BACKEND", "datastore")
+    if backend == "memory":
+        return MemoryClient()
+    elif backend != "datastore":
+        raise ValueError("Unknown datastore backend: {}".format(backend))
     if json_srvc_account is not None:
-        client = datastore.Client.from_service_account_json(json_srvc_account)
-    else:
-        client = datastore.Client()
+        return datastore.Client.from_service_account_json(json_srvc_account)
+    return datastore.Client()
+
+
+def chunks(items: list, size: int):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class AthleteStore:
+    """
+    Data access to athletes in Datastore. Results of queries are cached for ttl seconds and cache is cleared
+    on every write, so repeated page loads of unchanged roster do not hit Datastore. Cached results are
+    kept as tuples and every call gets its own copies, so changes made by caller do not leak into cache
+    """
     kind = "Athlete"
-    athlete_ent = datastore.Entity(client.key(kind))
-    athlete = Athlete.create_from_dict(data)
-    athlete_ent.update(athlete.get_datastore_dict())
-    client.put(athlete_ent)
+
+    def __init__(self, client, ttl=60.0, maxsize=128):
+        """
+        :param client: google.cloud.datastore.Client or service.memory_datastore.MemoryClient
+        :param ttl: lifetime of cached query results in seconds, 0 disables cache
+        :param maxsize: maximal number of cached queries
+        """
+        self.client = client
+        self.cache = TTLCache(maxsize, ttl)
+
+    def _entity(self, athlete: Athlete):
+        athlete_ent = datastore.Entity(self.client.key(self.kind))
+        athlete_ent.update(athlete.get_datastore_dict())
+        return athlete_ent
+
+    def insert_athlete(self, data: dict):
+        """
+        :param data: fields of Athlete class
+        :return: key of inserted entity
+        """
+        athlete_ent = self._entity(Athlete.create_from_dict(data))
+        self.client.put(athlete_ent)
+        self.cache.clear()
+        return athlete_ent.key
+
+    def import_roster(self, roster: list):
+        """
+        Inserts whole roster with put_multi in batches of PUT_BATCH entities
+        :param roster: list of dicts with fields of Athlete class
+        :return: list of keys of inserted entities
+        """
+        entities = [self._entity(Athlete.create_from_dict(data)) for data in roster]
+        try:
+            for batch in chunks(entities, PUT_BATCH):
+                self.client.put_multi(batch)
+        finally:
+            self.cache.clear()
+        return [entity.key for entity in entities]
+
+    def get_athletes(self, **kwargs):
+        """
+        :param kwargs: fields of Athlete class
+        :return: list of object of Athlete class, copies of cached ones until cache expires
+        """
+        cache_key = tuple(sorted(kwargs.items()))
+        athletes = self.cache.get(cache_key)
+        if athletes is None:
+            query = self.client.query(kind=self.kind)
+            for key, value in kwargs.items():
+                query.add_filter(key, "=", value)
+            athletes = tuple(Athlete.create_from_dict(elem) for elem in query.fetch())
+            self.cache.set(cache_key, athletes)
+        return [athlete.copy() for athlete in athletes]
+
+    def get_athlete_table(self, **kwargs):
+        """
+        :param kwargs: fields of Athlete class
+        :return: AthleteTable with all athletes matching filters, copy of cached one like in get_athletes
+        """
+        cache_key = ("table",) + tuple(sorted(kwargs.items()))
+        table = self.cache.get(cache_key)
+        if table is None:
+            query = self.client.query(kind=self.kind)
+            for key, value in kwargs.items():
+                query.add_filter(key, "=", value)
+            table = AthleteTable.from_entities(list(query.fetch()))
+            self.cache.set(cache_key, table)
+        return table.copy()
+
+    def get_by_keys(self, keys: list):
+        """
+        :param keys: list of datastore keys
+        :return: list of object of Athlete class for found keys, fetched with get_multi in batches of GET_BATCH keys
+        """
+        entities = []
+        for batch in chunks(list(keys), GET_BATCH):
+            entities.extend(self.client.get_multi(batch))
+        return [Athlete.create_from_dict(entity) for entity in entities]
+
+
+@lru_cache(maxsize=None)
+def _get_store(json_srvc_account):
+    return AthleteStore(get_client(json_srvc_account), ttl=float(os.environ.get("USERS_CACHE_TTL", 60)))
+
+
+def get_store(json_srvc_account=None):
+    """
+    :param json_srvc_account: path to json service account details
+    :return: AthleteStore of process wide client, cache lifetime set in USERS_CACHE_TTL env (default 60 s)
+    """
+    return _get_store(json_srvc_account)
+
+
+def insert_athlete(data: dict, json_srvc_account=None):
+    get_store(json_srvc_account).insert_athlete(data)
+
+
+def import_roster(roster: list, json_srvc_account=None):
+    return get_store(json_srvc_account).import_roster(roster)
 
 
 def get_athletes(json_srvc_account=None, **kwargs):
@@ -22,18 +149,7 @@ def get_athletes(json_srvc_account=None, **kwargs):
     :param kwargs: fields of Athlete class
     :return: list of object of Athlete class
     """
-    if json_srvc_account is not None:
-        client = datastore.Client.from_service_account_json(json_srvc_account)
-    else:
-        client = datastore.Client()
-    kind = "Athlete"
-    query = client.query(kind=kind)
-    for key, value in kwargs.items():
-        query.add_filter(key, "=", value)
-    athletes = []
-    for elem in list(query.fetch()):
-        athletes.append(Athlete.create_from_dict(elem))
-    return athletes
+    return get_store(json_srvc_account).get_athletes(**kwargs)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+"""
+Slotted Athlete with age computed when read, AthleteTable with ages of all athletes in one pass,
+and birthdates parsed from iso dates with non-padded month and day accepted.
+"""
+import datetime
+import unittest
+from unittest import mock
+import numpy as np
+
+from model.Athlete import Athlete, AthleteTable
+
+BIRTHDATES = [datetime.date(1990, 2, 1), datetime.date(2000, 2, 29), datetime.date(1995, 12, 31), None,
+              datetime.date(2004, 6, 15)]
+
+
+class AthleteTest(unittest.TestCase):
+
+    def test_slots(self):
+        athlete = Athlete("Adam", "Lewandowski")
+        self.assertFalse(hasattr(athlete, "__dict__"))
+        with self.assertRaises(AttributeError):
+            athlete.age_cached = 30
+        # coaches are not shared between athletes
+        athlete.coaches.append("kkruczek")
+        self.assertEqual(Athlete("Robin", "Volkmar").coaches, [])
+
+    def test_age_is_computed_when_read(self):
+        athlete = Athlete("Adam", "Lewandowski", birthdate=datetime.date(1990, 6, 15))
+        with mock.patch("model.Athlete.datetime") as mocked:
+            mocked.datetime.now.return_value = datetime.datetime(2020, 6, 14)
+            self.assertEqual(athlete.age, 29)
+            mocked.datetime.now.return_value = datetime.datetime(2020, 6, 15)
+            self.assertEqual(athlete.age, 30)
+            athlete.birthdate = datetime.date(2000, 1, 1)
+            self.assertEqual(athlete.age, 20)
+        self.assertIsNone(Athlete("Robin", "Volkmar").age)
+
+    def test_birthdate_formats(self):
+        for birthdate, expected in (("1990-02-01", datetime.date(1990, 2, 1)),
+                                    ("1990-2-1", datetime.date(1990, 2, 1)),
+                                    ("2000-12-5", datetime.date(2000, 12, 5)),
+                                    (datetime.date(1990, 2, 1), datetime.date(1990, 2, 1)),
+                                    (None, None)):
+            with self.subTest(birthdate=birthdate):
+                athlete = Athlete.create_from_dict({"first_name": "Adam", "last_name": "Lewandowski",
+                                                    "birthdate": birthdate})
+                self.assertEqual(athlete.birthdate, expected)
+        # day first is not birthdate_format, it is rejected rather than read as another date
+        for birthdate in ("1-2-1990", "01-02-1990", "1990-13-01"):
+            with self.subTest(birthdate=birthdate), self.assertRaises(ValueError):
+                Athlete.create_from_dict({"first_name": "Adam", "last_name": "Lewandowski", "birthdate": birthdate})
+
+    def test_datastore_dict_round_trip(self):
+        data = {"first_name": "Adam", "last_name": "Lewandowski", "sport": "volleyball", "birthdate": "1990-02-01"}
+        self.assertEqual(Athlete.create_from_dict(data).get_datastore_dict(), data)
+
+
+class AthleteTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.athletes = [Athlete("Adam{}".format(i), "Lewandowski", birthdate=birthdate, sport="volleyball")
+                         for i, birthdate in enumerate(BIRTHDATES)]
+        self.table = AthleteTable.from_athletes(self.athletes)
+
+    def test_ages_equal_ages_of_athletes(self):
+        for today in (datetime.date(2020, 2, 28), datetime.date(2020, 2, 29), datetime.date(2021, 2, 28),
+                      datetime.date(2021, 3, 1), datetime.date(2020, 12, 30), datetime.date(2020, 12, 31),
+                      datetime.date(2020, 6, 15)):
+            with mock.patch("model.Athlete.datetime") as mocked:
+                mocked.datetime.now.return_value = datetime.datetime.combine(today, datetime.time())
+                expected = [athlete.age if athlete.age is not None else np.nan for athlete in self.athletes]
+            np.testing.assert_array_equal(self.table.ages(today), expected, err_msg=str(today))
+
+    def test_entities(self):
+        dicts = self.table.to_datastore_dicts()
+        self.assertEqual(dicts, [athlete.get_datastore_dict() for athlete in self.athletes])
+        table = AthleteTable.from_entities(dicts)
+        self.assertEqual(len(table), len(BIRTHDATES))
+        self.assertTrue(np.isnat(table.birthdate[3]))
+        self.assertEqual([athlete.birthdate for athlete in table.to_athletes()], BIRTHDATES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+AthleteStore against in-memory Datastore: query results are cached until they expire or roster changes,
+callers get their own copies of cached athletes, and roster is written and read in batches.
+"""
+import io
+import json
+import unittest
+from unittest import mock
+
+import main
+from service import users
+from service.memory_datastore import MemoryClient
+from service.users import AthleteStore
+
+ROSTER = [{"first_name": "Adam", "last_name": "Lewandowski", "sport": "volleyball", "birthdate": "1990-02-01"},
+          {"first_name": "Robin", "last_name": "Volkmar", "sport": "volleyball", "birthdate": None},
+          {"first_name": "Szymon", "last_name": "Karpecki", "sport": "basketball", "birthdate": "1995-12-31"}]
+
+
+class AthleteStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = MemoryClient()
+        self.store = AthleteStore(self.client, ttl=60.0)
+        self.store.import_roster(ROSTER)
+        patcher = mock.patch.object(self.client, "query", wraps=self.client.query)
+        self.addCleanup(patcher.stop)
+        self.query = patcher.start()
+
+    def test_cache_hit(self):
+        first = self.store.get_athletes(sport="volleyball")
+        second = self.store.get_athletes(sport="volleyball")
+        self.assertEqual(self.query.call_count, 1)
+        self.assertEqual([a.get_datastore_dict() for a in first], [a.get_datastore_dict() for a in second])
+        self.assertEqual(sorted(a.first_name for a in first), ["Adam", "Robin"])
+        self.store.get_athletes(sport="basketball")
+        self.assertEqual(self.query.call_count, 2)
+
+    def test_cache_expiry(self):
+        with mock.patch("service.cache.time.monotonic", return_value=1000.0):
+            self.store.get_athletes()
+        with mock.patch("service.cache.time.monotonic", return_value=1059.0):
+            self.store.get_athletes()
+        self.assertEqual(self.query.call_count, 1)
+        with mock.patch("service.cache.time.monotonic", return_value=1061.0):
+            self.store.get_athletes()
+        self.assertEqual(self.query.call_count, 2)
+
+    def test_write_clears_cache(self):
+        self.assertEqual(len(self.store.get_athletes()), 3)
+        self.store.insert_athlete({"first_name": "Jan", "last_name": "Nowak"})
+        self.assertEqual(len(self.store.get_athletes()), 4)
+        self.assertEqual(self.query.call_count, 2)
+
+    def test_cached_athletes_are_not_shared(self):
+        athletes = self.store.get_athletes(sport="volleyball")
+        athletes[0].first_name = "Changed"
+        athletes[0].coaches.append("kkruczek")
+        athletes.pop()
+        again = self.store.get_athletes(sport="volleyball")
+        self.assertEqual(self.query.call_count, 1)
+        self.assertEqual(len(again), 2)
+        self.assertNotIn("Changed", [athlete.first_name for athlete in again])
+        self.assertEqual([athlete.coaches for athlete in again], [[], []])
+
+        table = self.store.get_athlete_table()
+        table.first_name[0] = "Changed"
+        table.keys.clear()
+        again = self.store.get_athlete_table()
+        self.assertNotIn("Changed", again.first_name)
+        self.assertEqual(len(again.keys), 3)
+
+    def test_batches(self):
+        client = MemoryClient()
+        store = AthleteStore(client)
+        roster = [dict(ROSTER[0], first_name="Adam{}".format(i)) for i in range(5)]
+        with mock.patch.object(users, "PUT_BATCH", 2), \
+                mock.patch.object(client, "put_multi", wraps=client.put_multi) as put_multi:
+            keys = store.import_roster(roster)
+        self.assertEqual([len(call.args[0]) for call in put_multi.call_args_list], [2, 2, 1])
+        with mock.patch.object(users, "GET_BATCH", 3), \
+                mock.patch.object(client, "get_multi", wraps=client.get_multi) as get_multi:
+            athletes = store.get_by_keys(keys)
+        self.assertEqual([len(call.args[0]) for call in get_multi.call_args_list], [3, 2])
+        self.assertEqual([athlete.first_name for athlete in athletes], [data["first_name"] for data in roster])
+
+
+class ImportTest(unittest.TestCase):
+
+    def setUp(self):
+        # process wide store with fresh in-memory client for every test
+        users.get_client.cache_clear()
+        users._get_store.cache_clear()
+        self.addCleanup(users._get_store.cache_clear)
+        self.addCleanup(users.get_client.cache_clear)
+
+    def test_import_json(self):
+        response = main.app.test_client().post("/import", data=json.dumps(ROSTER))
+        self.assertEqual(response.get_json(), {"imported": 3})
+        self.assertEqual(sorted(athlete.last_name for athlete in users.get_athletes()),
+                         ["Karpecki", "Lewandowski", "Volkmar"])
+
+    def test_import_csv(self):
+        content = "first_name,last_name,sport,birthdate\nAdam,Lewandowski,volleyball,1990-2-1\nRobin,Volkmar,,\n"
+        response = main.app.test_client().post("/import", data={"roster": (io.BytesIO(content.encode()),
+                                                                           "roster.csv")})
+        self.assertEqual(response.get_json(), {"imported": 2})
+        athletes = {athlete.first_name: athlete for athlete in users.get_athletes()}
+        self.assertEqual(athletes["Adam"].get_datastore_dict()["birthdate"], "1990-02-01")
+        self.assertIsNone(athletes["Robin"].sport)
+        self.assertIsNone(athletes["Robin"].birthdate)
+
+
+if __name__ == "__main__":
+    unittest.main()